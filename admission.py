@@ -0,0 +1,206 @@
+"""
+Admission control — token-bucket rate limits and bounded concurrency pools
+in front of the request handlers, so a burst of AI traffic is turned away
+quickly (429 + Retry-After) instead of exhausting worker threads and the LLM
+quota for everyone.
+
+Each route class has its own pool (a concurrency limit plus a bounded wait
+queue), so /api/chat turns can never occupy the slots /api/nearby and
+messaging need. AI work is additionally metered per user and globally.
+
+    AI_MAX_CONCURRENT=4    AI_QUEUE_SIZE=4     AI_QUEUE_WAIT_MS=1000
+    AI_USER_RATE=0.5       AI_USER_BURST=5       (requests/second per user)
+    AI_GLOBAL_RATE=10      AI_GLOBAL_BURST=20
+    API_MAX_CONCURRENT=64  API_QUEUE_SIZE=128  API_QUEUE_WAIT_MS=1000
+    ADMISSION=0            disable all limits
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+ENABLED = os.getenv('ADMISSION', '1') != '0'
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class Rejected(Exception):
+    """Request turned away; retry_after is a hint in seconds."""
+
+    def __init__(self, pool, reason, retry_after):
+        super().__init__(f"{pool}: {reason}")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def refund(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class Pool:
+    """At most `limit` requests at once, up to `queue_size` more waiting at most `max_wait` seconds."""
+
+    def __init__(self, name, limit, queue_size, max_wait):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, wait=True):
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if not wait or self.waiting >= self.queue_size:
+                raise Rejected(self.name, "queue_full", self.max_wait or 1.0)
+            self.waiting += 1
+            metrics.ADMISSION_QUEUE.set(self.name, value=self.waiting)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self.active >= self.limit:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise Rejected(self.name, "queue_timeout", self.max_wait)
+                    self._cond.wait(left)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_QUEUE.set(self.name, value=self.waiting)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            # Wake every waiter: one that timed out may have swallowed a single notify
+            self._cond.notify_all()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "limit": self.limit, "queue_size": self.queue_size}
+
+
+class Limiter:
+    """A pool plus optional per-user and global token buckets."""
+
+    MAX_USERS = 10000
+
+    def __init__(self, pool, user_rate=None, user_burst=None, global_rate=None, global_burst=None):
+        self.pool = pool
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate else None
+        self._users = OrderedDict()
+        self._users_lock = threading.Lock()
+
+    def _user_bucket(self, user_key):
+        with self._users_lock:
+            bucket = self._users.get(user_key)
+            if bucket is None:
+                if len(self._users) >= self.MAX_USERS:
+                    # Forget the least recently seen user; an idle bucket is full anyway
+                    self._users.popitem(last=False)
+                bucket = self._users[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            else:
+                self._users.move_to_end(user_key)
+            return bucket
+
+    def _reject(self, reason, retry_after):
+        metrics.ADMISSION.inc(self.pool.name, reason)
+        raise Rejected(self.pool.name, reason, retry_after)
+
+    def admit(self, user_key=None, wait=True):
+        """Take the rate tokens and a pool slot, or raise Rejected. Pair with release()."""
+        if not ENABLED:
+            return
+        user_bucket = self._user_bucket(user_key) if self.user_rate and user_key is not None else None
+        if user_bucket is not None:
+            retry = user_bucket.take()
+            if retry:
+                self._reject("user_rate", retry)
+        if self.global_bucket is not None:
+            retry = self.global_bucket.take()
+            if retry:
+                if user_bucket is not None:
+                    user_bucket.refund()
+                self._reject("global_rate", retry)
+        try:
+            self.pool.acquire(wait)
+        except Rejected as e:
+            # Not served: don't charge the caller's rate budget
+            if user_bucket is not None:
+                user_bucket.refund()
+            if self.global_bucket is not None:
+                self.global_bucket.refund()
+            self._reject(e.reason, e.retry_after)
+        metrics.ADMISSION.inc(self.pool.name, "admitted")
+
+    def release(self):
+        if ENABLED:
+            self.pool.release()
+
+    def stats(self):
+        return {**self.pool.stats(), "tracked_users": len(self._users)}
+
+
+AI = Limiter(
+    Pool("ai", int(_env_float('AI_MAX_CONCURRENT', '4')), int(_env_float('AI_QUEUE_SIZE', '4')),
+         _env_float('AI_QUEUE_WAIT_MS', '1000') / 1000),
+    user_rate=_env_float('AI_USER_RATE', '0.5'), user_burst=_env_float('AI_USER_BURST', '5'),
+    global_rate=_env_float('AI_GLOBAL_RATE', '10'), global_burst=_env_float('AI_GLOBAL_BURST', '20'),
+)
+API = Limiter(
+    Pool("api", int(_env_float('API_MAX_CONCURRENT', '64')), int(_env_float('API_QUEUE_SIZE', '128')),
+         _env_float('API_QUEUE_WAIT_MS', '1000') / 1000),
+)
+
+# Routes that call the LLM (matched on the Flask url rule)
+AI_ROUTES = {'/api/chat'}
+# Never limited: scrapes must work when the server is overloaded
+EXEMPT_ROUTES = {'/metrics'}
+
+
+def limiter_for(rule):
+    """The limiter for a url rule, or None when it is exempt."""
+    if rule in EXEMPT_ROUTES:
+        return None
+    return AI if rule in AI_ROUTES else API
+
+
+def stats():
+    return {"enabled": ENABLED, "ai": AI.stats(), "api": API.stats()}
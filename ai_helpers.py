@@ -3,21 +3,54 @@ AI Helper module — wraps the OpenAI API with function calling for task search.
 """
 
 import os
-import sqlite3
+import contextlib
+import contextvars
 import json
-import math
 import re
+import time
+
+import cache
+import changelog
+import db
+import deadline
+import geo
+import intent_router
+import jobs
+import llm_usage
+import matching
+import metrics
+import recommendations
+import task_stats
+import tracing
 
 DATABASE = 'database.db'
+# Build highlight / list-all / draft replies from tool results instead of a follow-up completion
+DIRECT_REPLIES = os.getenv('CHAT_DIRECT_REPLIES', '1') != '0'
 
-# Module-level user location — set per request by chat()
-_user_location = {"lat": None, "lng": None}
+# Prompt context (profile, accepted and available tasks) keyed by the change log
+# position, so an entry is exact until one of those tables changes
+_context_cache = cache.make('prompt_context', int(os.getenv('PROMPT_CONTEXT_TTL', '300')))
+# suggest_price model answers for the same task type and price statistics
+_price_cache = cache.make('llm:suggest_price', int(os.getenv('PRICE_CACHE_TTL', '900')))
+
+# (lat, lng) of the user the current chat turn is for — set by chat() through
+# user_location(); a context variable, so concurrent request threads never see each other's
+_user_location = contextvars.ContextVar('user_location', default=(None, None))
+
+
+@contextlib.contextmanager
+def user_location(lat, lng):
+    """Run the block with (lat, lng) as the user's location."""
+    token = _user_location.set((lat, lng))
+    try:
+        yield
+    finally:
+        _user_location.reset(token)
 
 
 def _query_db(query, args=(), one=False):
     """Standalone DB query helper (no Flask context needed)."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db.connect(DATABASE)
     cur = conn.execute(query, args)
     rows = cur.fetchall()
     conn.close()
@@ -26,26 +59,12 @@ def _query_db(query, args=(), one=False):
     return [dict(r) for r in rows]
 
 
-def haversine(lat1, lng1, lat2, lng2):
-    """Calculate the great-circle distance (km) between two points."""
-    R = 6371  # Earth radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlng = math.radians(lng2 - lng1)
-    a = (math.sin(dlat / 2) ** 2 +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlng / 2) ** 2)
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-
-def _add_distances(tasks):
-    """Add distance_km to each task dict if user location is known."""
-    ulat, ulng = _user_location["lat"], _user_location["lng"]
+def nearest_tasks(tasks, k=None, radius_km=None):
+    """Tasks nearest-first with distance_km (vectorized, geo.nearest_tasks); unchanged if the user location is unknown."""
+    ulat, ulng = _user_location.get()
     if ulat is None or ulng is None:
         return tasks
-    for t in tasks:
-        if t.get("lat") is not None and t.get("lng") is not None:
-            t["distance_km"] = round(haversine(ulat, ulng, t["lat"], t["lng"]), 2)
-    return tasks
+    return geo.nearest_tasks(ulat, ulng, tasks, k=k, radius_km=radius_km)
 
 
 def get_user_context(user_id):
@@ -78,10 +97,7 @@ def get_available_tasks_context():
     tasks = _query_db('SELECT map_id, title, description, reward, lat, lng FROM available_tasks ORDER BY map_id')
     if not tasks:
         return "No available tasks on the map right now."
-    tasks = _add_distances(tasks)
-    # Sort by distance if available
-    if tasks and "distance_km" in tasks[0]:
-        tasks.sort(key=lambda t: t.get("distance_km", 999))
+    tasks = nearest_tasks(tasks)
     lines = []
     for t in tasks:
         dist_str = f" [{t['distance_km']} km away]" if "distance_km" in t else ""
@@ -124,6 +140,10 @@ TOOLS = [
                     "keyword": {
                         "type": "string",
                         "description": "Optional keyword to filter tasks by title or description"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Optional maximum number of tasks to return (the closest ones)"
                     }
                 },
                 "required": []
@@ -216,17 +236,97 @@ TOOLS = [
 ]
 
 
+def _match_ranked(user_expertise, tasks, k=5):
+    """Top k tasks by matching.rank_tasks (keyword hits, then reward), with a match_reason like the LLM's."""
+    ranked = matching.rank_tasks(user_expertise, [dict(t) for t in tasks], k=k)
+    for task in ranked:
+        task["match_reason"] = (f"{task['match_score']}% match with your expertise ({user_expertise})."
+                                if user_expertise else "One of the best-paying tasks available.")
+    return ranked
+
+
+# --- Precomputed recommendations (filled by the background job queue) ---
+
+_recommendations_ready = False
+
+
+def _recommendations_conn():
+    global _recommendations_ready
+    conn = db.connect(DATABASE)
+    if not _recommendations_ready:
+        recommendations.init_schema(conn)
+        _recommendations_ready = True
+    return conn
+
+
+def _load_recommendations(user_id, fingerprint):
+    conn = _recommendations_conn()
+    try:
+        return recommendations.load(conn, user_id, fingerprint)
+    finally:
+        conn.close()
+
+
+def _save_recommendations(user_id, fingerprint, result):
+    conn = _recommendations_conn()
+    try:
+        recommendations.save(conn, user_id, fingerprint, result)
+    finally:
+        conn.close()
+
+
+def precompute_recommendations(payload):
+    """Job handler: compute and store a user's recommendations (no-op when the stored ones are current)."""
+    result = json.loads(execute_tool("get_recommended_tasks", {}, user_id=payload["user_id"]))
+    if "error" in result:
+        # Let the queue retry it
+        raise RuntimeError(result["error"])
+
+
+jobs.register(recommendations.JOB_KIND, precompute_recommendations)
+
+
+def schedule_recommendations(user_id):
+    """Queue a background refresh of a user's recommendations; returns the job id."""
+    return jobs.enqueue(recommendations.JOB_KIND, key=user_id, payload={"user_id": user_id})
+
+
+# Identical concurrent pricing / recommendation calls share one computation (and one LLM request)
+_tool_flights = cache.SingleFlight('ai:tools')
+
+
+def _coalesce_key(name, arguments, user_id):
+    if name == "suggest_price":
+        return name, (arguments.get("task_type") or "").lower()
+    if name == "get_recommended_tasks":
+        return name, user_id
+    return None
+
+
 def execute_tool(name, arguments, user_id=None):
     """Execute a tool call and return the result."""
+    key = _coalesce_key(name, arguments, user_id)
+    if key is None:
+        return _execute_tool(name, arguments, user_id)
+    return _tool_flights.do(key, lambda: _execute_tool(name, arguments, user_id), shareable=_full_result)
+
+
+def _full_result(result):
+    # A fallback forced by the leader's deadline must not reach callers with time to spare
+    try:
+        return not json.loads(result).get("degraded")
+    except (ValueError, AttributeError):
+        return True
+
+
+def _execute_tool(name, arguments, user_id=None):
     if name == "search_available_tasks":
         keyword = arguments.get("keyword", "")
         tasks = _query_db(
             "SELECT map_id, title, description, reward, lat, lng FROM available_tasks WHERE title LIKE ? OR description LIKE ?",
             (f"%{keyword}%", f"%{keyword}%")
         )
-        tasks = _add_distances(tasks)
-        if tasks and "distance_km" in tasks[0]:
-            tasks.sort(key=lambda t: t.get("distance_km", 999))
+        tasks = nearest_tasks(tasks)
         if not tasks:
             return json.dumps({"results": [], "message": f"No tasks found matching '{keyword}'"})
         return json.dumps({"results": tasks, "message": f"Found {len(tasks)} task(s) matching '{keyword}'"})
@@ -248,12 +348,18 @@ def execute_tool(name, arguments, user_id=None):
         if not tasks:
              return json.dumps({"message": "No tasks available to recommend."})
         
+        # Served from the background precompute when profile and tasks are unchanged
+        fingerprint = recommendations.fingerprint(user['expertise'], user['bio'], tasks)
+        ready = _load_recommendations(user_id, fingerprint)
+        metrics.record_cache("recommendations", ready is not None)
+        if ready is not None:
+            return ready
+        
         # Send all tasks to AI so it can see everything (free tasks, high-pay, etc.)
         tasks_subset = tasks
         
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            client = llm_usage.get_openai_client()
             
             prompt = f"""Match this user to the best tasks.
 User Profile:
@@ -267,7 +373,8 @@ Available Tasks:
 Return the top 5 suitable tasks IDs and strict reasons.
 JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ] }}"""
 
-            response = client.chat.completions.create(
+            response = llm_usage.create_completion(
+                client, tool="get_recommended_tasks", user_id=user_id,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"}
@@ -286,19 +393,30 @@ JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ]
                         "match_reason": rec['reason']
                     })
             
-            return json.dumps({
+            result = json.dumps({
                 "results": final_recs,
                 "message": f"Found {len(final_recs)} recommended tasks based on your profile."
             })
+            _save_recommendations(user_id, fingerprint, result)
+            return result
             
+        except deadline.DeadlineExceeded:
+            # Out of time for the model: rank by keyword match score instead
+            return json.dumps({
+                "results": _match_ranked(user_expertise, tasks),
+                "message": "Ranked by how well each task matches your expertise (quick match).",
+                "degraded": True
+            })
         except Exception as e:
             return json.dumps({"error": f"Recommendation failed: {str(e)}"})
 
     elif name == "search_nearby_tasks":
-        radius_km = arguments.get("radius_km", 2)
+        radius_km = float(arguments.get("radius_km") or 2)
         keyword = arguments.get("keyword", "")
+        limit = arguments.get("limit")
+        limit = int(limit) if limit else None
 
-        if _user_location["lat"] is None:
+        if _user_location.get()[0] is None:
             return json.dumps({"results": [], "message": "User location not available. Cannot search by distance."})
 
         if keyword:
@@ -309,11 +427,8 @@ JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ]
         else:
             tasks = _query_db("SELECT map_id, title, description, reward, lat, lng FROM available_tasks")
 
-        tasks = _add_distances(tasks)
-        # Filter by radius
-        tasks = [t for t in tasks if t.get("distance_km", 999) <= radius_km]
-        # Sort by distance
-        tasks.sort(key=lambda t: t.get("distance_km", 999))
+        # Radius filter + nearest-first (optionally top `limit`) in one vectorized pass
+        tasks = nearest_tasks(tasks, k=limit, radius_km=radius_km)
 
         if not tasks:
             return json.dumps({
@@ -327,16 +442,15 @@ JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ]
 
     elif name == "list_all_tasks":
         tasks = _query_db("SELECT map_id, title, description, reward, lat, lng FROM available_tasks ORDER BY map_id")
-        tasks = _add_distances(tasks)
-        if tasks and "distance_km" in tasks[0]:
-            tasks.sort(key=lambda t: t.get("distance_km", 999))
+        tasks = nearest_tasks(tasks)
         if not tasks:
             return json.dumps({"results": [], "message": "No tasks currently available on the map."})
         return json.dumps({"results": tasks, "message": f"{len(tasks)} task(s) currently available"})
 
     elif name == "highlight_task":
         task_id = arguments.get("task_id")
-        task = _query_db("SELECT map_id, title, reward FROM available_tasks WHERE map_id = ?", (task_id,), one=True)
+        task = _query_db("SELECT map_id, title, description, reward, lat, lng FROM available_tasks WHERE map_id = ?",
+                         (task_id,), one=True)
         if task:
             return json.dumps({"highlighted": True, "task": task})
         return json.dumps({"highlighted": False, "message": "Task not found on map"})
@@ -344,35 +458,26 @@ JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ]
     elif name == "suggest_price":
         task_type = arguments.get("task_type", "").lower()
         
-        # Query database for similar tasks from both tables
-        similar_tasks = _query_db(
-            "SELECT title, reward FROM tasks WHERE title LIKE ? OR description LIKE ?",
-            (f"%{task_type}%", f"%{task_type}%")
-        )
-        available_tasks = _query_db(
-            "SELECT title, reward FROM available_tasks WHERE title LIKE ? OR description LIKE ?",
-            (f"%{task_type}%", f"%{task_type}%")
-        )
-        
-        # Combine results
-        all_similar = similar_tasks + available_tasks
-        
-        if not all_similar:
-            # Fallback: get all tasks if no exact matches
-            all_similar = _query_db("SELECT title, reward FROM tasks UNION SELECT title, reward FROM available_tasks")
-        
-        # Calculate statistics
-        rewards = [task["reward"] for task in all_similar if task["reward"]]
+        # Category aggregates (task_stats) replace LIKE scans over both tables
+        conn = db.connect(DATABASE)
+        try:
+            stats = task_stats.price_stats(conn, task_type)
+        finally:
+            conn.close()
         
-        if rewards:
-            price_min = round(min(rewards), 2)
-            price_max = round(max(rewards), 2)
-            price_avg = round(sum(rewards) / len(rewards), 2)
+        if stats:
+            price_min, price_max, price_avg = stats["min"], stats["max"], stats["avg"]
             
+            # Same question, same data: reuse the model's earlier answer
+            price_key = (task_type, stats["category"], stats["sample_size"], price_min, price_max, price_avg,
+                         stats["median"], stats["p90"])
+            cached = _price_cache.get(price_key)
+            if cached is not None:
+                return cached
+
             # Use OpenAI to suggest a price with reasoning
             try:
-                from openai import OpenAI
-                client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+                client = llm_usage.get_openai_client()
                 
                 prompt = f"""Based on the following task pricing data from our platform, suggest a fair price for a '{task_type}' task.
 
@@ -380,10 +485,12 @@ Database statistics:
 - Minimum price seen: ${price_min}
 - Maximum price seen: ${price_max}
 - Average price: ${price_avg}
-- Number of similar tasks: {len(rewards)}
+- Median price: ${stats["median"]}
+- 90th percentile price: ${stats["p90"]}
+- Number of similar tasks ({stats["category"]}): {stats["sample_size"]}
 
 Sample tasks:
-{json.dumps(all_similar[:5], indent=2)}
+{json.dumps(stats["samples"], indent=2)}
 
 Provide:
 1. A suggested price (single number)
@@ -397,7 +504,8 @@ Respond in JSON format:
   "reasoning": "<text>"
 }}"""
                 
-                response = client.chat.completions.create(
+                response = llm_usage.create_completion(
+                    client, tool="suggest_price", user_id=user_id,
                     model="gpt-4o-mini",
                     messages=[{"role": "user", "content": prompt}],
                     response_format={"type": "json_object"}
@@ -410,23 +518,29 @@ Respond in JSON format:
                     "price_range": ai_result.get("price_range", {"min": price_min, "max": price_max}),
                     "reasoning": ai_result.get("reasoning", "Based on platform data"),
                     "data_stats": {
-                        "sample_size": len(rewards),
+                        "sample_size": stats["sample_size"],
                         "db_min": price_min,
                         "db_max": price_max,
-                        "db_avg": price_avg
+                        "db_avg": price_avg,
+                        "db_median": stats["median"],
+                        "category": stats["category"]
                     }
                 }
-                return json.dumps(result, indent=2)
+                reply = json.dumps(result, indent=2)
+                _price_cache.set(price_key, reply)
+                return reply
                 
             except Exception as e:
-                # Fallback if OpenAI fails
+                # Fallback if OpenAI fails (or the request's deadline ran out)
                 result = {
                     "task_type": task_type,
                     "suggested_price": price_avg,
                     "price_range": {"min": price_min, "max": price_max},
-                    "reasoning": f"Based on {len(rewards)} similar tasks in our database",
+                    "reasoning": f"Based on {stats['sample_size']} similar tasks in our database ({stats['category']})",
                     "error": str(e)
                 }
+                if isinstance(e, deadline.DeadlineExceeded):
+                    result["degraded"] = True
                 return json.dumps(result, indent=2)
         else:
             # No data available
@@ -498,17 +612,33 @@ You also have context about the user's profile and their accepted tasks.
 Keep responses SHORT (2-3 sentences max) unless the user asks for detail."""
 
 
-def build_messages(user_message, user_id, conversation_history=None):
-    """Build the messages array for the OpenAI API."""
-    context = (
+def prompt_context(user_id):
+    """Profile + accepted + available tasks context, cached until tasks, available_tasks or users change."""
+    conn = db.connect(DATABASE)
+    try:
+        version = changelog.latest_id(conn)
+    finally:
+        conn.close()
+    key = (user_id, version, *_user_location.get())
+    return _context_cache.get_or_compute(key, lambda: (
         f"{get_user_context(user_id)}\n\n"
         f"{get_tasks_context()}\n\n"
         f"{get_available_tasks_context()}"
-    )
+    ))
+
+
+def build_messages(user_message, user_id, conversation_history=None, summary=None):
+    """Build the messages array for the OpenAI API."""
+    context = prompt_context(user_id)
+
+    # Rolling summary of the archived part of the conversation (chat_archive.py)
+    if summary:
+        context += f"\n\nSummary of earlier conversation with this user:\n{summary}"
 
     # Add user location info to context if available
-    if _user_location["lat"] is not None:
-        context += f"\n\nUser's current location: lat={_user_location['lat']}, lng={_user_location['lng']}"
+    lat, lng = _user_location.get()
+    if lat is not None:
+        context += f"\n\nUser's current location: lat={lat}, lng={lng}"
 
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT + "\n\n--- Context ---\n" + context}
@@ -516,37 +646,201 @@ def build_messages(user_message, user_id, conversation_history=None):
 
     # Add conversation history if any
     if conversation_history:
-        for msg in conversation_history[-6:]:  # Keep last 6 messages for context
+        # Already bounded by chat_archive: older turns are in the summary above
+        for msg in conversation_history:
             messages.append(msg)
 
     messages.append({"role": "user", "content": user_message})
     return messages
 
 
-def chat(user_message, user_id, conversation_history=None, user_lat=None, user_lng=None):
-    """Send a message to the LLM with function calling and get a response."""
-    # Set user location for this request
-    _user_location["lat"] = user_lat
-    _user_location["lng"] = user_lng
+@tracing.traced("ai.postprocess")
+def _postprocess_reply(reply, found_tasks, user_wants_all):
+    """Filter task cards to what the reply mentions and strip hidden markers.
 
-    try:
-        from openai import OpenAI
+    Returns (reply, found_tasks, task_proposal).
+    """
+    # ── Filter found_tasks to match only what the AI mentioned ──
+    if found_tasks and reply and not user_wants_all:
+        # Layer 1: Try hidden [TASK:id] markers (most accurate)
+        mentioned_ids = [int(x) for x in re.findall(r'\[TASK:(\d+)\]', reply)]
+        if mentioned_ids:
+            found_tasks = [t for t in found_tasks if (t.get('map_id') or t.get('id')) in mentioned_ids]
+        else:
+            # Layer 2: Title+reward matching (longest-first to avoid substring issues)
+            sorted_tasks = sorted(found_tasks, key=lambda t: len(t.get('title', '')), reverse=True)
+            matched = []
+            matched_titles = set()
+
+            for task in sorted_tasks:
+                title = task.get('title', '')
+                reward = task.get('reward', 0)
+                if not title or title not in reply:
+                    continue
+
+                # Skip if this title is a substring of an already-matched longer title
+                # e.g. skip "Tutoring" if "Tutoring - Urgent" was already matched
+                if any(title != mt and title in mt for mt in matched_titles):
+                    continue
+
+                # For same-title tasks (different rewards), prefer the one whose reward is in text
+                reward_in_text = (f"${reward}" in reply or f"${int(reward)}" in reply)
+                if title in matched_titles:
+                    if reward_in_text:
+                        matched = [m for m in matched if m.get('title') != title]
+                        matched.append(task)
+                    continue
+
+                matched_titles.add(title)
+                matched.append(task)
+
+            if matched:
+                # Sort cards by their order of appearance in AI reply
+                matched.sort(key=lambda t: reply.find(t['title']))
+                found_tasks = matched
+            else:
+                # Layer 3: No title matches at all — cap at 5
+                found_tasks = found_tasks[:5]
+
+    # Parse TASK_PROPOSAL marker if present
+    task_proposal = None
+    proposal_match = re.search(r'<!--TASK_PROPOSAL:(\{.*?\})-->', reply)
+    if proposal_match:
+        try:
+            task_proposal = json.loads(proposal_match.group(1))
+        except json.JSONDecodeError:
+            pass
+        # Strip the marker from the displayed reply
+        reply = re.sub(r'<!--TASK_PROPOSAL:\{.*?\}-->', '', reply)
+
+    # Always strip hidden task markers from the displayed reply
+    reply = re.sub(r'\s*\[TASK:\d+\]', '', reply)
+
+    return reply, found_tasks, task_proposal
+
+
+# Tools whose structured output fully determines the reply — no follow-up completion needed
+DIRECT_REPLY_TOOLS = ("highlight_task", "list_all_tasks", "create_task_draft")
 
+
+def _direct_reply(calls, preamble=None):
+    """Build the chat result from a tool turn's structured results, or None if the model must phrase it.
+
+    `calls` is a list of (tool name, arguments, raw result) for every tool call in the turn.
+    """
+    if not calls or any(name not in DIRECT_REPLY_TOOLS for name, _, _ in calls):
+        return None
+
+    parts = [preamble] if preamble else []
+    found_tasks, highlight_task_id, task_proposal = [], None, None
+    for name, args, result in calls:
+        if name == "create_task_draft":
+            if not args.get("title") or args.get("reward") is None:
+                return None
+            task_proposal = {"title": args["title"], "description": args.get("description"), "reward": args["reward"]}
+            parts.append(intent_router.render_draft(task_proposal))
+        elif name == "list_all_tasks":
+            found_tasks = json.loads(result).get("results", [])
+            parts.append(intent_router.render_reply(intent_router.Route(name, {}, 1.0), found_tasks))
+        else:
+            parsed = json.loads(result)
+            task = parsed.get("task") if parsed.get("highlighted") else None
+            if task:
+                highlight_task_id = task["map_id"]
+                if not any(t.get("map_id") == highlight_task_id for t in found_tasks):
+                    found_tasks = found_tasks + [task]
+            parts.append(intent_router.render_highlight(task, args.get("task_id")))
+
+    return {"reply": " ".join(parts), "highlight_task_id": highlight_task_id,
+            "found_tasks": found_tasks, "task_proposal": task_proposal}
+
+
+def answer_locally(route, user_id, user_wants_all=False):
+    """Run a routed tool directly and build the reply from its structured results (no LLM call)."""
+    with tracing.child_span("ai.execute_tool", tool=route.tool, arguments=route.arguments, route="local"):
+        results = json.loads(execute_tool(route.tool, route.arguments, user_id=user_id)).get("results", [])
+    found_tasks = results if (user_wants_all or route.tool == "list_all_tasks") else results[:5]
+    return {
+        "reply": intent_router.render_reply(route, results, shown=len(found_tasks)),
+        "highlight_task_id": found_tasks[0]["map_id"] if found_tasks else None,
+        "found_tasks": found_tasks,
+        "task_proposal": None,
+    }
+
+
+DEGRADED_REPLY = ("I'm taking longer than usual to answer, so here are the tasks that best match your skills "
+                  "right now. Ask again in a moment for a full answer.")
+DEGRADED_FOUND_REPLY = ("I'm taking longer than usual to answer, but here's what I found so far. "
+                        "Ask again in a moment for a full answer.")
+
+
+def degraded_answer(user_id, found_tasks=None):
+    """Canned reply plus match-score ranked tasks, used when the chat deadline runs out."""
+    if found_tasks:
+        cards = found_tasks[:5]
+        reply = DEGRADED_FOUND_REPLY
+    else:
+        user = _query_db('SELECT expertise FROM users WHERE id = ?', (user_id,), one=True) if user_id else None
+        tasks = _query_db("SELECT map_id, title, description, reward, lat, lng FROM available_tasks")
+        cards = _match_ranked((user or {}).get('expertise') or '', tasks)
+        reply = DEGRADED_REPLY if cards else "I'm taking longer than usual to answer. Please try again in a moment."
+    return {
+        "reply": reply,
+        "highlight_task_id": cards[0].get("map_id") if cards else None,
+        "found_tasks": cards,
+        "task_proposal": None,
+        "degraded": True,
+    }
+
+
+@tracing.traced("ai.chat")
+def chat(user_message, user_id, conversation_history=None, user_lat=None, user_lng=None, summary=None):
+    """Answer a chat message — locally when the intent router is confident, otherwise via the LLM."""
+    with user_location(user_lat, user_lng):
+        start = time.perf_counter()
+        # Only skip card filtering when user explicitly asks for ALL tasks
+        user_wants_all = any(phrase in user_message.lower() for phrase in intent_router.ALL_TASKS_PHRASES)
+
+        route = intent_router.route(user_message) if intent_router.ENABLED else None
+        # Nearby searches need the user's location; let the LLM explain when it is missing
+        if route and not (route.tool == "search_nearby_tasks" and user_lat is None):
+            span = tracing.current_span()
+            if span is not None:
+                span.set(route="local", intent=route.tool, confidence=round(route.confidence, 3))
+            result = answer_locally(route, user_id, user_wants_all)
+            metrics.observe_chat("local", route.tool, time.perf_counter() - start)
+            return result
+
+        result = _chat_llm(user_message, user_id, conversation_history, user_wants_all, summary)
+        if result.get("degraded"):
+            metrics.observe_chat("degraded", "llm", time.perf_counter() - start)
+        else:
+            metrics.observe_chat("llm", "llm", time.perf_counter() - start)
+        return result
+
+
+def _chat_llm(user_message, user_id, conversation_history, user_wants_all, summary=None):
+    """Send a message to the LLM with function calling and get a response.
+
+    Every stage respects the current deadline; when it runs out the partial
+    results (or match-score ranked tasks) are returned via degraded_answer().
+    """
+    found_tasks = []
+    try:
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             return {"reply": "⚠️ OpenAI API key not configured. Add OPENAI_API_KEY to your .env file."}
 
-        client = OpenAI(api_key=api_key)
-        messages = build_messages(user_message, user_id, conversation_history)
+        client = llm_usage.get_openai_client()
+        deadline.check("build_messages")
+        with tracing.child_span("ai.build_messages"):
+            messages = build_messages(user_message, user_id, conversation_history, summary)
 
         highlight_task_id = None
-        found_tasks = []
-        # Only skip card filtering when user explicitly asks for ALL tasks
-        user_wants_all = any(phrase in user_message.lower() for phrase in
-            ['all tasks', 'every task', 'everything available', 'list all', 'show all', 'all available'])
 
         # First call — may return tool calls
-        response = client.chat.completions.create(
+        response = llm_usage.create_completion(
+            client, tool="chat", user_id=user_id,
             model="gpt-4o-mini",
             messages=messages,
             tools=TOOLS,
@@ -560,11 +854,14 @@ def chat(user_message, user_id, conversation_history=None, user_lat=None, user_l
         if choice.finish_reason == "tool_calls" and choice.message.tool_calls:
             # Add assistant's tool call message
             messages.append(choice.message)
+            calls = []
 
             for tool_call in choice.message.tool_calls:
                 fn_name = tool_call.function.name
                 fn_args = json.loads(tool_call.function.arguments)
-                result = execute_tool(fn_name, fn_args, user_id=user_id)
+                deadline.check(f"execute_tool:{fn_name}")
+                with tracing.child_span("ai.execute_tool", tool=fn_name, arguments=fn_args):
+                    result = execute_tool(fn_name, fn_args, user_id=user_id)
 
                 # Track found tasks from search
                 if fn_name in ("search_available_tasks", "list_all_tasks", "search_nearby_tasks", "get_recommended_tasks"):
@@ -579,14 +876,26 @@ def chat(user_message, user_id, conversation_history=None, user_lat=None, user_l
                     if parsed.get("highlighted"):
                         highlight_task_id = fn_args.get("task_id")
 
+                calls.append((fn_name, fn_args, result))
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tool_call.id,
                     "content": result
                 })
 
+            # Highlight / list-all / draft turns: the tool results are the answer
+            preamble = re.sub(r'\s*\[TASK:\d+\]', '', choice.message.content or '').strip()
+            direct = _direct_reply(calls, preamble) if DIRECT_REPLIES else None
+            span = tracing.current_span()
+            if span is not None:
+                span.set(followup="skipped" if direct else "completed")
+            metrics.CHAT_FOLLOWUPS.inc("skipped" if direct else "completed")
+            if direct:
+                return direct
+
             # Second call — get final response after tool execution
-            response = client.chat.completions.create(
+            response = llm_usage.create_completion(
+                client, tool="chat_followup", user_id=user_id,
                 model="gpt-4o-mini",
                 messages=messages,
                 max_tokens=300,
@@ -596,64 +905,15 @@ def chat(user_message, user_id, conversation_history=None, user_lat=None, user_l
 
         reply = choice.message.content or "I found the task for you on the map!"
 
-        # ── Filter found_tasks to match only what the AI mentioned ──
-        if found_tasks and reply and not user_wants_all:
-            # Layer 1: Try hidden [TASK:id] markers (most accurate)
-            mentioned_ids = [int(x) for x in re.findall(r'\[TASK:(\d+)\]', reply)]
-            if mentioned_ids:
-                found_tasks = [t for t in found_tasks if (t.get('map_id') or t.get('id')) in mentioned_ids]
-            else:
-                # Layer 2: Title+reward matching (longest-first to avoid substring issues)
-                sorted_tasks = sorted(found_tasks, key=lambda t: len(t.get('title', '')), reverse=True)
-                matched = []
-                matched_titles = set()
-
-                for task in sorted_tasks:
-                    title = task.get('title', '')
-                    reward = task.get('reward', 0)
-                    if not title or title not in reply:
-                        continue
-
-                    # Skip if this title is a substring of an already-matched longer title
-                    # e.g. skip "Tutoring" if "Tutoring - Urgent" was already matched
-                    if any(title != mt and title in mt for mt in matched_titles):
-                        continue
-
-                    # For same-title tasks (different rewards), prefer the one whose reward is in text
-                    reward_in_text = (f"${reward}" in reply or f"${int(reward)}" in reply)
-                    if title in matched_titles:
-                        if reward_in_text:
-                            matched = [m for m in matched if m.get('title') != title]
-                            matched.append(task)
-                        continue
-
-                    matched_titles.add(title)
-                    matched.append(task)
-
-                if matched:
-                    # Sort cards by their order of appearance in AI reply
-                    matched.sort(key=lambda t: reply.find(t['title']))
-                    found_tasks = matched
-                else:
-                    # Layer 3: No title matches at all — cap at 5
-                    found_tasks = found_tasks[:5]
-
-        # Parse TASK_PROPOSAL marker if present
-        task_proposal = None
-        proposal_match = re.search(r'<!--TASK_PROPOSAL:(\{.*?\})-->', reply)
-        if proposal_match:
-            try:
-                task_proposal = json.loads(proposal_match.group(1))
-            except json.JSONDecodeError:
-                pass
-            # Strip the marker from the displayed reply
-            reply = re.sub(r'<!--TASK_PROPOSAL:\{.*?\}-->', '', reply)
-
-        # Always strip hidden task markers from the displayed reply
-        reply = re.sub(r'\s*\[TASK:\d+\]', '', reply)
+        reply, found_tasks, task_proposal = _postprocess_reply(reply, found_tasks, user_wants_all)
 
         return {"reply": reply, "highlight_task_id": highlight_task_id, "found_tasks": found_tasks, "task_proposal": task_proposal}
 
+    except deadline.DeadlineExceeded as e:
+        span = tracing.current_span()
+        if span is not None:
+            span.set(degraded=True, deadline_stage=e.stage)
+        return degraded_answer(user_id, found_tasks)
     except ImportError:
         return {"reply": "⚠️ OpenAI package not installed. Run: pip install openai"}
     except Exception as e:
@@ -2,26 +2,56 @@ from flask import Flask, render_template, jsonify, request, g, session, redirect
 import random
 import sqlite3
 import datetime
+import gc
+import hmac
+import importlib
 import os
 import json
+import threading
+import time
 import urllib.request
 
 from dotenv import load_dotenv
 load_dotenv()
 
+import admission
 import ai_helpers
+import bulk_tasks
+import cache
+import categories
+import changelog
+import chat_archive
+import db as db_helpers
+import deadline
 import dummy_tasks
+import geo
+import intent_router
+import jobs
+import llm_usage
+import matching
+import metrics
+import profiling
+import recommendations
+import task_stats
+import tiles
+import tracing
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'super_secret_key_for_hackathon')
 
+# Request profiling (no-op unless PROFILE_REQUESTS / PROFILE_SAMPLE_RATE is set)
+profiler = profiling.RequestProfiler(app)
+
 DATABASE = 'database.db'
 
+# Coalesce identical concurrent computations (see cache.SingleFlight)
+_nearby_flights = cache.SingleFlight('nearby')
+_geolocate_flights = cache.SingleFlight('geolocate')
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = db_helpers.connect(DATABASE)
     return db
 
 @app.teardown_appcontext
@@ -30,6 +60,74 @@ def close_connection(exception):
     if db is not None: # Corrected from 'if db is sorted:'
         db.close()
 
+@app.before_request
+def start_request_timer():
+    g._request_start = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe_request(request.method, route, response.status_code,
+                            time.perf_counter() - g._request_start)
+    g._request_recorded = True
+    return response
+
+@app.before_request
+def start_request_span():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g._trace_span = tracing.start_span(f"{request.method} {route}",
+                                       traceparent=request.headers.get('traceparent'),
+                                       path=request.path)
+
+@app.after_request
+def add_trace_header(response):
+    span = g.get('_trace_span')
+    if span is not None:
+        span.set(status=response.status_code)
+        response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+@app.before_request
+def admit_request():
+    """Rate-limit and bound concurrency per route class (see admission.py); 429 when over."""
+    if request.endpoint == 'static':
+        return None
+    limiter = admission.limiter_for(request.url_rule.rule if request.url_rule else None)
+    if limiter is None:
+        return None
+    user_key = session.get('user_id') or request.remote_addr
+    try:
+        limiter.admit(user_key)
+    except admission.Rejected as e:
+        response = jsonify({'error': 'Too many requests, please retry shortly', 'reason': e.reason,
+                            'retry_after': round(e.retry_after, 2)})
+        response.status_code = 429
+        response.headers['Retry-After'] = e.retry_after_header
+        return response
+    g._admitted = limiter
+    return None
+
+@app.teardown_request
+def release_admission(exception):
+    limiter = g.pop('_admitted', None)
+    if limiter is not None:
+        limiter.release()
+
+@app.teardown_request
+def finish_request_span(exception):
+    tracing.end_span(g.pop('_trace_span', None), error=exception)
+
+@app.teardown_request
+def finish_request_metrics(exception):
+    if '_request_start' not in g:
+        return
+    metrics.HTTP_IN_FLIGHT.dec()
+    if not g.get('_request_recorded'):
+        # Unhandled exception — after_request never ran
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(request.method, route, 500, time.perf_counter() - g._request_start)
+
 def init_db():
     with app.app_context():
         db = get_db()
@@ -84,6 +182,53 @@ def init_db():
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # Readers don't block the writer (and vice versa): matters once several worker processes share the file
+        db.execute('PRAGMA journal_mode=WAL')
+        # Indexes for the hot lookups (status filters, per-task message previews, chat history)
+        db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, timestamp)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_id ON tasks (status, id)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_lat ON tasks (status, lat)')
+        # One accepted task per map task: drop duplicates left by the old check-then-insert, then enforce it
+        has_unique = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_tasks_original_id_unique'").fetchone()
+        if not has_unique:
+            db.execute('''
+                DELETE FROM tasks WHERE original_id IS NOT NULL AND id NOT IN (
+                    SELECT MIN(id) FROM tasks WHERE original_id IS NOT NULL GROUP BY original_id
+                )
+            ''')
+            db.execute('DROP INDEX IF EXISTS idx_tasks_original_id')
+            db.execute('CREATE UNIQUE INDEX idx_tasks_original_id_unique ON tasks (original_id)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_direct_messages_task ON direct_messages (task_id)')
+        db.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id)')
+
+        # Full-text index over task titles/descriptions (used by MCP search_tasks)
+        has_fts = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+        db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                title, description, content='tasks', content_rowid='id'
+            )
+        ''')
+        db.executescript('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+        ''')
+        if not has_fts:
+            db.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+        llm_usage.init_schema(db)
+        changelog.init_schema(db)
+        task_stats.init_schema(db)
+        jobs.init_schema(db)
+        recommendations.init_schema(db)
+        chat_archive.init_schema(db)
         
         # Seed a dummy user if not exists
         cur = db.execute('SELECT * FROM users LIMIT 1')
@@ -93,6 +238,9 @@ def init_db():
                        ('AstroHelper', 'Exploring the universe of helpful tasks.', 'Helper', 'Helping, Moving', join_date))
         
         db.commit()
+        changelog.prune_if_due(db)
+        # Jobs interrupted by a restart run again
+        jobs.recover(db)
 
 @app.route('/')
 def index():
@@ -170,17 +318,7 @@ def send_message(task_id):
     if not content:
         return jsonify({'error': 'Empty message'}), 400
     
-    db = get_db()
-    
-    # Save user message
-    db.execute(
-        'INSERT INTO direct_messages (task_id, sender, content) VALUES (?, ?, ?)',
-        (task_id, 'user', content)
-    )
-    db.commit()
-    
     # Auto-reply from "requester" for demo
-    import time
     replies = [
         "Thanks for accepting! When can you start?",
         "Great, I'll be available anytime this weekend.",
@@ -189,13 +327,83 @@ def send_message(task_id):
         "Thanks for the update! Looking forward to it.",
     ]
     reply = random.choice(replies)
-    db.execute(
-        'INSERT INTO direct_messages (task_id, sender, content) VALUES (?, ?, ?)',
-        (task_id, 'requester', reply)
-    )
+
+    # Save the user message and the auto-reply in one statement / one commit
+    db = get_db()
+    rows = db.execute(
+        'INSERT INTO direct_messages (task_id, sender, content) VALUES (?, ?, ?), (?, ?, ?) RETURNING id',
+        (task_id, 'user', content, task_id, 'requester', reply)
+    ).fetchall()
     db.commit()
     
-    return jsonify({'success': True, 'reply': reply})
+    return jsonify({'success': True, 'reply': reply, 'message_ids': [row['id'] for row in rows]})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def _admin_denied():
+    """403 response unless ADMIN_TOKEN is configured and sent as X-Admin-Token; None when allowed."""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+        return jsonify({'error': 'Forbidden'}), 403
+    return None
+
+@app.route('/api/admin/llm_usage', methods=['GET'])
+def admin_llm_usage():
+    """Per-tool, per-day LLM cost and p95 latency, spend per user, intent-router hit rate and admission pools."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    days = request.args.get('days', 7, type=int)
+    return jsonify({
+        'days': days,
+        'by_tool': llm_usage.usage_by_tool_per_day(days),
+        'by_user': llm_usage.usage_by_user(days),
+        'intent_router': intent_router.stats(),
+        'admission': admission.stats(),
+    })
+
+@app.route('/api/admin/jobs', methods=['GET'])
+def admin_jobs():
+    """Background job counts by kind and status, oldest queued job age and recent failures."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify(jobs.status())
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def job_status(job_id):
+    """One job's status (admin token required: jobs carry other users' arguments and errors)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({k: job[k] for k in ('id', 'kind', 'status', 'attempts', 'error', 'created_at',
+                                        'started_at', 'finished_at')})
+
+@app.route('/api/debug/query_plans', methods=['GET'])
+def debug_query_plans():
+    """Query-plan audit report (only when QUERY_AUDIT is enabled)."""
+    if not db_helpers.QUERY_AUDIT:
+        return jsonify({'error': 'Query audit disabled. Set QUERY_AUDIT=warn'}), 404
+    return jsonify({'statements': db_helpers.audit_report()})
+
+@app.route('/api/debug/traces', methods=['GET'])
+def debug_traces():
+    """Recent traces from the in-memory span buffer (?trace_id=... for one trace); admin only.
+
+    Spans carry every user's tool arguments, SQL and chat steps.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'traces': tracing.recent_traces(limit, trace_id=request.args.get('trace_id'))})
 
 @app.route('/logout')
 def logout():
@@ -261,9 +469,16 @@ def update_profile():
         return jsonify({'error': 'Invalid role'}), 400
     
     db = get_db()
+    old = db.execute(f'SELECT {field} FROM users WHERE id = ?', (session['user_id'],)).fetchone()
     db.execute(f'UPDATE users SET {field} = ? WHERE id = ?', (value, session['user_id']))
     db.commit()
     
+    # Recommendations depend on expertise and bio: refresh them in the background
+    job_id = None
+    if field in ('expertise', 'bio') and (old is None or old[field] != value):
+        job_id = ai_helpers.schedule_recommendations(session['user_id'])
+    return jsonify({'success': True, 'field': field, 'value': value, 'job_id': job_id})
+    
 @app.route('/api/post_task', methods=['POST'])
 def post_task():
     data = request.json
@@ -275,14 +490,19 @@ def post_task():
     reward = data.get('reward')
     lat = data.get('lat')
     lng = data.get('lng')
+    try:
+        bulk_tasks.check_location(lat, lng)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     db = get_db()
     cursor = db.execute(
-        'INSERT INTO tasks (title, description, reward, lat, lng, status) VALUES (?, ?, ?, ?, ?, ?)',
-        (title, description, reward, lat, lng, 'posted')
+        'INSERT INTO tasks (title, description, reward, lat, lng, status, category) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (title, description, reward, lat, lng, 'posted', categories.classify(title, description))
     )
     db.commit()
     new_id = cursor.lastrowid
+    tiles.invalidate_point(lat, lng)
     
     new_task = {
         'id': new_id + 10000, # Offset ID to avoid collision with dummy tasks (0-60)
@@ -307,60 +527,62 @@ def delete_task_frontend():
     if task_id > 10000:
         db_id = task_id - 10000
         db = get_db()
-        db.execute('DELETE FROM tasks WHERE id = ?', (db_id,))
+        deleted = db.execute('DELETE FROM tasks WHERE id = ? RETURNING lat, lng', (db_id,)).fetchall()
         db.commit()
+        for row in deleted:
+            tiles.invalidate_point(row['lat'], row['lng'])
         return jsonify({'success': True})
     else:
         # Dummy task deletion logic (if supported) or error
         # Currently we assume only custom tasks (ID > 10000) are deletable via this button
         return jsonify({'error': 'Cannot delete system tasks'}), 400
 
-def calculate_match_score(user_expertise, task_title, task_desc):
-    """
-    Calculate a 'smart' match score (0-100) based on user expertise and task content.
-    """
-    if not user_expertise:
-        return 0, 'default'
-        
-    expertise_list = [e.strip().lower() for e in user_expertise.split(',')]
-    text = (task_title + " " + task_desc).lower()
-    
-    score = 0
-    matches = 0
-    
-    for skill in expertise_list:
-        if skill and skill in text:
-            matches += 1
-            score += 40 # Big boost for direct keyword match
-            
-    # Add some randomness for "AI" feel and base score
-    import random
-    base_affinity = random.randint(30, 60) 
-    score += base_affinity
-    
-    # Cap at 99
-    score = min(99, score)
-    
-    # Determine color/tier
-    if score >= 85:
-        return score, 'purple' # High match
-    elif score >= 60:
-        return score, 'orange' # Medium match
-    else:
-        return score, 'default' # Low match
-
 @app.route('/api/nearby')
 def get_nearby_data():
+    """Tasks around (lat, lng), nearest first with distance_km.
+
+    With bbox=south,west,north,east and zoom, only tasks inside the viewport are
+    returned, grid-clustered into {count, centroid} aggregates at low zoom.
+    Optional k / radius_km keep only the k nearest / those within the radius.
+    """
     try:
         lat = float(request.args.get('lat'))
         lng = float(request.args.get('lng'))
     except (TypeError, ValueError):
         return jsonify({'error': 'Invalid coordinates'}), 400
 
+    bbox = None
+    try:
+        if request.args.get('bbox'):
+            bbox = geo.parse_bbox(request.args.get('bbox'))
+            # Clamped: 2 ** zoom overflows the pixel maths for absurd values
+            zoom = max(0, min(geo.MAX_ZOOM, int(request.args.get('zoom', geo.CLUSTER_MAX_ZOOM))))
+        k = request.args.get('k', type=int)
+        radius_km = request.args.get('radius_km', type=float)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # posted=0: the caller renders posted tasks from the cacheable /tiles layer
+    include_posted = request.args.get('posted', '1') != '0'
+    # Clients at the same spot loading at once share one layout build (copied: callers annotate it)
+    key = (lat, lng, bbox, include_posted, session.get('user_id'))
+    tasks = [dict(t) for t in _nearby_flights.do(key, lambda: build_nearby_tasks(get_db(), lat, lng, bbox, include_posted))]
+    # Nearest first, with distance_km precomputed (optionally the k nearest / within radius_km)
+    tasks = geo.nearest_tasks(lat, lng, tasks, k=k, radius_km=radius_km)
+    if bbox is None:
+        return jsonify({'tasks': tasks})
+
+    clusters = []
+    if geo.should_cluster(zoom, len(tasks)):
+        tasks, clusters = geo.grid_cluster(tasks, zoom)
+    return jsonify({'tasks': tasks, 'clusters': clusters, 'zoom': zoom})
+
+
+def build_nearby_tasks(db, lat, lng, bbox=None, include_posted=True):
+    """Posted DB tasks plus the deterministic demo tasks around (lat, lng), optionally limited to a bbox."""
     tasks = []
 
     # Get accepted task IDs to filter them out
-    db = get_db()
     cur = db.execute('SELECT original_id FROM tasks WHERE original_id IS NOT NULL')
     accepted_ids = {row['original_id'] for row in cur.fetchall()}
     
@@ -373,9 +595,15 @@ def get_nearby_data():
             user_expertise = user['expertise']
 
     # 1. Fetch user-posted tasks from DB (status='posted')
-    cur = db.execute("SELECT * FROM tasks WHERE status = 'posted'")
-    posted_rows = cur.fetchall()
+    posted_rows = []
+    if include_posted and bbox is None:
+        posted_rows = db.execute("SELECT * FROM tasks WHERE status = 'posted'").fetchall()
+    elif include_posted:
+        posted_rows = db.execute("SELECT * FROM tasks WHERE status = 'posted' AND lat BETWEEN ? AND ?",
+                                 (bbox[0], bbox[2])).fetchall()
     for row in posted_rows:
+        if bbox is not None and not geo.in_bbox(row['lat'], row['lng'], bbox):
+            continue
         tasks.append({
             'id': row['id'] + 10000, # Apply offset
             'title': row['title'],
@@ -403,16 +631,18 @@ def get_nearby_data():
     # Show up to 60 available tasks on the map
     limit = min(60, len(task_templates))
     for i in range(limit):
-        if (i + 1) in accepted_ids:
-            continue
-
         template = task_templates[shuffled[i]]
-        # Deterministic offset within ~2km
+        # Deterministic offset within ~2km (drawn for every slot so positions stay stable)
         offset_lat = rng.uniform(-0.02, 0.02)
         offset_lng = rng.uniform(-0.02, 0.02)
+
+        if (i + 1) in accepted_ids:
+            continue
+        if bbox is not None and not geo.in_bbox(lat + offset_lat, lng + offset_lng, bbox):
+            continue
         
         # Calculate AI Match Score
-        score, color = calculate_match_score(user_expertise, template["title"], template["desc"])
+        score, color = matching.calculate_match_score(user_expertise, template["title"], template["desc"])
 
         tasks.append({
             "id": i + 1,
@@ -426,7 +656,7 @@ def get_nearby_data():
             "match_color": color
         })
 
-    return jsonify({'tasks': tasks})
+    return tasks
 
 
 @app.route('/api/store_available_tasks', methods=['POST'])
@@ -440,11 +670,16 @@ def store_available_tasks():
     db.execute('DELETE FROM available_tasks')  # Clear old tasks
     for task in data['tasks']:
         db.execute(
-            'INSERT OR REPLACE INTO available_tasks (map_id, title, description, reward, lat, lng) VALUES (?, ?, ?, ?, ?, ?)',
-            (task['id'], task['title'], task.get('description', ''), task.get('reward', 0), task.get('lat', 0), task.get('lng', 0))
+            'INSERT OR REPLACE INTO available_tasks (map_id, title, description, reward, lat, lng, category) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (task['id'], task['title'], task.get('description', ''), task.get('reward', 0), task.get('lat', 0), task.get('lng', 0),
+             categories.classify(task['title'], task.get('description', '')))
         )
     db.commit()
-    return jsonify({'message': f'Stored {len(data["tasks"])} tasks'}), 200
+    # Each snapshot logs ~2 change rows per task (delete + insert): keep change_log bounded
+    changelog.prune_if_due(db)
+    # New snapshot: precompute this user's recommendations before they ask
+    job_id = ai_helpers.schedule_recommendations(session.get('user_id', 1))
+    return jsonify({'message': f'Stored {len(data["tasks"])} tasks', 'job_id': job_id}), 200
 
 
 @app.route('/api/accept_task', methods=['POST'])
@@ -462,16 +697,17 @@ def accept_task():
 
     db = get_db()
     
-    # Check if already accepted (idempotency)
-    cur = db.execute('SELECT id FROM tasks WHERE original_id = ?', (original_id,))
-    if cur.fetchone():
-        return jsonify({'message': 'Task already accepted'}), 200
-
-    db.execute('INSERT INTO tasks (title, description, reward, lat, lng, original_id) VALUES (?, ?, ?, ?, ?, ?)',
-               (title, desc, reward, lat, lng, original_id))
+    # Idempotent insert: the unique index on original_id turns a repeat (or concurrent) accept into a no-op
+    rows = db.execute(
+        'INSERT INTO tasks (title, description, reward, lat, lng, original_id, category) VALUES (?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT (original_id) DO NOTHING RETURNING id',
+        (title, desc, reward, lat, lng, original_id, categories.classify(title, desc))
+    ).fetchall()
     db.commit()
 
-    return jsonify({'message': 'Task accepted and saved to database!'}), 201
+    if not rows:
+        return jsonify({'message': 'Task already accepted'}), 200
+    return jsonify({'message': 'Task accepted and saved to database!', 'id': rows[0]['id']}), 201
 
 @app.route('/api/my_tasks', methods=['GET'])
 def get_my_tasks():
@@ -499,10 +735,76 @@ def get_my_tasks():
 @app.route('/api/delete_db_task/<int:task_id>', methods=['DELETE'])
 def delete_db_task(task_id):
     db = get_db()
-    db.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+    deleted = db.execute('DELETE FROM tasks WHERE id = ? RETURNING lat, lng', (task_id,)).fetchall()
     db.commit()
+    for row in deleted:
+        tiles.invalidate_point(row['lat'], row['lng'])
     return jsonify({'message': 'Task deleted successfully'}), 200
 
+@app.route('/tiles/<int:z>/<int:x>/<int:y>')
+def task_tile(z, x, y):
+    """Posted tasks in one slippy-map tile, as GeoJSON (clustered at low zoom)."""
+    if not tiles.valid(z, x, y):
+        return jsonify({'error': 'Tile out of range'}), 404
+    body, etag = tiles.get_tile(get_db(), z, x, y)
+    response = app.response_class(body, mimetype='application/geo+json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={tiles.TILE_MAX_AGE}'
+    return response.make_conditional(request)
+
+# --- Bulk operations: many tasks, one transaction, per-item results ---
+
+def _json_object():
+    """The request body if it is a JSON object, else None (missing, malformed or another JSON type)."""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+def _bulk_response(operation, items):
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON array'}), 400
+    try:
+        results = operation(get_db(), items)
+    except bulk_tasks.BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    changelog.prune_if_due(get_db())
+    for result in results:
+        if result['status'] == 'posted':
+            item = items[result['index']]
+            tiles.invalidate_point(item.get('lat'), item.get('lng'))
+        elif result['status'] == 'deleted':
+            tiles.invalidate_point(result['lat'], result['lng'])
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'results': results, 'summary': summary}), 200
+
+@app.route('/api/post_tasks', methods=['POST'])
+def post_tasks():
+    """Post many tasks: {"tasks": [{title, description, reward, lat, lng}, ...]}"""
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    return _bulk_response(bulk_tasks.post_tasks, data.get('tasks'))
+
+@app.route('/api/accept_tasks', methods=['POST'])
+def accept_tasks():
+    """Accept many map tasks: {"tasks": [{id, title, description, reward, lat, lng}, ...]}"""
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    return _bulk_response(bulk_tasks.accept_tasks, data.get('tasks'))
+
+@app.route('/api/delete_tasks', methods=['POST'])
+def delete_tasks():
+    """Delete many DB tasks: {"ids": [<db id>, ...], "map_ids": [<map id>, ...]} (either or both)"""
+    data = _json_object()
+    if data is None:
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    ids, map_ids = data.get('ids', []), data.get('map_ids', [])
+    if not isinstance(ids, list) or not isinstance(map_ids, list):
+        return jsonify({'error': 'ids and map_ids must be JSON arrays'}), 400
+    return _bulk_response(lambda conn, _: bulk_tasks.delete_tasks(conn, ids, map_ids), ids + map_ids)
+
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     # Auto-assign demo user if not logged in (hackathon convenience)
@@ -522,27 +824,42 @@ def api_chat():
 
     db = get_db()
 
-    # Get conversation history from DB (last 10 messages)
-    cur = db.execute('SELECT role, content FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT 10', (user_id,))
-    rows = cur.fetchall()
-    # Reverse to chronological order for the AI context
-    history = [{'role': row['role'], 'content': row['content']} for row in reversed(rows)]
+    # One time budget for the whole turn; past it the reply degrades to a local answer
+    with deadline.scope(deadline.CHAT_DEADLINE):
+        # All hot messages plus the rolling summary of the archived ones: together they cover the whole conversation
+        history = chat_archive.recent_history(db, user_id)
+        summary = chat_archive.get_summary(db, user_id)
 
-    # Call the AI with function calling
-    result = ai_helpers.chat(user_message, user_id, history, user_lat=user_lat, user_lng=user_lng)
+        # Call the AI with function calling
+        result = ai_helpers.chat(user_message, user_id, history, user_lat=user_lat, user_lng=user_lng,
+                                 summary=summary)
 
-    # Save to DB
-    db.execute('INSERT INTO chat_messages (user_id, role, content) VALUES (?, ?, ?)', (user_id, 'user', user_message))
-    db.execute('INSERT INTO chat_messages (user_id, role, content) VALUES (?, ?, ?)', (user_id, 'assistant', result['reply']))
+    # Save both turns in one statement / one commit. No write transaction is open
+    # during the LLM call above, so slow completions never hold the database lock.
+    db.execute(
+        'INSERT INTO chat_messages (user_id, role, content) VALUES (?, ?, ?), (?, ?, ?)',
+        (user_id, 'user', user_message, user_id, 'assistant', result['reply'])
+    )
     db.commit()
+    # Fold older turns into the rolling summary in the background once the hot history is long
+    chat_archive.schedule(db, user_id)
 
     return jsonify(result), 200
 
 
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
+    """Recent (hot) messages plus the rolling summary; ?archived=1&before=<id> pages through the archive.
+
+    has_archived tells the chat widget to offer loading the older messages.
+    """
     user_id = session.get('user_id', 1)
     db = get_db()
+    if request.args.get('archived') == '1':
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        page = chat_archive.archived(db, user_id, before=request.args.get('before', type=int), limit=limit)
+        return jsonify({'archived': page, 'next_before': page[-1]['id'] if page else None})
+
     cur = db.execute('SELECT role, content, timestamp FROM chat_messages WHERE user_id = ? ORDER BY id ASC', (user_id,))
     rows = cur.fetchall()
     
@@ -553,7 +870,8 @@ def get_chat_history():
             'content': row['content'],
             'timestamp': row['timestamp']
         })
-    return jsonify({'history': history})
+    return jsonify({'history': history, 'summary': chat_archive.get_summary(db, user_id),
+                    'has_archived': bool(chat_archive.archived(db, user_id, limit=1))})
 
 
 @app.route('/api/clear_chat', methods=['POST'])
@@ -561,18 +879,23 @@ def clear_chat():
     user_id = session.get('user_id', 1)
     db = get_db()
     db.execute('DELETE FROM chat_messages WHERE user_id = ?', (user_id,))
+    chat_archive.clear(db, user_id)
     db.commit()
     return jsonify({'message': 'Chat history cleared'}), 200
 
+def _lookup_location():
+    # Use ip-api.com (free, no key needed, 45 req/min)
+    url = 'http://ip-api.com/json/?fields=status,lat,lon,city,regionName'
+    req = urllib.request.Request(url, headers={'User-Agent': 'FindAHelper/1.0'})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return json.loads(resp.read().decode())
+
 @app.route('/api/geolocate')
 def geolocate():
     """Get user's approximate location from their IP address."""
     try:
-        # Use ip-api.com (free, no key needed, 45 req/min)
-        url = 'http://ip-api.com/json/?fields=status,lat,lon,city,regionName'
-        req = urllib.request.Request(url, headers={'User-Agent': 'FindAHelper/1.0'})
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode())
+        # Concurrent lookups share one ip-api request (free tier: 45 req/min)
+        data = _geolocate_flights.do('ip-api', _lookup_location)
         
         if data.get('status') == 'success':
             return jsonify({
@@ -587,6 +910,88 @@ def geolocate():
         return jsonify({'error': str(e)}), 500
 
 
+# --- Startup: app factory and warm-up ---
+
+# Pay the one-off first-request costs in create_app() (APP_WARMUP=0 keeps startup lazy)
+APP_WARMUP = os.getenv('APP_WARMUP', '1') != '0'
+# Imported at startup instead of inside the first request that needs them (openai: ~0.7s)
+PRELOAD_MODULES = [m.strip() for m in os.getenv('APP_PRELOAD', 'openai').split(',') if m.strip()]
+# The map opens at zoom 14 (map.js); render that many of its busiest tiles up front
+TILE_PRIME_ZOOM = int(os.getenv('TILE_PRIME_ZOOM', '14'))
+TILE_PRIME_LIMIT = int(os.getenv('TILE_PRIME_LIMIT', '256'))
+
+_init_lock = threading.Lock()
+_initialized = False
+# Milliseconds per startup step of the last create_app()
+startup_timings = {}
+
+def _prime_tiles():
+    with app.app_context():
+        tiles.prime(get_db(), TILE_PRIME_ZOOM, TILE_PRIME_LIMIT)
+
+def warm_up():
+    """Preload modules, the OpenAI client, compiled templates, the URL map and the tile cache.
+
+    Each step is timed; a failing step is logged and skipped, never fatal.
+    """
+    steps = [(f'import:{name}', lambda name=name: importlib.import_module(name)) for name in PRELOAD_MODULES]
+    if os.getenv('OPENAI_API_KEY'):
+        steps.append(('openai_client', llm_usage.get_openai_client))
+    steps += [
+        ('templates', lambda: [app.jinja_env.get_template(name) for name in app.jinja_env.list_templates()]),
+        ('url_map', app.url_map.update),
+        ('tiles', _prime_tiles),
+    ]
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            app.logger.warning('warm-up step %s failed: %s', name, e)
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    # Workers may be forked from this process: no SQLite handles may cross the fork
+    cache.close_connections()
+    # Everything loaded so far lives for the whole process: move it out of the
+    # collector's view so the first requests don't pay a full collection over it
+    gc.collect()
+    gc.freeze()
+    return timings
+
+def create_app(warm=None, start_jobs=True):
+    """Initialize the schema (plus migrations), warm up and start the job workers; returns the app.
+
+    Safe to call more than once: the initialization runs once per process. WSGI
+    servers should load `wsgi:app`, which calls this; importing `app` alone
+    leaves the database uninitialized.
+    """
+    global _initialized
+    with _init_lock:
+        if not _initialized:
+            start = time.perf_counter()
+            init_db()
+            timings = {'init_db': round((time.perf_counter() - start) * 1000, 2)}
+            if APP_WARMUP if warm is None else warm:
+                timings.update(warm_up())
+            startup_timings.clear()
+            startup_timings.update(timings)
+            for step, ms in timings.items():
+                metrics.STARTUP.set(step, value=round(ms / 1000, 6))
+            app.logger.info('startup steps (ms): %s', timings)
+            _initialized = True
+    if start_jobs:
+        jobs.start()
+    return app
+
+def after_fork():
+    """Per-worker setup in a pre-forked server process (gunicorn.conf.py post_fork).
+
+    Threads don't survive fork, so each worker starts its own job threads; jobs
+    are claimed through the database, so workers never run the same one twice.
+    """
+    jobs.start()
+
+
 if __name__ == '__main__':
-    init_db()
+    create_app()
     app.run(debug=True, port=5001)
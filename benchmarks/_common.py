@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts: a seeded temporary database and a
+fake OpenAI client with configurable latency (no API key or network needed).
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+import categories  # noqa: E402
+import dummy_tasks  # noqa: E402
+
+
+def make_database(n_tasks=1000, n_available=60, seed=0):
+    """Create a temp database with the app schema plus random tasks; return its path."""
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+    os.close(fd)
+    point_modules_at(path)
+    app.init_db()
+
+    rng = random.Random(seed)
+    templates = dummy_tasks.task_templates
+    with app.app.app_context():
+        db = app.get_db()
+        db.executemany(
+            'INSERT INTO tasks (title, description, reward, lat, lng, status, original_id, category) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(t["title"], t["desc"], t["reward"], 37.77 + rng.uniform(-0.05, 0.05), -122.42 + rng.uniform(-0.05, 0.05),
+              rng.choice(['accepted', 'posted', 'completed']), None, categories.classify(t["title"], t["desc"]))
+             for t in (rng.choice(templates) for _ in range(n_tasks))]
+        )
+        db.executemany(
+            'INSERT INTO available_tasks (map_id, title, description, reward, lat, lng, category) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(i + 1, t["title"], t["desc"], t["reward"], 37.77 + rng.uniform(-0.02, 0.02), -122.42 + rng.uniform(-0.02, 0.02),
+              categories.classify(t["title"], t["desc"]))
+             for i, t in enumerate(templates[:n_available])]
+        )
+        db.commit()
+    return path
+
+
+def point_modules_at(path):
+    """Point every module's DATABASE constant at `path`."""
+    for name, module in list(sys.modules.items()):
+        if module is not None and getattr(module, 'DATABASE', None) is not None and \
+                os.path.dirname(getattr(module, '__file__', '') or '') == ROOT:
+            module.DATABASE = path
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions with a fixed latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        usage = types.SimpleNamespace(prompt_tokens=800, completion_tokens=60,
+                                      prompt_tokens_details=types.SimpleNamespace(cached_tokens=0))
+        content = json.dumps({"suggested_price": 30, "price_range": {"min": 20, "max": 40},
+                              "reasoning": "benchmark", "recommendations": [{"map_id": 1, "reason": "benchmark"}]})
+        message = types.SimpleNamespace(content=content, tool_calls=None, role="assistant")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(finish_reason="stop", message=message)], usage=usage)
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.2):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions(latency))
+
+
+def report(title, rows):
+    """Print a small aligned table: rows are (label, value) pairs."""
+    print(f"\n{title}")
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"  {label.ljust(width)}  {value}")
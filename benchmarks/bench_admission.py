@@ -0,0 +1,94 @@
+"""
+Benchmark: /api/nearby latency during an /api/chat spike, with admission
+control off and on.
+
+Requests run on a fixed pool of `--workers` threads (like a threaded WSGI
+server). A burst of `--chats` chat turns from `--users` users (simulated LLM,
+`--llm-latency` seconds) arrives alongside steady /api/nearby probes; the
+probe latency includes time spent waiting for a free worker.
+
+Run:  python benchmarks/bench_admission.py [--workers 16] [--chats 120] [--users 30]
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _common
+import admission
+import app
+import intent_router
+import openai
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(args, enabled):
+    admission.ENABLED = enabled
+    for limiter in (admission.AI, admission.API):
+        limiter._users.clear()
+        if limiter.global_bucket is not None:
+            limiter.global_bucket.tokens = limiter.global_bucket.burst
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.app.test_client()
+        return local.client
+
+    def chat(i):
+        addr = f"10.0.0.{i % args.users}"
+        return client().post('/api/chat', json={'message': 'what should I do'},
+                             environ_base={'REMOTE_ADDR': addr}).status_code
+
+    def nearby(submitted):
+        client().get('/api/nearby?lat=37.77&lng=-122.42')
+        return time.perf_counter() - submitted
+
+    statuses, probes = [], []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        chats = [pool.submit(chat, i) for i in range(args.chats)]
+        for _ in range(args.probes):
+            time.sleep(args.probe_interval)
+            probes.append(pool.submit(nearby, time.perf_counter()))
+        statuses = [f.result() for f in chats]
+        latencies = [f.result() for f in probes]
+    return statuses, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--chats', type=int, default=120)
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--probes', type=int, default=40)
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    path = _common.make_database()
+    client = _common.FakeOpenAI(latency=args.llm_latency)
+    openai.OpenAI = lambda *a, **kw: client
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    intent_router.ENABLED = False
+    try:
+        rows = []
+        for label, enabled in (("admission off", False), ("admission on", True)):
+            statuses, latencies = run(args, enabled)
+            served = statuses.count(200)
+            rows.append((label, f"nearby p50 {percentile(latencies, 50) * 1000:6.0f} ms   "
+                                f"p99 {percentile(latencies, 99) * 1000:6.0f} ms   "
+                                f"chat 200: {served:3d}  429: {statuses.count(429):3d}"))
+        _common.report(f"Admission control — {args.workers} workers, {args.chats} chat turns from {args.users} users "
+                       f"({args.llm_latency * 1000:.0f} ms LLM), {args.probes} nearby probes", rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: one HTTP request (and one commit) per task vs the bulk endpoints.
+
+Posts, accepts and deletes `--items` tasks through the per-task routes
+(/api/post_task, /api/accept_task, /api/delete_db_task/<id>) and then through
+/api/post_tasks, /api/accept_tasks and /api/delete_tasks, in batches of `--batch`.
+Bodies that aren't a JSON object must get a 400 from the bulk routes (checked first).
+
+Run:  python benchmarks/bench_bulk.py [--items 2000] [--batch 500]
+"""
+
+import argparse
+import os
+import time
+
+import _common
+import app
+
+
+def payload(i, offset):
+    return {"id": offset + i, "title": f"Moving - Box {i}", "description": "Carry boxes upstairs",
+            "reward": 20 + i % 30, "lat": 37.77, "lng": -122.42}
+
+
+def run_single(client, n):
+    timings = {}
+    start = time.perf_counter()
+    ids = [client.post('/api/post_task', json=payload(i, 0)).json['task']['id'] - 10000 for i in range(n)]
+    timings['post'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        client.post('/api/accept_task', json=payload(i, 100000))
+    timings['accept'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task_id in ids:
+        client.delete(f'/api/delete_db_task/{task_id}')
+    timings['delete'] = time.perf_counter() - start
+    return timings
+
+
+def run_bulk(client, n, batch):
+    timings = {}
+    start = time.perf_counter()
+    ids = []
+    for lo in range(0, n, batch):
+        results = client.post('/api/post_tasks', json={"tasks": [payload(i, 0) for i in range(lo, min(n, lo + batch))]}).json
+        ids.extend(r['id'] for r in results['results'])
+    timings['post'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lo in range(0, n, batch):
+        client.post('/api/accept_tasks', json={"tasks": [payload(i, 200000) for i in range(lo, min(n, lo + batch))]})
+    timings['accept'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lo in range(0, n, batch):
+        client.post('/api/delete_tasks', json={"ids": ids[lo:lo + batch]})
+    timings['delete'] = time.perf_counter() - start
+    return timings
+
+
+def check_bad_bodies(client):
+    """Bodies that aren't a JSON object are a 400, not a 500."""
+    for path in ('/api/post_tasks', '/api/accept_tasks', '/api/delete_tasks'):
+        for body in ([1], "tasks", None):
+            response = client.post(path, json=body)
+            assert response.status_code == 400, (path, body, response.status_code)
+        response = client.post(path, data='{not json', content_type='application/json')
+        assert response.status_code == 400, (path, 'malformed', response.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--tasks', type=int, default=5000)
+    args = parser.parse_args()
+
+    path = _common.make_database(n_tasks=args.tasks)
+    try:
+        client = app.app.test_client()
+        check_bad_bodies(client)
+        single = run_single(client, args.items)
+        bulk = run_bulk(client, args.items, args.batch)
+        rows = []
+        for op in ('post', 'accept', 'delete'):
+            rows.append((f"{op} x{args.items}",
+                         f"single: {args.items / single[op]:8.0f} tasks/s   "
+                         f"bulk: {args.items / bulk[op]:8.0f} tasks/s   ({single[op] / bulk[op]:5.1f}x)"))
+        _common.report(f"Bulk task operations — {args.items} tasks, batches of {args.batch}, "
+                       f"{args.tasks} existing tasks", rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: /api/chat tail latency under a slow LLM provider, without a
+deadline, with the deadline + degraded fallback, and with hedged completions.
+
+The simulated provider answers in `--llm-latency` seconds, except that a
+`--slow-rate` fraction of calls take `--slow-latency` seconds.
+
+Run:  python benchmarks/bench_deadline.py [--messages 40] [--deadline 1.0] [--hedge-after 0.4]
+"""
+
+import argparse
+import os
+import random
+import time
+
+import _common
+import ai_helpers
+import deadline
+import intent_router
+import llm_usage
+import openai
+
+
+class SlowCompletions(_common.FakeCompletions):
+    """Fixed latency with an occasional very slow response."""
+
+    def __init__(self, latency, slow_latency, slow_rate, seed=0):
+        super().__init__(latency)
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.rng = random.Random(seed)
+
+    def create(self, **kwargs):
+        slow = self.rng.random() < self.slow_rate
+        time.sleep(self.slow_latency - self.latency if slow else 0)
+        return super().create(**kwargs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(completions, n, budget, hedge_after):
+    completions.rng.seed(0)
+    llm_usage.LLM_HEDGE_AFTER = hedge_after
+    times, degraded = [], 0
+    for i in range(n):
+        start = time.perf_counter()
+        with deadline.scope(budget):
+            result = ai_helpers.chat("what should I do this weekend", 1, [], user_lat=37.77, user_lng=-122.42)
+        times.append(time.perf_counter() - start)
+        degraded += bool(result.get("degraded"))
+    return times, degraded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--slow-latency', type=float, default=3.0)
+    parser.add_argument('--slow-rate', type=float, default=0.1)
+    parser.add_argument('--deadline', type=float, default=1.0)
+    parser.add_argument('--hedge-after', type=float, default=0.4)
+    args = parser.parse_args()
+
+    path = _common.make_database()
+    completions = SlowCompletions(args.llm_latency, args.slow_latency, args.slow_rate)
+    client = _common.FakeOpenAI()
+    client.chat.completions = completions
+    openai.OpenAI = lambda *a, **kw: client
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    intent_router.ENABLED = False
+    try:
+        rows = []
+        for label, budget, hedge in (("no deadline", None, 0),
+                                     (f"deadline {args.deadline:g}s", args.deadline, 0),
+                                     (f"deadline + hedge @{args.hedge_after:g}s", args.deadline, args.hedge_after)):
+            times, degraded = run(completions, args.messages, budget, hedge)
+            rows.append((label, f"p50 {percentile(times, 50) * 1000:6.0f} ms   p99 {percentile(times, 99) * 1000:6.0f} ms   "
+                                f"max {max(times) * 1000:6.0f} ms   degraded {degraded}/{args.messages}"))
+        _common.report(f"Chat deadline — {args.messages} messages, LLM {args.llm_latency * 1000:.0f} ms "
+                       f"({args.slow_rate:.0%} at {args.slow_latency:g} s)", rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: follow-up completion vs replies built from structured tool results.
+
+Replays tool turns (highlight_task, list_all_tasks, create_task_draft and a
+search that still needs the model) through ai_helpers.chat with a scripted
+LLM, once with ai_helpers.DIRECT_REPLIES off and once on, and reports
+completions per message and mean latency.
+
+Run:  python benchmarks/bench_followup.py [--llm-latency 0.6]
+"""
+
+import argparse
+import json
+import os
+import time
+import types
+
+import _common
+import ai_helpers
+import intent_router
+import openai
+
+# (message, tool calls the model makes on the first completion)
+SCENARIOS = [
+    ("show me task 3 on the map", [("highlight_task", {"task_id": 3})]),
+    ("what's everything on the map right now", [("list_all_tasks", {}), ("highlight_task", {"task_id": 1})]),
+    ("can someone walk my dog tomorrow", [("create_task_draft", {"title": "Dog Walking",
+                                                                  "description": "Walk my dog for 30 minutes tomorrow",
+                                                                  "reward": 20})]),
+    ("anything for a tutor", [("search_available_tasks", {"keyword": "tutoring"})]),
+]
+
+
+class ScriptedCompletions(_common.FakeCompletions):
+    """First completion returns the scenario's tool calls; later ones return text."""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.calls = 0
+        self.script = []
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if kwargs.get("tools") and self.script:
+            time.sleep(self.latency)
+            tool_calls = [types.SimpleNamespace(id=f"call_{i}", type="function",
+                                                function=types.SimpleNamespace(name=name, arguments=json.dumps(args)))
+                          for i, (name, args) in enumerate(self.script)]
+            message = types.SimpleNamespace(content=None, tool_calls=tool_calls, role="assistant")
+            usage = types.SimpleNamespace(prompt_tokens=800, completion_tokens=30,
+                                          prompt_tokens_details=types.SimpleNamespace(cached_tokens=0))
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(finish_reason="tool_calls", message=message)],
+                                         usage=usage)
+        return super().create(**kwargs)
+
+
+def run(completions, direct):
+    ai_helpers.DIRECT_REPLIES = direct
+    rows = []
+    for message, script in SCENARIOS:
+        completions.script, completions.calls = script, 0
+        start = time.perf_counter()
+        result = ai_helpers.chat(message, 1, [], user_lat=37.77, user_lng=-122.42)
+        rows.append((message, completions.calls, time.perf_counter() - start, result))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llm-latency', type=float, default=0.6)
+    args = parser.parse_args()
+
+    path = _common.make_database()
+    completions = ScriptedCompletions(args.llm_latency)
+    openai.OpenAI = lambda *a, **kw: types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    intent_router.ENABLED = False
+    try:
+        before = run(completions, direct=False)
+        after = run(completions, direct=True)
+        rows = []
+        for (message, calls_old, t_old, _), (_, calls_new, t_new, result) in zip(before, after):
+            rows.append((message, f"{calls_old} -> {calls_new} completions   {t_old * 1000:6.0f} -> {t_new * 1000:6.0f} ms   "
+                                  f"cards: {len(result.get('found_tasks') or [])}"))
+        total_old = sum(r[2] for r in before)
+        total_new = sum(r[2] for r in after)
+        rows.append(("total", f"{total_old:.2f} s -> {total_new:.2f} s ({(1 - total_new / total_old) * 100:.0f}% saved)"))
+        _common.report(f"Direct tool replies — simulated LLM latency {args.llm_latency * 1000:.0f} ms", rows)
+        for message, _, _, result in after:
+            print(f"  {message!r}: {result['reply'][:110]}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: per-task pure-Python haversine + sort vs geo.nearest_tasks
+(vectorized NumPy haversine + argpartition top-k).
+
+Run:  python benchmarks/bench_geo.py [--tasks 100000] [--k 10]
+"""
+
+import argparse
+import math
+import random
+import time
+
+import _common
+import geo
+
+
+def python_nearest(lat, lng, tasks, k=None, radius_km=None):
+    """The old approach: math.haversine once per task, then a full Python sort."""
+    def haversine(lat1, lng1, lat2, lng2):
+        dlat = math.radians(lat2 - lat1)
+        dlng = math.radians(lng2 - lng1)
+        a = (math.sin(dlat / 2) ** 2 +
+             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2)
+        return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    for t in tasks:
+        t["distance_km"] = round(haversine(lat, lng, t["lat"], t["lng"]), 2)
+    if radius_km is not None:
+        tasks = [t for t in tasks if t["distance_km"] <= radius_km]
+    tasks.sort(key=lambda t: t["distance_km"])
+    return tasks[:k] if k else tasks
+
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tasks = [{"id": i, "lat": 37.77 + rng.uniform(-0.5, 0.5), "lng": -122.42 + rng.uniform(-0.5, 0.5)}
+             for i in range(args.tasks)]
+    rows = []
+    for label, kwargs in ((f"top {args.k}", {"k": args.k}), ("within 5 km", {"radius_km": 5}), ("all, sorted", {})):
+        old = best_of(lambda: python_nearest(37.77, -122.42, tasks, **kwargs))
+        new = best_of(lambda: geo.nearest_tasks(37.77, -122.42, tasks, **kwargs))
+        rows.append((label, f"python: {old * 1000:8.1f} ms   numpy: {new * 1000:8.1f} ms   ({old / new:5.1f}x)"))
+    _common.report(f"Nearest tasks — {args.tasks} tasks", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: local intent router hit rate, routing accuracy and latency saved.
+
+Sends a labelled mix of chat messages through ai_helpers.chat with a simulated
+LLM, once with the router disabled and once enabled, and reports how many
+messages were answered locally, whether they went to the expected tool, and
+the mean latency of each path.
+
+Run:  python benchmarks/bench_intent.py [--llm-latency 0.6]
+"""
+
+import argparse
+import os
+import time
+
+import _common
+import ai_helpers
+import intent_router
+import openai
+
+# (message, tool the router should pick or None for the LLM)
+MESSAGES = [
+    ("tasks within 2km", "search_nearby_tasks"),
+    ("show tasks within 5 km", "search_nearby_tasks"),
+    ("anything within 1 mile", "search_nearby_tasks"),
+    ("what's close to me", "search_nearby_tasks"),
+    ("tutoring within 3 km", "search_nearby_tasks"),
+    ("show all tasks", "list_all_tasks"),
+    ("list all available tasks", "list_all_tasks"),
+    ("show me all tasks", "list_all_tasks"),
+    ("find dog walking", "search_available_tasks"),
+    ("any gardening tasks", "search_available_tasks"),
+    ("show me moving jobs", "search_available_tasks"),
+    ("search for tutoring", "search_available_tasks"),
+    ("what tasks are available?", None),
+    ("find me work", None),
+    ("I need help moving a couch on Saturday", None),
+    ("how much should I charge for dog walking?", None),
+    ("what should I do this weekend", None),
+    ("hi!", None),
+    ("which task pays the best", None),
+    ("post a task for tutoring", None),
+    # Filters the local tools can't apply go to the LLM
+    ("list all tutoring tasks", None),
+    ("show all tasks that pay over $50", None),
+    ("show all tasks under 20 dollars", None),
+    ("tasks within 2km that are not gardening", None),
+    ("find tasks nearby except dog walking", None),
+    ("any gardening tasks without a deadline", None),
+    ("find cleaning jobs cheaper than $30", None),
+    ("tutoring tasks within 3km for seniors", None),
+    ("show me dog walking jobs that aren't far", None),
+]
+
+
+def run(enabled):
+    intent_router.ENABLED = enabled
+    local_times, llm_times, routed = [], [], {}
+    for message, _ in MESSAGES:
+        route = intent_router.route(message) if enabled else None
+        start = time.perf_counter()
+        ai_helpers.chat(message, 1, [], user_lat=37.77, user_lng=-122.42)
+        (local_times if route else llm_times).append(time.perf_counter() - start)
+        routed[message] = route.tool if route else None
+    return local_times, llm_times, routed
+
+
+def mean_ms(values):
+    return f"{sum(values) / len(values) * 1000:7.1f} ms" if values else "      -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llm-latency', type=float, default=0.6)
+    args = parser.parse_args()
+
+    path = _common.make_database(n_tasks=1000)
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    openai.OpenAI = lambda **kwargs: _common.FakeOpenAI(args.llm_latency)
+    try:
+        _, baseline, _ = run(False)
+        local, llm, routed = run(True)
+        expected_local = [m for m, tool in MESSAGES if tool]
+        hits = [m for m in expected_local if routed[m]]
+        correct = sum(1 for m, tool in MESSAGES if routed[m] == tool)
+        false_routes = [m for m, tool in MESSAGES if routed[m] and routed[m] != tool]
+        total_before = sum(baseline)
+        total_after = sum(local) + sum(llm)
+        _common.report(f"Intent router — {len(MESSAGES)} messages, simulated LLM latency "
+                       f"{args.llm_latency * 1000:.0f} ms", [
+            ("hit rate (all messages)", f"{len(local)}/{len(MESSAGES)} = {len(local) / len(MESSAGES):.0%}"),
+            ("hit rate (routable messages)", f"{len(hits)}/{len(expected_local)}"),
+            ("correct decisions", f"{correct}/{len(MESSAGES)}   wrong tool / should have gone to LLM: {false_routes or 'none'}"),
+            ("mean latency, router off", mean_ms(baseline)),
+            ("mean latency, local route", mean_ms(local)),
+            ("mean latency, LLM route", mean_ms(llm)),
+            ("total time", f"{total_before:.2f} s -> {total_after:.2f} s "
+                           f"({(1 - total_after / total_before):.0%} saved)"),
+        ])
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
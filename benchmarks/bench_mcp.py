@@ -0,0 +1,78 @@
+"""
+Benchmark: MCP tool throughput under many concurrent invocations.
+
+Compares running tool bodies inline on the event loop (the old behaviour) with
+call_tool, which offloads sqlite / LLM work to bounded thread pools. LLM latency
+is simulated with a fake client, so no API key is needed.
+
+Run:  python benchmarks/bench_mcp.py [--calls 200] [--llm-latency 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import _common
+import mcp_server
+import openai
+
+MIX = [
+    ("get_task_stats", {}),
+    ("search_tasks", {"keyword": "garden"}),
+    ("suggest_price", {"task_type": "moving"}),
+    ("search_tasks", {"keyword": "tutor"}),
+    ("get_recommended_tasks", {"user_id": 1}),
+]
+
+
+async def run_inline(calls):
+    """Old behaviour: blocking tool bodies run directly on the event loop."""
+    async def one(name, args):
+        return mcp_server._run_tool(name, args)
+    await asyncio.gather(*(one(*MIX[i % len(MIX)]) for i in range(calls)))
+
+
+async def run_offloaded(calls):
+    await asyncio.gather(*(mcp_server.call_tool(*MIX[i % len(MIX)]) for i in range(calls)))
+
+
+async def fast_tool_latency(runner, calls):
+    """Latency of one quick DB tool while `calls` mixed invocations are in flight."""
+    background = asyncio.ensure_future(runner(calls))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await mcp_server.call_tool("get_task_stats", {})
+    latency = time.perf_counter() - start
+    await background
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=100)
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    path = _common.make_database(n_tasks=args.tasks)
+    client = _common.FakeOpenAI(args.llm_latency)
+    openai.OpenAI = lambda *a, **kw: client
+    try:
+        rows = []
+        for label, runner in (("inline (blocking loop)", run_inline), ("offloaded (executors)", run_offloaded)):
+            start = time.perf_counter()
+            asyncio.run(runner(args.calls))
+            elapsed = time.perf_counter() - start
+            fast = asyncio.run(fast_tool_latency(runner, args.calls))
+            rows.append((label, f"{args.calls / elapsed:8.1f} calls/s   "
+                                f"get_task_stats under load: {fast * 1000:7.1f} ms"))
+        _common.report(f"MCP throughput — {args.calls} concurrent calls, {args.tasks} tasks, "
+                       f"LLM latency {args.llm_latency * 1000:.0f} ms, "
+                       f"pools db={mcp_server.MCP_DB_WORKERS} llm={mcp_server.MCP_LLM_WORKERS}", rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: /api/nearby throughput of the pre-fork server (gunicorn.conf.py)
+as the number of worker processes grows. Each run starts gunicorn in a temp
+directory holding a seeded database.db, then client processes send
+keep-alive requests for random spots around the seeded area.
+
+Near-linear scaling needs spare cores for the client processes too: on a
+machine with N cores, compare worker counts up to about N / 2.
+
+Run:  python benchmarks/bench_prefork.py [--workers 1,2,4] [--clients 16] [--duration 5]
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import _common
+
+PORT = 5091
+
+
+def _client(port, duration, seed, counts):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    done = errors = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        path = f"/api/nearby?lat={37.77 + rng.uniform(-0.05, 0.05):.4f}&lng={-122.42 + rng.uniform(-0.05, 0.05):.4f}"
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    counts.put((done, errors))
+
+
+def _wait_ready(port, timeout=30):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def run(workdir, workers, clients, duration):
+    """Requests per second (and errors) for one worker count."""
+    env = dict(os.environ, PYTHONPATH=_common.ROOT, WEB_WORKERS=str(workers), WEB_BIND=f'127.0.0.1:{PORT}',
+               WEB_ACCESS_LOG='', ADMISSION='0', JOB_WORKERS='0')
+    server = subprocess.Popen(['gunicorn', '-c', os.path.join(_common.ROOT, 'gunicorn.conf.py')],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(PORT)
+        # Half a second of traffic first so first-request costs stay out of the measurement
+        _client(PORT, 0.5, -1, multiprocessing.Queue())
+        counts = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client, args=(PORT, duration, i, counts)) for i in range(clients)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        results = [counts.get() for _ in procs]
+        elapsed = time.perf_counter() - start
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait(10)
+    return sum(r[0] for r in results) / elapsed, sum(r[1] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    default_workers = ','.join(str(2 ** i) for i in range(cores.bit_length()) if 2 ** i <= max(1, cores // 2))
+    parser.add_argument('--workers', default=default_workers, help='comma-separated worker counts')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+    if shutil.which('gunicorn') is None:
+        sys.exit("gunicorn is not installed (pip install -r requirements.txt)")
+
+    workdir = tempfile.mkdtemp(prefix='bench_prefork_')
+    path = _common.make_database(n_tasks=2000)
+    shutil.move(path, os.path.join(workdir, 'database.db'))
+    rows = []
+    base = None
+    try:
+        for workers in (int(w) for w in args.workers.split(',')):
+            rps, errors = run(workdir, workers, args.clients, args.duration)
+            base = base or rps / workers
+            rows.append((f"{workers} worker(s)", f"{rps:8.1f} req/s   {rps / (base * workers):6.0%} of linear   "
+                                                f"errors {errors}"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    _common.report(f"/api/nearby throughput, {args.clients} keep-alive clients, {cores} CPU core(s)", rows)
+
+
+if __name__ == '__main__':
+    main()
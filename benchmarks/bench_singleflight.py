@@ -0,0 +1,101 @@
+"""
+Benchmark: identical concurrent computations with and without single-flight
+coalescing — suggest_price for one task type (one LLM request each) and the
+/api/nearby layout for clients at the same spot.
+
+Run:  python benchmarks/bench_singleflight.py [--clients 32] [--llm-latency 0.3]
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _common
+import ai_helpers
+import app
+import openai
+
+
+class NoFlight:
+    """Pass-through stand-in: every caller computes."""
+
+    def do(self, key, compute, shareable=None):
+        return compute()
+
+
+class CountingCompletions(_common.FakeCompletions):
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return super().create(**kwargs)
+
+
+def burst(n, fn):
+    barrier = threading.Barrier(n)
+
+    def call(_):
+        barrier.wait()
+        return fn()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        list(pool.map(call, range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    path = _common.make_database(n_tasks=20000)
+    completions = CountingCompletions(args.llm_latency)
+    client = _common.FakeOpenAI()
+    client.chat.completions = completions
+    openai.OpenAI = lambda *a, **kw: client
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    app.admission.ENABLED = False
+
+    builds = {"n": 0}
+    build_nearby_tasks = app.build_nearby_tasks
+
+    def counting_build(*a, **kw):
+        builds["n"] += 1
+        return build_nearby_tasks(*a, **kw)
+
+    app.build_nearby_tasks = counting_build
+    local = threading.local()
+
+    def nearby():
+        if not hasattr(local, 'client'):
+            local.client = app.app.test_client()
+        local.client.get('/api/nearby?lat=37.77&lng=-122.42')
+
+    tool_flights, nearby_flights = ai_helpers._tool_flights, app._nearby_flights
+    try:
+        rows = []
+        for label, coalesce in (("no coalescing", False), ("single-flight", True)):
+            ai_helpers._tool_flights = tool_flights if coalesce else NoFlight()
+            app._nearby_flights = nearby_flights if coalesce else NoFlight()
+            completions.calls, builds["n"] = 0, 0
+            # Measure coalescing alone, not answers cached by the previous round
+            ai_helpers._price_cache.invalidate()
+            t_price = burst(args.clients, lambda: ai_helpers.execute_tool("suggest_price", {"task_type": "moving"}))
+            t_nearby = burst(args.clients, nearby)
+            rows.append((label, f"suggest_price: {completions.calls:3d} LLM calls {t_price * 1000:6.0f} ms   "
+                                f"nearby: {builds['n']:3d} layout builds {t_nearby * 1000:6.0f} ms"))
+        _common.report(f"Single-flight — {args.clients} identical concurrent requests", rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cold start and first-request latency, with and without the
+create_app() warm-up. Every trial is a fresh interpreter: it imports app,
+runs create_app(warm=...) against a seeded database, then times the first
+and second GET /, GET /api/nearby and POST /api/chat (simulated LLM, but
+the real openai import and client construction).
+
+Run:  python benchmarks/bench_startup.py [--trials 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+REQUESTS = [
+    ('GET /', 'get', '/', None),
+    ('GET /api/nearby', 'get', '/api/nearby?lat=37.77&lng=-122.42', None),
+    ('POST /api/chat', 'post', '/api/chat', {'message': 'what should I do this weekend?'}),
+]
+
+
+def child(db_path, warm):
+    """One cold process: prints {step: ms} as JSON."""
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import app
+    timings = {'import app': (time.perf_counter() - start) * 1000}
+
+    import _common
+    import llm_usage
+    _common.point_modules_at(db_path)
+    fake = _common.FakeCompletions(0)
+    llm_usage.create_completion = lambda client, tool=None, user_id=None, **kwargs: fake.create(**kwargs)
+
+    start = time.perf_counter()
+    app.create_app(warm=warm, start_jobs=False)
+    timings['create_app'] = (time.perf_counter() - start) * 1000
+
+    client = app.app.test_client()
+    for label, method, path, body in REQUESTS:
+        for attempt in ('first', 'second'):
+            start = time.perf_counter()
+            response = getattr(client, method)(path, json=body)
+            timings[f'{label} ({attempt})'] = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, (path, response.status_code)
+    print(json.dumps(timings))
+
+
+def run_trials(db_path, warm, trials):
+    env = dict(os.environ, OPENAI_API_KEY='bench', ADMISSION='0')
+    runs = []
+    for _ in range(trials):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', db_path, '--warm', str(int(warm))],
+                             env=env, cwd=HERE, capture_output=True, text=True)
+        if out.returncode:
+            sys.exit(out.stderr)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {step: statistics.median(run[step] for run in runs) for step in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--warm', type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, bool(args.warm))
+        return
+
+    import _common
+    path = _common.make_database(n_tasks=5000)
+    try:
+        lazy = run_trials(path, False, args.trials)
+        warm = run_trials(path, True, args.trials)
+    finally:
+        os.remove(path)
+
+    rows = [(step, f"lazy {lazy[step]:8.1f} ms   warm {warm[step]:8.1f} ms") for step in lazy]
+    cold_lazy = lazy['import app'] + lazy['create_app'] + sum(v for k, v in lazy.items() if 'first' in k)
+    cold_warm = warm['import app'] + warm['create_app'] + sum(v for k, v in warm.items() if 'first' in k)
+    rows.append(("start + first of each request", f"lazy {cold_lazy:8.1f} ms   warm {cold_warm:8.1f} ms"))
+    _common.report(f"Startup, median of {args.trials} fresh processes", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Bulk task operations — post, accept or delete many tasks in one transaction.
+
+Each function validates its items, applies the valid ones with a single
+executemany inside one BEGIN IMMEDIATE transaction (one commit, one fsync), and
+returns one result dict per input item, in input order:
+    {"index": i, "status": "posted" | "accepted" | "already_accepted" | "deleted" | "not_found" | "error", ...}
+"""
+
+import os
+
+import categories
+
+MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '500'))
+
+# Custom (DB) tasks are shown on the map with this offset added to their id
+MAP_ID_OFFSET = 10000
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+def _check_size(items):
+    if len(items) > MAX_ITEMS:
+        raise BatchTooLarge(f"At most {MAX_ITEMS} items per batch (got {len(items)})")
+
+
+def _chunks(values, size=500):
+    # Stay well below SQLite's bound-parameter limit for IN (...) lookups
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _begin(conn):
+    # Take the write lock up front so the reads below see what the writes will act on
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+
+
+def check_location(lat, lng):
+    """Raise ValueError unless lat/lng are numbers within range (also used by /api/post_task)."""
+    for name, value, limit in (("lat", lat, 90), ("lng", lng, 180)):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{name} must be a number")
+        if not -limit <= value <= limit:
+            raise ValueError(f"{name} must be between -{limit} and {limit}")
+
+
+def _task_values(item):
+    """Validate one task payload; return (title, description, reward, lat, lng) or raise ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Item must be an object")
+    title = item.get('title')
+    if not title or not isinstance(title, str):
+        raise ValueError("Missing title")
+    reward = item.get('reward')
+    if reward is not None and not isinstance(reward, (int, float)):
+        raise ValueError("reward must be a number")
+    check_location(item.get('lat'), item.get('lng'))
+    return title, item.get('description'), reward, item.get('lat'), item.get('lng')
+
+
+def post_tasks(conn, items):
+    """Insert new 'posted' tasks. Results carry the DB id and the map id (offset by MAP_ID_OFFSET)."""
+    _check_size(items)
+    results, rows = [], []
+    for i, item in enumerate(items):
+        try:
+            title, description, reward, lat, lng = _task_values(item)
+        except ValueError as e:
+            results.append({"index": i, "status": "error", "error": str(e)})
+            continue
+        rows.append((title, description, reward, lat, lng, 'posted', categories.classify(title, description)))
+        results.append({"index": i, "status": "posted"})
+    if not rows:
+        return results
+
+    _begin(conn)
+    try:
+        conn.executemany(
+            'INSERT INTO tasks (title, description, reward, lat, lng, status, category) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        # AUTOINCREMENT ids are consecutive inside one write transaction
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    next_id = last_id - len(rows) + 1
+    for result in results:
+        if result["status"] == "posted":
+            result["id"], result["map_id"] = next_id, next_id + MAP_ID_OFFSET
+            next_id += 1
+    return results
+
+
+def accept_tasks(conn, items):
+    """Accept map tasks by their map `id`; repeats (in the DB or within the batch) become 'already_accepted'."""
+    _check_size(items)
+    results, rows = [], []
+    for i, item in enumerate(items):
+        try:
+            values = _task_values(item)
+            original_id = item.get('id')
+            if not isinstance(original_id, int):
+                raise ValueError("Missing map id")
+        except ValueError as e:
+            results.append({"index": i, "status": "error", "error": str(e)})
+            continue
+        title, description = values[0], values[1]
+        rows.append((*values, original_id, categories.classify(title, description)))
+        results.append({"index": i, "status": "accepted", "original_id": original_id})
+    if not rows:
+        return results
+
+    original_ids = list({row[5] for row in rows})
+    _begin(conn)
+    try:
+        existing = set()
+        for chunk in _chunks(original_ids):
+            placeholders = ", ".join("?" for _ in chunk)
+            existing.update(r[0] for r in conn.execute(
+                f'SELECT original_id FROM tasks WHERE original_id IN ({placeholders})', chunk))
+        conn.executemany(
+            'INSERT INTO tasks (title, description, reward, lat, lng, original_id, category) VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (original_id) DO NOTHING',
+            rows
+        )
+        ids = {}
+        for chunk in _chunks(original_ids):
+            placeholders = ", ".join("?" for _ in chunk)
+            ids.update((r[1], r[0]) for r in conn.execute(
+                f'SELECT id, original_id FROM tasks WHERE original_id IN ({placeholders})', chunk))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for result in results:
+        if result["status"] != "accepted":
+            continue
+        original_id = result["original_id"]
+        result["id"] = ids.get(original_id)
+        if original_id in existing:
+            result["status"] = "already_accepted"
+        else:
+            existing.add(original_id)  # later duplicates in the same batch
+    return results
+
+
+def _delete_id(value, field):
+    """DB id for one entry of `ids` (DB ids) or `map_ids` (custom-task map ids); raises ValueError."""
+    if isinstance(value, dict):
+        value = value.get('id')
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError("id must be a positive integer")
+    if field == "ids":
+        return value
+    # Map ids up to the offset are the generated demo tasks, which live in no table
+    if value <= MAP_ID_OFFSET:
+        raise ValueError("Cannot delete system tasks")
+    return value - MAP_ID_OFFSET
+
+
+def delete_tasks(conn, ids=(), map_ids=()):
+    """Delete DB tasks given by DB id (`ids`) and/or map id (`map_ids`, offset by MAP_ID_OFFSET).
+
+    The two are separate because the same number can be both once the table is
+    large. Results carry "field" and the index within that list; deleted ones include lat/lng.
+    """
+    entries = [("ids", i, v) for i, v in enumerate(ids)] + [("map_ids", i, v) for i, v in enumerate(map_ids)]
+    _check_size(entries)
+    results, db_ids = [], []
+    for field, i, value in entries:
+        try:
+            db_id = _delete_id(value, field)
+        except ValueError as e:
+            results.append({"field": field, "index": i, "status": "error", "error": str(e)})
+            continue
+        db_ids.append(db_id)
+        results.append({"field": field, "index": i, "status": "deleted", "id": db_id})
+    if not db_ids:
+        return results
+
+    unique_ids = list(set(db_ids))
+    _begin(conn)
+    try:
+        found = {}
+        for chunk in _chunks(unique_ids):
+            placeholders = ", ".join("?" for _ in chunk)
+            found.update((r[0], (r[1], r[2])) for r in conn.execute(
+                f'SELECT id, lat, lng FROM tasks WHERE id IN ({placeholders})', chunk))
+        conn.executemany('DELETE FROM tasks WHERE id = ?', [(db_id,) for db_id in found])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for result in results:
+        if result["status"] == "deleted":
+            if result["id"] in found:
+                result["lat"], result["lng"] = found.pop(result["id"])
+            else:
+                result["status"] = "not_found"
+    return results
@@ -0,0 +1,245 @@
+"""
+Caches shared by every request / session in a server process. Hits and
+misses are counted in metrics (cache_requests_total).
+
+TTLCache lives in process memory. SharedCache has the same interface but
+keeps its entries in a local SQLite file (CACHE_PATH), so every worker of
+the pre-fork server (gunicorn.conf.py) sees one cache and an invalidation in
+one worker reaches all of them. make() picks the backend from CACHE_BACKEND
+(local / shared).
+
+SingleFlight coalesces identical concurrent computations: the first caller
+for a key computes it, concurrent duplicates wait and share the result
+(counted in singleflight_total by leader / shared).
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import deadline
+import metrics
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')
+CACHE_PATH = os.getenv('CACHE_PATH', 'cache.db')
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, name, ttl, maxsize=1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                metrics.record_cache(self.name, True)
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+        metrics.record_cache(self.name, False)
+        return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedCache:
+    """TTLCache backed by a SQLite file shared between processes.
+
+    Values are pickled. Expiry uses wall-clock time; above `maxsize` entries
+    the ones closest to expiring are dropped. Errors (e.g. a busy database)
+    count as misses and skipped writes: a cache must never fail a request.
+    """
+
+    # Trim to maxsize every this many writes rather than on each one
+    TRIM_EVERY = 64
+
+    _local = threading.local()
+
+    def __init__(self, name, ttl, maxsize=1024, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path or CACHE_PATH
+        self._writes = 0
+
+    def _conn(self):
+        # One connection per thread and per process: SQLite handles must not cross a fork
+        conns = getattr(self._local, 'conns', None)
+        if conns is None or self._local.pid != os.getpid():
+            conns = self._local.conns = {}
+            self._local.pid = os.getpid()
+        conn = conns.get(self.path)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries (cache TEXT NOT NULL, key TEXT NOT NULL, '
+                'value BLOB NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (cache, key)) WITHOUT ROWID'
+            )
+            conns[self.path] = conn
+        return conn
+
+    def get(self, key, default=None):
+        try:
+            row = self._conn().execute(
+                'SELECT value FROM cache_entries WHERE cache = ? AND key = ? AND expires_at > ?',
+                (self.name, repr(key), time.time())
+            ).fetchone()
+            value = pickle.loads(row[0]) if row is not None else _MISSING
+        except (sqlite3.Error, pickle.UnpicklingError):
+            value = _MISSING
+        metrics.record_cache(self.name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute('INSERT OR REPLACE INTO cache_entries (cache, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                         (self.name, repr(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + self.ttl))
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                conn.execute('DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?', (self.name, now))
+                conn.execute(
+                    'DELETE FROM cache_entries WHERE cache = ? AND key IN (SELECT key FROM cache_entries '
+                    'WHERE cache = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                    (self.name, self.name, self.maxsize)
+                )
+        except sqlite3.Error:
+            pass
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None (in every process)."""
+        try:
+            if key is None:
+                self._conn().execute('DELETE FROM cache_entries WHERE cache = ?', (self.name,))
+            else:
+                self._conn().execute('DELETE FROM cache_entries WHERE cache = ? AND key = ?', (self.name, repr(key)))
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        row = self._conn().execute('SELECT COUNT(*) FROM cache_entries WHERE cache = ? AND expires_at > ?',
+                                   (self.name, time.time())).fetchone()
+        return row[0]
+
+
+def close_connections():
+    """Close this thread's SharedCache connections (before forking; they reopen on next use)."""
+    for conn in getattr(SharedCache._local, 'conns', {}).values():
+        conn.close()
+    SharedCache._local.conns = None
+
+
+def make(name, ttl, maxsize=1024):
+    """A TTLCache, or a SharedCache when CACHE_BACKEND=shared (multi-process servers)."""
+    if CACHE_BACKEND == 'shared':
+        return SharedCache(name, ttl, maxsize)
+    return TTLCache(name, ttl, maxsize)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'shareable')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shareable = True
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute, shareable=None):
+        """compute() for the first caller of `key`; duplicates arriving meanwhile get the same
+        result (or exception). Waiters give up with DeadlineExceeded when their own budget ends.
+
+        An outcome shaped by the leader's own budget is not handed on: when the leader
+        hit DeadlineExceeded, or shareable(result) is false (e.g. a degraded fallback),
+        waiters run the computation again under their own deadline.
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+
+            if leader:
+                break
+            metrics.SINGLEFLIGHT.inc(self.name, "shared")
+            if not flight.done.wait(deadline.timeout()):
+                raise deadline.DeadlineExceeded(f"singleflight:{self.name}")
+            if not flight.shareable:
+                metrics.SINGLEFLIGHT.inc(self.name, "retried")
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        metrics.SINGLEFLIGHT.inc(self.name, "leader")
+        try:
+            flight.result = compute()
+            flight.shareable = shareable is None or bool(shareable(flight.result))
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            flight.shareable = not isinstance(e, deadline.DeadlineExceeded)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def __len__(self):
+        return len(self._flights)
@@ -0,0 +1,63 @@
+"""
+Task categories — maps a task (or a free-text task type such as "dog walking")
+onto one canonical category, used for per-category statistics and pricing.
+
+Titles with a "Category - Detail" prefix ("Gardening - Urgent") use the prefix;
+everything else is classified by keyword.
+"""
+
+import re
+
+OTHER = "Other"
+
+CATEGORY_KEYWORDS = {
+    "Moving": ["moving", "move", "relocate", "couch", "boxes", "unload", "truck", "heavy", "lift"],
+    "Pet Care": ["pet", "dog", "cat", "husk", "puppy", "kitten", "walk my"],
+    "Gardening": ["garden", "yard", "lawn", "hedge", "weed", "leaves", "plant", "mow", "rake"],
+    "Tutoring": ["tutor", "homework", "math", "algebra", "calculus", "science", "reading", "lesson"],
+    "Tech Support": ["tech", "computer", "printer", "wifi", "tv", "smartphone", "laptop", "router"],
+    "Errands": ["errand", "grocer", "pick up", "pickup", "pharmacy", "prescription", "dry cleaning", "delivery"],
+    "Cleaning": ["clean", "window", "washing", "declutter", "organize"],
+    "Assembly": ["assemble", "assembly", "ikea", "furniture", "mount", "desk"],
+    "Auto Care": ["car", "auto", "detailing", "sedan", "bike", "tire"],
+    "Event Help": ["event", "party", "bartend", "waitstaff", "catering"],
+    "Community": ["volunteer", "community", "elderly", "food bank", "library", "neighbor", "language swap", "litter"],
+}
+
+# Title prefixes that aren't literally a category name
+PREFIX_ALIASES = {
+    "moving help": "Moving",
+    "pet sitting": "Pet Care",
+    "yard work": "Gardening",
+    "errand": "Errands",
+    "event": "Event Help",
+}
+
+_CANONICAL = {name.lower(): name for name in CATEGORY_KEYWORDS}
+_CANONICAL.update(PREFIX_ALIASES)
+
+
+def _pattern(keyword):
+    # Short keywords must match a whole word ("car" but not "care"); longer ones may be a prefix ("tutor" -> "tutoring")
+    suffix = r'\b' if len(keyword) <= 3 else ''
+    return re.compile(r'\b' + re.escape(keyword) + suffix)
+
+
+_PATTERNS = [(name, [_pattern(k) for k in keywords]) for name, keywords in CATEGORY_KEYWORDS.items()]
+
+
+def classify(title, description=''):
+    """Canonical category for a task title (+ description), or "Other"."""
+    title = (title or '').strip()
+    if ' - ' in title:
+        prefix = title.split(' - ', 1)[0].strip().lower()
+        if prefix in _CANONICAL:
+            return _CANONICAL[prefix]
+
+    text = f"{title} {description or ''}".lower()
+    best, best_score = OTHER, 0
+    for name, patterns in _PATTERNS:
+        score = sum(1 for p in patterns if p.search(text))
+        if score > best_score:
+            best, best_score = name, score
+    return best
@@ -0,0 +1,68 @@
+"""
+Change-data-capture log — triggers append one row to `change_log` for every
+insert/update/delete on tasks, available_tasks and users, so readers (e.g. the
+MCP server's resource subscriptions) can find out what changed without polling
+whole tables.
+"""
+
+WATCHED_TABLES = {
+    # table: primary key column
+    "tasks": "id",
+    "available_tasks": "map_id",
+    "users": "id",
+}
+
+KEEP_ROWS = 10000
+
+
+def init_schema(conn):
+    """Create the change_log table and its triggers (idempotent)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for table, pk in WATCHED_TABLES.items():
+        for op, ref in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_changelog_{op.lower()} AFTER {op} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {ref}.{pk}, '{op}');
+                END
+            ''')
+
+
+def latest_id(conn):
+    row = conn.execute('SELECT MAX(id) FROM change_log').fetchone()
+    return row[0] or 0
+
+
+def changes_since(conn, after_id, limit=1000):
+    """Changes with id > after_id, oldest first, as dicts."""
+    rows = conn.execute(
+        'SELECT id, table_name, row_id, op, changed_at FROM change_log WHERE id > ? ORDER BY id LIMIT ?',
+        (after_id, limit)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def prune(conn, keep=KEEP_ROWS):
+    """Drop all but the newest `keep` entries."""
+    conn.execute('DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - ?', (keep,))
+    conn.commit()
+
+
+def prune_if_due(conn, keep=KEEP_ROWS, slack=1000):
+    """prune() once the log spans `slack` more ids than `keep`; two index lookups otherwise.
+
+    Called on the app's high-volume write paths (map snapshots, bulk writes), so
+    the log stays bounded without the MCP server's watcher running.
+    """
+    oldest = conn.execute('SELECT MIN(id) FROM change_log').fetchone()[0]
+    if oldest is not None and latest_id(conn) - oldest >= keep + slack:
+        prune(conn, keep)
+        return True
+    return False
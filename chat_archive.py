@@ -0,0 +1,187 @@
+"""
+Chat history compaction — keeps `chat_messages` (the hot table read on every
+chat turn) bounded per user. Once a user has more than CHAT_COMPACT_AT
+messages, a background job (jobs.py) folds everything but the newest
+CHAT_HOT_KEEP into a rolling per-user summary, moves those rows to
+`chat_archive`, and the summary is injected into the prompt by
+ai_helpers.build_messages. The prompt carries every hot message (recent_history)
+plus the summary, so no turn falls between the two; prompt size stays bounded.
+
+    CHAT_HOT_KEEP=10   CHAT_COMPACT_AT=20   CHAT_SUMMARY_MAX_CHARS=1500
+"""
+
+import os
+import time
+
+import db
+import jobs
+import llm_usage
+
+DATABASE = 'database.db'
+
+JOB_KIND = "chat_compaction"
+
+CHAT_HOT_KEEP = int(os.getenv('CHAT_HOT_KEEP', '10'))
+CHAT_COMPACT_AT = int(os.getenv('CHAT_COMPACT_AT', '20'))
+SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', '1500'))
+
+SUMMARY_PROMPT = """You maintain a running summary of a user's conversation with the "Find a Helper" assistant.
+Update the summary with the new messages below. Keep what matters for future turns: the user's goals,
+skills and preferences, tasks they were interested in, posted or accepted (with prices), and open questions.
+Drop greetings and small talk. Write at most {max_chars} characters of plain prose.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}"""
+
+
+def init_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp DATETIME,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_archive_user ON chat_archive (user_id, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            user_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            archived_through INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+
+def needs_compaction(conn, user_id):
+    row = conn.execute('SELECT COUNT(*) FROM chat_messages WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] > CHAT_COMPACT_AT
+
+
+def recent_history(conn, user_id):
+    """Every hot (not yet archived) message, oldest first, as prompt messages.
+
+    Capped at twice CHAT_COMPACT_AT in case compaction is falling behind.
+    """
+    rows = conn.execute(
+        'SELECT role, content FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+        (user_id, 2 * CHAT_COMPACT_AT)
+    ).fetchall()
+    return [{'role': r['role'], 'content': r['content']} for r in reversed(rows)]
+
+
+def get_summary(conn, user_id):
+    row = conn.execute('SELECT summary FROM chat_summaries WHERE user_id = ?', (user_id,)).fetchone()
+    return row['summary'] if row else None
+
+
+def _transcript(rows):
+    return "\n".join(f"{r['role']}: {r['content']}" for r in rows)
+
+
+def _extractive_summary(summary, rows):
+    """Fallback when the model is unavailable: keep the user's recent requests verbatim."""
+    requests = [r['content'].strip() for r in rows if r['role'] == 'user']
+    text = ((summary + " ") if summary else "") + "Earlier the user asked: " + "; ".join(requests) + "."
+    # Keep the newest part when over budget
+    return text[-SUMMARY_MAX_CHARS:]
+
+
+def summarize(summary, rows, user_id=None):
+    """New rolling summary from the previous one plus the rows being archived."""
+    try:
+        if not os.getenv('OPENAI_API_KEY'):
+            return _extractive_summary(summary, rows)
+        response = llm_usage.create_completion(
+            llm_usage.get_openai_client(), tool="chat_summary", user_id=user_id,
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": SUMMARY_PROMPT.format(
+                max_chars=SUMMARY_MAX_CHARS, summary=summary or "(none yet)", transcript=_transcript(rows))}],
+            max_tokens=400,
+            temperature=0.2
+        )
+        text = (response.choices[0].message.content or "").strip()
+        return text[:SUMMARY_MAX_CHARS] if text else _extractive_summary(summary, rows)
+    except Exception:
+        return _extractive_summary(summary, rows)
+
+
+def compact(conn, user_id, keep=None):
+    """Summarize and archive all but the newest `keep` messages; returns how many were archived."""
+    keep = CHAT_HOT_KEEP if keep is None else keep
+    cutoff = conn.execute(
+        'SELECT id FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?', (user_id, keep)
+    ).fetchone()
+    if cutoff is None:
+        return 0
+    cutoff = cutoff['id']
+    rows = conn.execute(
+        'SELECT id, role, content, timestamp FROM chat_messages WHERE user_id = ? AND id <= ? ORDER BY id',
+        (user_id, cutoff)
+    ).fetchall()
+
+    # The model call happens before any write, so no lock is held while it runs
+    summary = summarize(get_summary(conn, user_id), rows, user_id)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(
+            'INSERT OR IGNORE INTO chat_archive (id, user_id, role, content, timestamp) '
+            'SELECT id, user_id, role, content, timestamp FROM chat_messages WHERE user_id = ? AND id <= ?',
+            (user_id, cutoff)
+        )
+        deleted = conn.execute('DELETE FROM chat_messages WHERE user_id = ? AND id <= ?', (user_id, cutoff)).rowcount
+        if not deleted:
+            # History was cleared while summarizing: don't resurrect a summary
+            conn.rollback()
+            return 0
+        conn.execute(
+            'INSERT INTO chat_summaries (user_id, summary, archived_through, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (user_id) DO UPDATE SET summary = excluded.summary, '
+            'archived_through = excluded.archived_through, updated_at = excluded.updated_at',
+            (user_id, summary, cutoff, time.time())
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def archived(conn, user_id, before=None, limit=50):
+    """One page of archived messages, newest first (use the last id as `before` for the next page)."""
+    rows = conn.execute(
+        'SELECT id, role, content, timestamp FROM chat_archive WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+        (user_id, before if before is not None else 2 ** 63 - 1, limit)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def clear(conn, user_id):
+    """Forget a user's archive and summary (the hot rows are deleted by the caller)."""
+    conn.execute('DELETE FROM chat_archive WHERE user_id = ?', (user_id,))
+    conn.execute('DELETE FROM chat_summaries WHERE user_id = ?', (user_id,))
+
+
+def _run_job(payload):
+    conn = db.connect(DATABASE)
+    try:
+        compact(conn, payload["user_id"])
+    finally:
+        conn.close()
+
+
+jobs.register(JOB_KIND, _run_job)
+
+
+def schedule(conn, user_id):
+    """Queue a compaction if the user's hot history is over the limit; returns the job id or None."""
+    if not needs_compaction(conn, user_id):
+        return None
+    return jobs.enqueue(JOB_KIND, key=user_id, payload={"user_id": user_id})
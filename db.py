@@ -0,0 +1,149 @@
+"""
+SQLite connection helper shared by app.py, ai_helpers.py and mcp_server.py.
+
+Connections are created with InstrumentedConnection so every statement that goes
+through `get_db`, `_query_db` or `query_db` is timed and counted in metrics.
+
+Query-plan audit (development / tests): set QUERY_AUDIT=warn or QUERY_AUDIT=strict
+(any other value leaves it off) and the first time each distinct statement runs,
+including through executemany, `EXPLAIN QUERY PLAN` is recorded.
+A full `SCAN` of a table with at least QUERY_AUDIT_MIN_ROWS rows (default 1000)
+emits a FullTableScanWarning (warn) or raises FullTableScanError (strict).
+`audit_report()` lists every statement seen with its plan; set QUERY_AUDIT_REPORT
+to a file path to have the report written at exit.
+"""
+
+import atexit
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+
+import metrics
+import tracing
+
+QUERY_AUDIT = os.getenv('QUERY_AUDIT', '').lower()
+if QUERY_AUDIT not in ('warn', 'strict'):
+    # Anything else ("0", "off", a typo) leaves the audit off
+    QUERY_AUDIT = ''
+QUERY_AUDIT_MIN_ROWS = int(os.getenv('QUERY_AUDIT_MIN_ROWS', '1000'))
+QUERY_AUDIT_REPORT = os.getenv('QUERY_AUDIT_REPORT', '')
+
+_AUDITED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT')
+_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+class FullTableScanWarning(UserWarning):
+    """A statement's query plan scans a large table."""
+
+
+class FullTableScanError(RuntimeError):
+    """Raised instead of FullTableScanWarning when QUERY_AUDIT=strict."""
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that records the duration of each statement."""
+
+    def execute(self, sql, parameters=(), /):
+        if QUERY_AUDIT:
+            self._audit(sql, parameters)
+        with tracing.child_span("sql", statement=metrics.statement_label(sql)):
+            start = time.perf_counter()
+            try:
+                cur = super().execute(sql, parameters)
+            except sqlite3.Error:
+                metrics.observe_query(sql, time.perf_counter() - start, error=True)
+                raise
+            metrics.observe_query(sql, time.perf_counter() - start)
+            return cur
+
+    def executemany(self, sql, seq_of_parameters, /):
+        if QUERY_AUDIT:
+            # Plan the statement with its first parameter set, then run all of them
+            seq_of_parameters = iter(seq_of_parameters)
+            first = next(seq_of_parameters, None)
+            if first is not None:
+                self._audit(sql, first)
+                seq_of_parameters = itertools.chain((first,), seq_of_parameters)
+        with tracing.child_span("sql", statement=metrics.statement_label(sql), many=True):
+            start = time.perf_counter()
+            try:
+                cur = super().executemany(sql, seq_of_parameters)
+            except sqlite3.Error:
+                metrics.observe_query(sql, time.perf_counter() - start, error=True)
+                raise
+            metrics.observe_query(sql, time.perf_counter() - start)
+            return cur
+
+    def _audit(self, sql, parameters):
+        """Record (once per statement) the query plan and flag scans of large tables."""
+        label = metrics.statement_label(sql)
+        if label in _plans or not label.upper().startswith(_AUDITED_PREFIXES):
+            return
+        try:
+            plan = [row[3] for row in super().execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()]
+        except sqlite3.Error:
+            return
+        large_scans = []
+        for detail in plan:
+            match = _SCAN_RE.match(detail)
+            if not match:
+                continue
+            rows = self._table_rows(match.group(1))
+            if rows is not None and rows >= QUERY_AUDIT_MIN_ROWS:
+                large_scans.append(f"{detail} (~{rows} rows)")
+        with _plans_lock:
+            _plans[label] = {"statement": label, "plan": plan, "large_scans": large_scans}
+        if large_scans:
+            message = f"Full table scan in: {label}\n  " + "\n  ".join(large_scans)
+            if QUERY_AUDIT == 'strict':
+                raise FullTableScanError(message)
+            warnings.warn(message, FullTableScanWarning, stacklevel=3)
+
+    def _table_rows(self, name):
+        """Row count of a table, or None if `name` is an alias / subquery rather than a table."""
+        exists = super().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+        if not exists:
+            return None
+        return super().execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+
+
+def connect(database):
+    """Open an instrumented connection that returns sqlite3.Row rows."""
+    conn = sqlite3.connect(database, factory=InstrumentedConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def audit_report():
+    """Every audited statement with its query plan, flagged statements first."""
+    with _plans_lock:
+        entries = list(_plans.values())
+    return sorted(entries, key=lambda e: (not e["large_scans"], e["statement"]))
+
+
+def format_audit_report():
+    lines = []
+    for entry in audit_report():
+        flag = "SCAN!" if entry["large_scans"] else "ok"
+        lines.append(f"[{flag}] {entry['statement']}")
+        lines.extend(f"    {detail}" for detail in entry["plan"])
+    return "\n".join(lines) + "\n"
+
+
+def _write_audit_report():
+    if _plans:
+        with open(QUERY_AUDIT_REPORT, 'w') as f:
+            f.write(format_audit_report())
+
+
+if QUERY_AUDIT and QUERY_AUDIT_REPORT:
+    atexit.register(_write_audit_report)
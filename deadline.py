@@ -0,0 +1,73 @@
+"""
+Per-request time budgets — a deadline set once at the edge (e.g. /api/chat)
+and read by everything below it (build_messages, execute_tool, LLM calls)
+through a context variable, the same way tracing propagates spans.
+
+    with deadline.scope(8.0):
+        ...
+        deadline.check("execute_tool")       # raises DeadlineExceeded when spent
+        timeout = deadline.timeout(30.0)     # min(30, remaining) for a client call
+
+    CHAT_DEADLINE_MS=8000     budget for one /api/chat turn (0 disables)
+"""
+
+import contextlib
+import contextvars
+import os
+import time
+
+CHAT_DEADLINE = int(os.getenv('CHAT_DEADLINE_MS', '8000')) / 1000
+# Don't start a call that cannot finish: below this much budget it is treated as spent
+MIN_CALL_BUDGET = int(os.getenv('DEADLINE_MIN_CALL_MS', '250')) / 1000
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out at `stage`."""
+
+    def __init__(self, stage):
+        super().__init__(f"deadline exceeded at {stage}")
+        self.stage = stage
+
+
+@contextlib.contextmanager
+def scope(seconds):
+    """Run the block with a deadline `seconds` from now (no deadline when seconds is falsy).
+
+    A nested scope can only shorten the enclosing deadline, never extend it.
+    """
+    outer = _current.get()
+    at = time.monotonic() + seconds if seconds else None
+    if outer is not None and (at is None or outer < at):
+        at = outer
+    token = _current.set(at)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def remaining():
+    """Seconds left in the current budget, or None when there is no deadline."""
+    at = _current.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def expired():
+    left = remaining()
+    return left is not None and left < MIN_CALL_BUDGET
+
+
+def check(stage):
+    """Raise DeadlineExceeded if the budget is (nearly) spent before `stage` starts."""
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def timeout(cap=None):
+    """Timeout for a blocking call: the remaining budget, capped at `cap` (None = no limit)."""
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(cap, left)
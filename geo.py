@@ -0,0 +1,135 @@
+"""
+Map geometry helpers — bounding boxes, Web Mercator pixel coordinates,
+server-side grid clustering of task markers for /api/nearby, and vectorized
+(NumPy) haversine distances with k-nearest-neighbour selection.
+"""
+
+import math
+import os
+
+import numpy as np
+
+TILE_SIZE = 256
+# Cluster cell edge in screen pixels (divides TILE_SIZE so cells never straddle tiles)
+CLUSTER_CELL_PX = int(os.getenv('CLUSTER_CELL_PX', '64'))
+# Zoom levels below this are clustered; at or above it individual tasks are returned
+CLUSTER_MAX_ZOOM = int(os.getenv('CLUSTER_MAX_ZOOM', '14'))
+# Cluster anyway when a viewport holds more individual tasks than this
+MAX_MARKERS = int(os.getenv('NEARBY_MAX_MARKERS', '500'))
+
+MAX_LAT = 85.05112878
+# Deepest slippy-map zoom; /api/nearby clamps its zoom to 0..MAX_ZOOM
+MAX_ZOOM = 22
+
+
+def parse_bbox(value):
+    """'south,west,north,east' -> (south, west, north, east); raises ValueError."""
+    parts = [float(p) for p in (value or '').split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be south,west,north,east")
+    south, west, north, east = parts
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("bbox out of range")
+    return south, west, north, east
+
+
+def in_bbox(lat, lng, bbox):
+    south, west, north, east = bbox
+    if lat is None or lng is None or not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lng <= east
+    return lng >= west or lng <= east  # bbox crosses the antimeridian
+
+
+def to_pixels(lat, lng, zoom):
+    """Web Mercator world pixel coordinates of a point at `zoom`."""
+    scale = TILE_SIZE * (2 ** zoom)
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0 * scale
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def should_cluster(zoom, n_tasks):
+    return zoom < CLUSTER_MAX_ZOOM or n_tasks > MAX_MARKERS
+
+
+def grid_cluster(tasks, zoom, cell_px=CLUSTER_CELL_PX):
+    """Group tasks into square pixel cells at `zoom`.
+
+    Returns (singles, clusters): cells holding one task keep the task as is;
+    the rest become {"type": "cluster", "count", "lat", "lng" (centroid),
+    "bounds": [south, west, north, east], "total_reward", "ids"}.
+    """
+    cells = {}
+    for task in tasks:
+        x, y = to_pixels(task['lat'], task['lng'], zoom)
+        cells.setdefault((int(x // cell_px), int(y // cell_px)), []).append(task)
+
+    singles, clusters = [], []
+    for members in cells.values():
+        if len(members) == 1:
+            singles.append(members[0])
+            continue
+        lats = [t['lat'] for t in members]
+        lngs = [t['lng'] for t in members]
+        clusters.append({
+            "type": "cluster",
+            "count": len(members),
+            "lat": sum(lats) / len(lats),
+            "lng": sum(lngs) / len(lngs),
+            "bounds": [min(lats), min(lngs), max(lats), max(lngs)],
+            "total_reward": round(sum(t.get('reward') or 0 for t in members), 2),
+            "ids": [t['id'] for t in members],
+        })
+    return singles, clusters
+
+
+# --- Distances / nearest neighbours ---
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distances (km) from one point to arrays of points, in one vectorized pass."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lngs, dtype=float))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def nearest_indices(distances, k=None, radius_km=None):
+    """Indices of the k smallest distances within radius_km, nearest first.
+
+    Uses argpartition, so only the k selected entries are fully sorted.
+    NaN distances (unknown coordinates) are never selected.
+    """
+    distances = np.asarray(distances, dtype=float)
+    candidates = np.flatnonzero(~np.isnan(distances))
+    if radius_km is not None:
+        candidates = candidates[distances[candidates] <= radius_km]
+    if k is not None and 0 <= k < len(candidates):
+        candidates = candidates[np.argpartition(distances[candidates], k)[:k]] if k else candidates[:0]
+    return candidates[np.argsort(distances[candidates], kind='stable')]
+
+
+def nearest_tasks(lat, lng, tasks, k=None, radius_km=None):
+    """The k tasks nearest to (lat, lng) within radius_km, nearest first, each with distance_km set.
+
+    Tasks without coordinates are dropped. Shared by the AI tools and /api/nearby.
+    """
+    if not tasks:
+        return []
+    # None coordinates become NaN
+    points = np.array([(t.get('lat'), t.get('lng')) for t in tasks], dtype=float)
+    distances = haversine_km(lat, lng, points[:, 0], points[:, 1])
+    selected = nearest_indices(distances, k, radius_km)
+    result = []
+    for i, distance in zip(selected.tolist(), np.round(distances[selected], 2).tolist()):
+        task = tasks[i]
+        task['distance_km'] = distance
+        result.append(task)
+    return result
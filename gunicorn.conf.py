@@ -0,0 +1,39 @@
+"""
+Production server: `gunicorn` (this file is picked up from the working directory).
+
+The master imports wsgi.py once (preload_app): schema, migrations and
+warm-up run a single time and the workers fork from the warmed process,
+sharing its memory copy-on-write. Each worker then starts its own job
+threads (app.after_fork). Caches that must agree across workers — map
+tiles, prompt context, LLM answers — use the SQLite-file backend
+(CACHE_BACKEND=shared, CACHE_PATH); admission limits and single-flight
+stay per worker.
+
+    WEB_BIND=0.0.0.0:5001   WEB_WORKERS=<cpu count>   WEB_THREADS=8   WEB_TIMEOUT=60   WEB_ACCESS_LOG=-
+"""
+
+import multiprocessing
+import os
+
+# Read by wsgi.py and cache.py when the master preloads the app
+os.environ.setdefault('APP_PREFORK', '1')
+os.environ.setdefault('CACHE_BACKEND', 'shared')
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('WEB_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count()))
+# Threads per worker: chat turns spend most of their time waiting on the LLM
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '8'))
+# Above the chat deadline (CHAT_DEADLINE_MS) so degraded replies still get out
+timeout = int(os.getenv('WEB_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+preload_app = True
+# '' turns the access log off
+accesslog = os.getenv('WEB_ACCESS_LOG', '-') or None
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
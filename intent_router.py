@@ -0,0 +1,267 @@
+"""
+Local intent router — answers the common, deterministic chat queries
+("tasks within 2km", "show all tasks", "find dog walking") without an LLM
+round trip.
+
+Two layers decide whether a message can be handled locally:
+  1. rules extract the slots (radius, keyword) and gate each intent on an
+     explicit phrasing;
+  2. a small multinomial naive Bayes model, trained at import time on the
+     labelled examples below, must agree with the rule and be confident.
+Anything else ("llm" intent, low confidence, missing slots) falls back to the
+model. Hit rate and latency by route are recorded in metrics (chat_routes_total,
+chat_duration_seconds) and summarised by stats().
+"""
+
+import math
+import os
+import re
+from collections import Counter, namedtuple
+
+import categories
+import metrics
+
+ENABLED = os.getenv('INTENT_ROUTER', '1') != '0'
+MIN_CONFIDENCE = float(os.getenv('INTENT_MIN_CONFIDENCE', '0.8'))
+DEFAULT_RADIUS_KM = 2.0
+
+Route = namedtuple('Route', 'tool arguments confidence')
+
+# Explicit "show me everything" phrasings (also used by ai_helpers.chat to skip card filtering)
+ALL_TASKS_PHRASES = ('all tasks', 'every task', 'everything available', 'list all', 'show all', 'all available')
+
+# --- Training data for the intent model ---
+
+EXAMPLES = {
+    "search_nearby_tasks": [
+        "tasks within 2km", "tasks within 1 km", "show tasks within 5 km", "anything within 500m",
+        "what's close to me", "nearest tasks", "closest tasks to me", "tasks near me", "jobs nearby",
+        "find tasks nearby", "nearby tasks", "what is near me", "dog walking near me",
+        "tutoring tasks within 3km", "gardening jobs close by", "anything within a mile",
+        "show me tasks in 2 miles", "closest job", "tasks around me", "work near me",
+    ],
+    "list_all_tasks": [
+        "show all tasks", "list all tasks", "show me all tasks", "all available tasks",
+        "what's everything available", "list every task", "show everything available",
+        "give me all the tasks", "all tasks please", "list all available jobs", "show all jobs",
+        "every task on the map", "list all", "show all",
+    ],
+    "search_available_tasks": [
+        "find dog walking", "find me dog walking tasks", "search for tutoring", "any gardening tasks",
+        "show me moving jobs", "looking for cleaning work", "find yard work", "search tech support",
+        "are there any pet sitting tasks", "find errands", "show me tutoring tasks", "moving tasks",
+        "dog walking tasks", "find furniture assembly", "any delivery jobs", "search for car detailing",
+        "look for babysitting", "find painting jobs", "show cleaning tasks", "lawn mowing jobs",
+    ],
+    "llm": [
+        "what tasks are available", "find me work", "what should I do", "recommend something",
+        "show me tasks", "what's available", "i need help moving a couch", "can someone walk my dog",
+        "post a task for tutoring", "how much should I charge for dog walking", "what is a fair price for moving",
+        "hi", "hello there", "thanks", "what can you do", "tell me about myself", "which task pays best",
+        "highlight the closest one", "accept the first task", "why is that a good match",
+        "i want to post a job", "help me write a task", "what did I accept", "best task for me",
+        "create a task to clean my garage", "suggest a price for gardening", "who are you",
+        "what tasks fit my skills", "find me something to do this weekend", "compare these tasks",
+    ],
+}
+
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+_WORD_RE = re.compile(r"[a-z]+|<num>")
+
+
+def _tokens(text):
+    text = _NUMBER_RE.sub(' <num> ', text.lower())
+    words = _WORD_RE.findall(text)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over word unigrams + bigrams, Laplace-smoothed."""
+
+    def __init__(self, examples):
+        self.vocab = set()
+        self.counts = {}
+        self.totals = {}
+        self.priors = {}
+        n = sum(len(v) for v in examples.values())
+        for label, texts in examples.items():
+            counts = Counter(t for text in texts for t in _tokens(text))
+            self.counts[label] = counts
+            self.totals[label] = sum(counts.values())
+            self.priors[label] = math.log(len(texts) / n)
+            self.vocab.update(counts)
+
+    def predict(self, text):
+        """(label, probability) of the most likely intent."""
+        tokens = [t for t in _tokens(text) if t in self.vocab]
+        v = len(self.vocab)
+        scores = {}
+        for label, counts in self.counts.items():
+            denom = self.totals[label] + v
+            scores[label] = self.priors[label] + sum(math.log((counts[t] + 1) / denom) for t in tokens)
+        best = max(scores, key=scores.get)
+        z = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / z
+
+
+model = NaiveBayes(EXAMPLES)
+
+# --- Rules / slot extraction ---
+
+_RADIUS_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(km|kms|kilomet(?:er|re)s?|mi|miles?|m|met(?:er|re)s?)\b')
+_A_MILE_RE = re.compile(r'\b(?:a|one) mile\b')
+_NEAR_RE = re.compile(r'\b(?:near(?:by|est)?|close(?:st)?|around me|close by)\b')
+# Asking to create / price / act on something is never a pure lookup
+_ACTION_RE = re.compile(r'\b(?:post|create|need|someone|charge|price|cost|accept|highlight|draft|write|recommend)\b')
+# Negations and comparisons filter the results in ways the local tools can't express
+_QUALIFIER_RE = re.compile(r"\b(?:not|no|except|excluding|without|but|other than|over|under|above|below|"
+                           r"cheaper|more than|less than)\b|n't\b")
+_PRICE_RE = re.compile(r"\$|\b(?:pay|pays|paying|paid|reward|rewards|dollars?|bucks|cheap|expensive)\b")
+
+# Task-type words that don't name a category on their own ("dog walking", "tech support")
+_TASK_WORDS = {"walking", "walker", "sitting", "sitter", "mowing", "support", "help", "helper", "repair", "repairs"}
+
+_FILLER = {
+    "find", "me", "show", "search", "for", "any", "some", "task", "tasks", "job", "jobs", "work", "gig", "gigs",
+    "near", "nearby", "nearest", "close", "closest", "by", "to", "within", "in", "around", "please", "i", "im",
+    "want", "looking", "look", "the", "a", "an", "are", "there", "is", "what", "whats", "s", "on", "map", "of",
+    "km", "kms", "mi", "mile", "miles", "m", "meters", "metres", "kilometers", "kilometres", "can", "you", "get",
+    "give", "list", "available", "all", "every", "everything", "my", "area", "do", "have", "with", "at", "from",
+}
+
+
+def _radius_km(text):
+    match = _RADIUS_RE.search(text)
+    if match:
+        value, unit = float(match.group(1)), match.group(2)
+        if unit.startswith('mi'):
+            return round(value * 1.609, 2)
+        if unit == 'm' or unit.startswith('met'):
+            return value / 1000
+        return value
+    if _A_MILE_RE.search(text):
+        return 1.609
+    return None
+
+
+def _keyword(text):
+    """What the user is looking for, with filler words removed ('' when nothing specific)."""
+    words = [w for w in re.findall(r"[a-z]+", _NUMBER_RE.sub(' ', text)) if w not in _FILLER]
+    return " ".join(words)
+
+
+def _known_keyword(keyword):
+    # Only route keyword searches that are entirely a recognisable task type: every word
+    # must be a category term, so "that not gardening" or "gardening for seniors" go to the LLM
+    words = keyword.split()
+    return (0 < len(words) <= 3 and categories.classify(keyword) != categories.OTHER
+            and all(w in _TASK_WORDS or categories.classify(w) != categories.OTHER for w in words))
+
+
+def route(message):
+    """The tool call a message maps to, or None when the LLM should handle it."""
+    text = message.lower().strip()
+    if not text or len(text) > 120 or _ACTION_RE.search(text) or _QUALIFIER_RE.search(text):
+        return None
+
+    intent, confidence = model.predict(text)
+    if intent == "llm" or confidence < MIN_CONFIDENCE:
+        return None
+
+    if intent == "list_all_tasks":
+        # Only a bare "show everything": a category, number or price is a filter the LLM must apply
+        if (any(phrase in text for phrase in ALL_TASKS_PHRASES) and not _keyword(text)
+                and not _NUMBER_RE.search(text) and not _PRICE_RE.search(text)):
+            return Route("list_all_tasks", {}, confidence)
+        return None
+
+    if intent == "search_nearby_tasks":
+        radius = _radius_km(text)
+        if radius is None and not _NEAR_RE.search(text):
+            return None
+        arguments = {"radius_km": radius or DEFAULT_RADIUS_KM}
+        keyword = _keyword(text)
+        if keyword:
+            if not _known_keyword(keyword):
+                return None
+            arguments["keyword"] = keyword
+        return Route("search_nearby_tasks", arguments, confidence)
+
+    if intent == "search_available_tasks":
+        keyword = _keyword(text)
+        if not _known_keyword(keyword):
+            return None
+        return Route("search_available_tasks", {"keyword": keyword}, confidence)
+
+    return None
+
+
+# --- Templated replies ---
+
+def render_reply(route_, results, shown=None):
+    """Reply text for a locally executed route, given the tool's result list and how many cards are shown."""
+    args = route_.arguments
+    more = f" Showing the top {shown} below." if shown is not None and shown < len(results) else ""
+    keyword = args.get("keyword")
+    if route_.tool == "list_all_tasks":
+        if not results:
+            return "No tasks are currently available on the map."
+        return f"Here are all {len(results)} tasks currently on the map, closest first. Tap \"Show on Map\" on any card to see it."
+
+    if route_.tool == "search_nearby_tasks":
+        where = f"within {args['radius_km']:g} km" + (f" matching \"{keyword}\"" if keyword else "")
+        if not results:
+            return f"I couldn't find any tasks {where}. Want me to try a larger radius?"
+        top = results[0]
+        distance = f", {top['distance_km']} km away" if top.get('distance_km') is not None else ""
+        return (f"I found {len(results)} task(s) {where}. The closest is **{top['title']}** "
+                f"(${top['reward']}{distance}).{more} Tap \"Show on Map\" on a card to see it.")
+
+    if not results:
+        return f"I couldn't find any tasks matching \"{keyword}\". Want me to show everything that's available?"
+    top = results[0]
+    return (f"I found {len(results)} task(s) matching \"{keyword}\". The top one is **{top['title']}** "
+            f"(${top['reward']}).{more} Tap \"Show on Map\" on a card to see it.")
+
+
+def render_highlight(task, task_id=None):
+    """Reply text for a highlight_task result (task is None when it was not found)."""
+    if not task:
+        return f"I couldn't find task #{task_id} on the map." if task_id else "I couldn't find that task on the map."
+    return f"I've highlighted **{task['title']}** (${task['reward']}) on the map."
+
+
+def render_draft(proposal):
+    """Reply text for a create_task_draft proposal."""
+    return (f"Here's a draft for your task: **{proposal['title']}** for ${proposal['reward']}. "
+            f"Review the details below and post it when you're ready, or tell me what to change.")
+
+
+# --- Reporting ---
+
+def stats():
+    """Hit rate and latency savings from the chat route metrics."""
+    local = metrics.CHAT_LATENCY.count("local")
+    llm = metrics.CHAT_LATENCY.count("llm")
+    local_avg = metrics.CHAT_LATENCY.total("local") / local if local else 0.0
+    llm_avg = metrics.CHAT_LATENCY.total("llm") / llm if llm else 0.0
+    total = local + llm
+    return {
+        "enabled": ENABLED,
+        "min_confidence": MIN_CONFIDENCE,
+        "messages": total,
+        "local": local,
+        "llm": llm,
+        "hit_rate": round(local / total, 4) if total else 0.0,
+        "avg_local_ms": round(local_avg * 1000, 2),
+        "avg_llm_ms": round(llm_avg * 1000, 2),
+        # What the routed messages would have cost at the average LLM latency
+        "estimated_saved_ms": round(local * max(0.0, llm_avg - local_avg) * 1000, 1) if llm else None,
+        "by_intent": {intent: metrics.CHAT_ROUTES.value("local", intent)
+                      for intent in EXAMPLES if intent != "llm"},
+        # LLM tool turns answered from structured tool output instead of a second completion
+        "followups_skipped": metrics.CHAT_FOLLOWUPS.value("skipped"),
+        "followups_completed": metrics.CHAT_FOLLOWUPS.value("completed"),
+        # Turns that ran out of their deadline and got the keyword-match fallback
+        "degraded": metrics.CHAT_LATENCY.count("degraded"),
+    }
@@ -0,0 +1,261 @@
+"""
+Background job queue — jobs are rows in the `jobs` table (so they survive a
+restart) and run on a small in-process worker pool.
+
+    jobs.register("recommendations", handler)   # handler(payload_dict)
+    job_id = jobs.enqueue("recommendations", key=user_id, payload={"user_id": user_id})
+
+At most one queued job exists per (kind, key): enqueueing again while one is
+waiting just refreshes its payload. Failed jobs are retried with backoff up
+to JOB_MAX_ATTEMPTS times. Queue lag (time from enqueue to start), run time
+and outcomes are recorded in metrics; status() summarises the table.
+
+    JOB_WORKERS=2   JOB_MAX_ATTEMPTS=3   JOB_POLL_INTERVAL=1   JOB_KEEP=1000   JOB_LEASE=600
+
+A claimed job holds a lease of JOB_LEASE seconds: if its worker dies (e.g. a
+pre-fork server process is killed) the job is claimed again once the lease
+expires, without waiting for a restart and recover().
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import db
+import metrics
+import tracing
+
+DATABASE = 'database.db'
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# Workers also poll, so jobs enqueued by another process are picked up
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+# Finished (done / failed) jobs kept for inspection
+JOB_KEEP = int(os.getenv('JOB_KEEP', '1000'))
+# A running job not finished within its lease is presumed lost (worker process killed)
+# and claimed again; keep it well above the slowest handler
+JOB_LEASE = float(os.getenv('JOB_LEASE', '600'))
+
+HANDLERS = {}
+
+_wakeup = threading.Event()
+_workers = []
+_start_lock = threading.Lock()
+_stopping = threading.Event()
+_schema_ready = False
+
+
+def init_schema(conn):
+    """Create the jobs table (idempotent)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            run_after REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_queued_key ON jobs (kind, key) WHERE status = 'queued'")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)')
+
+
+def register(kind, handler):
+    HANDLERS[kind] = handler
+
+
+def _connect():
+    global _schema_ready
+    conn = db.connect(DATABASE)
+    if not _schema_ready:
+        init_schema(conn)
+        _schema_ready = True
+    return conn
+
+
+def enqueue(kind, key, payload=None):
+    """Queue a job (or refresh the payload of the one already queued for kind/key); returns its id."""
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "INSERT INTO jobs (kind, key, payload, created_at, run_after) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (kind, key) WHERE status = 'queued' DO UPDATE SET payload = excluded.payload "
+            "RETURNING id",
+            (kind, str(key), json.dumps(payload or {}), now, now)
+        ).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    metrics.JOBS.inc(kind, "enqueued")
+    start()
+    _wakeup.set()
+    return row['id']
+
+
+def _claim(conn):
+    """Atomically move the oldest runnable job (queued, or running with an expired lease) to 'running'."""
+    now = time.time()
+    expired = now - JOB_LEASE
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'lease expired' "
+        "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+        (now, expired, JOB_MAX_ATTEMPTS)
+    )
+    return conn.execute(
+        "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 "
+        "WHERE id = (SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+        "OR (status = 'running' AND started_at < ?) ORDER BY id LIMIT 1) "
+        "RETURNING id, kind, key, payload, attempts, created_at, started_at",
+        (now, now, expired)
+    ).fetchone()
+
+
+def _finish(conn, job, error=None):
+    now = time.time()
+
+    def update(assignments, params):
+        # Only while we still hold the lease: once it expired and another worker
+        # claimed the job, that worker's outcome wins
+        return conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND status = 'running' AND started_at = ?",
+                            (*params, job['id'], job['started_at'])).rowcount
+
+    if error is None:
+        updated = update("status = 'done', error = NULL, finished_at = ?", (now,))
+        outcome = "done"
+    elif job['attempts'] < JOB_MAX_ATTEMPTS:
+        # Back off 2, 4, 8... seconds. A newer queued job for the same key supersedes the retry.
+        try:
+            updated = update("status = 'queued', error = ?, run_after = ?", (error, now + 2 ** job['attempts']))
+        except sqlite3.IntegrityError:
+            updated = update("status = 'failed', error = ?, finished_at = ?", (error, now))
+        outcome = "retried"
+    else:
+        updated = update("status = 'failed', error = ?, finished_at = ?", (error, now))
+        outcome = "failed"
+    conn.commit()
+    metrics.JOBS.inc(job['kind'], outcome if updated else "lease_lost")
+
+
+def run_one(conn):
+    """Claim and run one job; returns False when nothing is runnable."""
+    job = _claim(conn)
+    conn.commit()
+    if job is None:
+        return False
+    kind = job['kind']
+    metrics.JOB_LAG.observe(kind, value=max(0.0, time.time() - job['created_at']))
+    handler = HANDLERS.get(kind)
+    error = None
+    start = time.perf_counter()
+    with tracing.span("job", kind=kind, key=job['key'], attempt=job['attempts']):
+        try:
+            if handler is None:
+                raise LookupError(f"no handler registered for job kind '{kind}'")
+            handler(json.loads(job['payload'] or '{}'))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    metrics.JOB_DURATION.observe(kind, value=time.perf_counter() - start)
+    _finish(conn, job, error)
+    return True
+
+
+def _worker():
+    conn = _connect()
+    try:
+        while not _stopping.is_set():
+            try:
+                if run_one(conn):
+                    continue
+            except sqlite3.OperationalError:
+                # Database busy (another writer); try again shortly
+                conn.rollback()
+            _wakeup.wait(JOB_POLL_INTERVAL)
+            _wakeup.clear()
+    finally:
+        conn.close()
+
+
+def recover(conn):
+    """Requeue jobs left 'running' by a previous process and prune old ones (call once at startup)."""
+    conn.execute("UPDATE OR IGNORE jobs SET status = 'queued', run_after = ? WHERE status = 'running'", (time.time(),))
+    conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = 'superseded after restart' "
+                 "WHERE status = 'running'", (time.time(),))
+    conn.commit()
+    prune(conn)
+
+
+def start(workers=JOB_WORKERS):
+    """Start the worker threads once per process (enqueue() calls this too)."""
+    with _start_lock:
+        if _workers or workers <= 0:
+            return
+        _stopping.clear()
+        for i in range(workers):
+            thread = threading.Thread(target=_worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            _workers.append(thread)
+
+
+def stop(timeout=5):
+    """Stop the workers after their current job (tests / benchmarks)."""
+    _stopping.set()
+    _wakeup.set()
+    for thread in _workers:
+        thread.join(timeout)
+    _workers.clear()
+
+
+def prune(conn, keep=JOB_KEEP):
+    """Drop all but the newest `keep` finished jobs."""
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND id NOT IN "
+        "(SELECT id FROM jobs WHERE status IN ('done', 'failed') ORDER BY id DESC LIMIT ?)", (keep,)
+    )
+    conn.commit()
+
+
+def get(job_id):
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def status():
+    """Counts by kind and status, current lag of the oldest queued job, and recent failures."""
+    now = time.time()
+    conn = _connect()
+    try:
+        counts = conn.execute('SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status').fetchall()
+        oldest = conn.execute(
+            "SELECT kind, MIN(created_at) AS created_at FROM jobs WHERE status = 'queued' GROUP BY kind"
+        ).fetchall()
+        failures = conn.execute(
+            "SELECT id, kind, key, attempts, error, finished_at FROM jobs WHERE status = 'failed' "
+            "ORDER BY id DESC LIMIT 10"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    by_kind = {}
+    for row in counts:
+        by_kind.setdefault(row['kind'], {})[row['status']] = row['n']
+    for row in oldest:
+        by_kind[row['kind']]['oldest_queued_s'] = round(now - row['created_at'], 3)
+    return {
+        "workers": len(_workers),
+        "by_kind": by_kind,
+        "recent_failures": [dict(r) for r in failures],
+    }
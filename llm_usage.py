@@ -0,0 +1,243 @@
+"""
+LLM usage accounting — records every model call (tokens, latency, tool, user)
+in the `llm_calls` table and aggregates cost / latency per tool per day.
+"""
+
+import contextvars
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import db
+import deadline
+import tracing
+
+DATABASE = 'database.db'
+
+# Upper bound for one completion when the request has no deadline of its own
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+# Hedging: if a completion has not returned after this long, send one duplicate
+# request and take whichever finishes first (0 = off). Costs at most one extra call.
+LLM_HEDGE_AFTER = int(os.getenv('LLM_HEDGE_AFTER_MS', '0')) / 1000
+LLM_WORKERS = int(os.getenv('LLM_WORKERS', '16'))
+
+_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix='llm')
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+# USD per 1M tokens: (prompt, cached prompt, completion)
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        model TEXT NOT NULL,
+        tool TEXT,
+        user_id INTEGER,
+        prompt_tokens INTEGER DEFAULT 0,
+        completion_tokens INTEGER DEFAULT 0,
+        cached_tokens INTEGER DEFAULT 0,
+        cache_hit INTEGER DEFAULT 0,
+        latency_ms REAL,
+        cost_usd REAL DEFAULT 0,
+        error INTEGER DEFAULT 0
+    )
+'''
+
+_schema_ready = False
+
+
+def init_schema(conn):
+    """Create the llm_calls table (called from init_db and lazily on first write)."""
+    conn.execute(SCHEMA)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_timestamp ON llm_calls (timestamp)')
+
+
+def get_openai_client():
+    """Shared OpenAI client, so its connection pool is reused across calls.
+
+    Created on first use (or at startup by app.warm_up); rebuilt when the API
+    key or the OpenAI class changes. Raises ImportError without the openai package.
+    """
+    global _client, _client_key
+    import openai
+    key = (openai.OpenAI, os.getenv('OPENAI_API_KEY'))
+    with _client_lock:
+        if _client is None or _client_key != key:
+            _client = openai.OpenAI(api_key=key[1])
+            _client_key = key
+        return _client
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call; unknown models are priced as gpt-4o-mini."""
+    prompt_rate, cached_rate, completion_rate = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o-mini"])
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * prompt_rate + cached_tokens * cached_rate + completion_tokens * completion_rate) / 1_000_000
+
+
+def record_call(model, usage=None, latency_ms=0.0, tool=None, user_id=None, cache_hit=None, error=False):
+    """Store one model call. Never raises — accounting must not break a request."""
+    global _schema_ready
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    if cache_hit is None:
+        cache_hit = cached_tokens > 0
+    cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    conn = None
+    try:
+        conn = db.connect(DATABASE)
+        if not _schema_ready:
+            init_schema(conn)
+            _schema_ready = True
+        conn.execute(
+            'INSERT INTO llm_calls (model, tool, user_id, prompt_tokens, completion_tokens, cached_tokens, '
+            'cache_hit, latency_ms, cost_usd, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (model, tool, user_id, prompt_tokens, completion_tokens, cached_tokens,
+             int(bool(cache_hit)), round(latency_ms, 2), cost, int(error))
+        )
+        conn.commit()
+    except sqlite3.Error:
+        pass
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _call(client, model, tool, user_id, kwargs):
+    """One recorded completion request."""
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception:
+        record_call(model, None, (time.perf_counter() - start) * 1000, tool=tool, user_id=user_id, error=True)
+        raise
+    record_call(model, getattr(response, "usage", None), (time.perf_counter() - start) * 1000, tool=tool, user_id=user_id)
+    return response
+
+
+def _submit(*args):
+    ctx = contextvars.copy_context()
+    return _executor.submit(ctx.run, _call, *args)
+
+
+def _bounded_call(client, model, tool, user_id, kwargs, span):
+    """Run the call on the LLM pool, waiting no longer than the deadline; hedge if enabled."""
+    futures = [_submit(client, model, tool, user_id, kwargs)]
+    left = deadline.timeout()
+    if LLM_HEDGE_AFTER and (left is None or left > LLM_HEDGE_AFTER + deadline.MIN_CALL_BUDGET):
+        done, _ = wait(futures, timeout=LLM_HEDGE_AFTER)
+        if not done:
+            span.set(hedged=True)
+            futures.append(_submit(client, model, tool, user_id, kwargs))
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=deadline.timeout(), return_when=FIRST_COMPLETED)
+        if not done:
+            # Out of budget: abandon the in-flight request(s); they still record their usage
+            raise deadline.DeadlineExceeded(f"llm:{tool}")
+        for future in done:
+            if future.exception() is None:
+                if len(futures) > 1:
+                    span.set(hedge_won=futures.index(future) == 1)
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def create_completion(client, tool=None, user_id=None, **kwargs):
+    """Call client.chat.completions.create and record its usage and latency.
+
+    Honours the current deadline: the call is not started when the budget is
+    spent, its client timeout is the remaining budget, and DeadlineExceeded is
+    raised if it does not return in time.
+    """
+    model = kwargs.get("model", "unknown")
+    deadline.check(f"llm:{tool}")
+    kwargs.setdefault("timeout", deadline.timeout(LLM_TIMEOUT))
+    with tracing.child_span("llm.completion", model=model, tool=tool) as span:
+        if deadline.remaining() is None and not LLM_HEDGE_AFTER:
+            response = _call(client, model, tool, user_id, kwargs)
+        else:
+            try:
+                response = _bounded_call(client, model, tool, user_id, kwargs, span)
+            except deadline.DeadlineExceeded:
+                raise
+            except Exception:
+                # A client-side timeout caused by the budget is a deadline miss, not a provider error
+                if deadline.expired():
+                    raise deadline.DeadlineExceeded(f"llm:{tool}")
+                raise
+        usage = getattr(response, "usage", None)
+        span.set(prompt_tokens=getattr(usage, "prompt_tokens", None),
+                 completion_tokens=getattr(usage, "completion_tokens", None))
+        return response
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def usage_by_tool_per_day(days=7):
+    """Calls, tokens, cost and p95 latency grouped by day and tool (newest day first)."""
+    conn = db.connect(DATABASE)
+    init_schema(conn)
+    rows = conn.execute(
+        "SELECT date(timestamp) AS day, COALESCE(tool, 'unknown') AS tool, prompt_tokens, completion_tokens, "
+        "cached_tokens, cache_hit, latency_ms, cost_usd, error FROM llm_calls "
+        "WHERE timestamp >= datetime('now', ?)",
+        (f'-{int(days)} days',)
+    ).fetchall()
+    conn.close()
+
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row['day'], row['tool'])].append(row)
+
+    report = []
+    for (day, tool), calls in groups.items():
+        latencies = [c['latency_ms'] for c in calls if c['latency_ms'] is not None]
+        report.append({
+            "day": day,
+            "tool": tool,
+            "calls": len(calls),
+            "errors": sum(c['error'] for c in calls),
+            "prompt_tokens": sum(c['prompt_tokens'] for c in calls),
+            "completion_tokens": sum(c['completion_tokens'] for c in calls),
+            "cache_hit_rate": round(sum(c['cache_hit'] for c in calls) / len(calls), 3),
+            "cost_usd": round(sum(c['cost_usd'] for c in calls), 6),
+            "p95_latency_ms": round(_percentile(latencies, 95), 1) if latencies else None,
+        })
+    report.sort(key=lambda r: (r["day"], r["cost_usd"]), reverse=True)
+    return report
+
+
+def usage_by_user(days=7):
+    """Total calls, tokens and cost per user over the last `days` days."""
+    conn = db.connect(DATABASE)
+    init_schema(conn)
+    rows = conn.execute(
+        "SELECT user_id, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+        "SUM(completion_tokens) AS completion_tokens, ROUND(SUM(cost_usd), 6) AS cost_usd "
+        "FROM llm_calls WHERE timestamp >= datetime('now', ?) GROUP BY user_id ORDER BY cost_usd DESC",
+        (f'-{int(days)} days',)
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
@@ -0,0 +1,54 @@
+"""
+Helper-to-task matching — the keyword match score shown on map markers, and a
+deterministic keyword ranking for recommendations when the LLM is unavailable
+or out of time.
+"""
+
+import random
+
+
+def keyword_hits(user_expertise, task_title, task_desc):
+    """Number of the user's comma-separated skills that appear in the task text."""
+    if not user_expertise:
+        return 0
+    text = (task_title + " " + (task_desc or "")).lower()
+    return sum(1 for e in user_expertise.split(',') if e.strip() and e.strip().lower() in text)
+
+
+def calculate_match_score(user_expertise, task_title, task_desc):
+    """
+    Calculate a 'smart' match score (0-100) based on user expertise and task content.
+    """
+    if not user_expertise:
+        return 0, 'default'
+        
+    score = 40 * keyword_hits(user_expertise, task_title, task_desc)  # Big boost per direct keyword match
+            
+    # Add some randomness for "AI" feel and base score
+    base_affinity = random.randint(30, 60) 
+    score += base_affinity
+    
+    # Cap at 99
+    score = min(99, score)
+    
+    # Determine color/tier
+    if score >= 85:
+        return score, 'purple' # High match
+    elif score >= 60:
+        return score, 'orange' # Medium match
+    else:
+        return score, 'default' # Low match
+
+
+def rank_tasks(user_expertise, tasks, k=5):
+    """Top k tasks by keyword hits (then reward), each with match_score / match_color set.
+
+    The order is deterministic; the score's random affinity only affects what the markers show.
+    """
+    scored = []
+    for task in tasks:
+        title, desc = task.get('title') or '', task.get('description')
+        task['match_score'], task['match_color'] = calculate_match_score(user_expertise, title, desc)
+        scored.append(((keyword_hits(user_expertise, title, desc), task.get('reward') or 0), task))
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return [task for _, task in scored[:k]]
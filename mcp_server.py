@@ -1,28 +1,55 @@
 """
 MCP Server for Find a Helper — exposes the app's database via MCP protocol.
 
-Run standalone:  python mcp_server.py
+Run standalone:  python mcp_server.py                      (stdio, one agent)
+                 python mcp_server.py --transport http     (streamable HTTP, many agents)
 """
 
-import sqlite3
+import argparse
+import asyncio
+import base64
+import contextlib
+import contextvars
+import datetime
 import json
+import re
 import sys
 import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
 from dotenv import load_dotenv
 
+import admission
+import cache
+import changelog
+import db
+import task_stats
+import llm_usage
+import tracing
+
 load_dotenv()
 
 DATABASE = 'database.db'
 
 
+_local = threading.local()
+
+
+def get_connection():
+    """One long-lived connection per worker thread, shared by every session it serves."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'database', None) != DATABASE:
+        conn = _local.conn = db.connect(DATABASE)
+        _local.database = DATABASE
+    return conn
+
+
 def query_db(query, args=()):
     """Query the SQLite database."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cur = conn.execute(query, args)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    cur = get_connection().execute(query, args)
+    return [dict(r) for r in cur.fetchall()]
 
 
 def query_db_one(query, args=()):
@@ -31,6 +58,170 @@ def query_db_one(query, args=()):
     return rows[0] if rows else None
 
 
+# ============================================================
+# Paginated task queries (resources + search_tasks)
+# ============================================================
+
+TASK_FIELDS = ('id', 'title', 'description', 'reward', 'lat', 'lng', 'status', 'timestamp', 'original_id')
+DEFAULT_TASK_FIELDS = ('id', 'title', 'description', 'reward', 'status')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        prefix, value = raw.split(':', 1)
+        if prefix != 'id':
+            raise ValueError
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _parse_timestamp(value, name):
+    """Normalise an ISO date/datetime to the 'YYYY-MM-DD HH:MM:SS' format of the timestamp column."""
+    try:
+        return datetime.datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ValueError(f"Invalid {name} date: {value} (expected ISO format, e.g. 2025-01-31)")
+
+
+def has_table(name):
+    return query_db_one("SELECT 1 AS ok FROM sqlite_master WHERE name = ?", (name,)) is not None
+
+
+def query_tasks_page(keyword=None, status=None, since=None, until=None, fields=None, limit=None, cursor=None):
+    """One page of tasks, newest first, using keyset pagination on id.
+
+    Keyword search uses the tasks_fts full-text index when it exists (prefix match
+    per word) and falls back to LIKE otherwise.
+    Returns {"results": [...], "count": n, "next_cursor": str | None}.
+    """
+    fields = [f for f in (fields or DEFAULT_TASK_FIELDS) if f in TASK_FIELDS] or list(DEFAULT_TASK_FIELDS)
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    columns = ", ".join(dict.fromkeys(['id'] + fields))
+
+    where, args = [], []
+    words = re.findall(r'\w+', keyword or '')
+    if words and has_table('tasks_fts'):
+        where.append("id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)")
+        args.append(" ".join(f'"{w}"*' for w in words))
+    elif keyword:
+        where.append("(title LIKE ? OR description LIKE ?)")
+        args.extend([f"%{keyword}%", f"%{keyword}%"])
+    if status:
+        where.append("status = ?")
+        args.append(status)
+    if since:
+        where.append("timestamp >= ?")
+        args.append(_parse_timestamp(since, 'since'))
+    if until:
+        where.append("timestamp < ?")
+        args.append(_parse_timestamp(until, 'until'))
+    if cursor:
+        where.append("id < ?")
+        args.append(decode_cursor(cursor))
+
+    sql = f"SELECT {columns} FROM tasks"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    rows = query_db(sql, args + [limit + 1])
+
+    next_cursor = encode_cursor(rows[limit - 1]['id']) if len(rows) > limit else None
+    rows = rows[:limit]
+    if 'id' not in fields:
+        for row in rows:
+            row.pop('id')
+    return {"results": rows, "count": len(rows), "next_cursor": next_cursor}
+
+
+def page_args(params):
+    """Convert resource query-string / tool arguments into query_tasks_page kwargs."""
+    fields = params.get("fields")
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    return {
+        "keyword": params.get("keyword"),
+        "status": params.get("status"),
+        "since": params.get("since"),
+        "until": params.get("until"),
+        "fields": fields,
+        "limit": params.get("limit"),
+        "cursor": params.get("cursor"),
+    }
+
+
+# ============================================================
+# Concurrency — blocking sqlite / OpenAI work runs on bounded
+# thread pools so one slow tool never stalls the event loop.
+# LLM-backed tools get their own pool so slow completions can't
+# starve the quick DB-only tools and resource reads.
+# ============================================================
+
+MCP_DB_WORKERS = int(os.getenv('MCP_DB_WORKERS', '8'))
+MCP_LLM_WORKERS = int(os.getenv('MCP_LLM_WORKERS', '4'))
+MCP_TOOL_TIMEOUT = float(os.getenv('MCP_TOOL_TIMEOUT', '10'))
+MCP_LLM_TOOL_TIMEOUT = float(os.getenv('MCP_LLM_TOOL_TIMEOUT', '30'))
+
+LLM_TOOLS = {"suggest_price", "get_recommended_tasks"}
+TOOL_TIMEOUTS = {name: MCP_LLM_TOOL_TIMEOUT for name in LLM_TOOLS}
+
+# Result caches shared by all sessions (seconds to live)
+MCP_CACHE_TTL = float(os.getenv('MCP_CACHE_TTL', '5'))
+MCP_PRICE_CACHE_TTL = float(os.getenv('MCP_PRICE_CACHE_TTL', '300'))
+
+_resource_cache = cache.TTLCache('mcp:resources', MCP_CACHE_TTL)
+_tool_caches = {
+    "search_tasks": cache.TTLCache('mcp:search_tasks', MCP_CACHE_TTL),
+    "get_task_stats": cache.TTLCache('mcp:get_task_stats', MCP_CACHE_TTL),
+    "suggest_price": cache.TTLCache('mcp:suggest_price', MCP_PRICE_CACHE_TTL),
+}
+
+# Resource subscriptions: how often the change log is polled (seconds)
+MCP_CHANGE_POLL_INTERVAL = float(os.getenv('MCP_CHANGE_POLL_INTERVAL', '1'))
+
+# Network transport limits
+MCP_HOST = os.getenv('MCP_HOST', '127.0.0.1')
+MCP_PORT = int(os.getenv('MCP_PORT', '8765'))
+MCP_MAX_SESSIONS = int(os.getenv('MCP_MAX_SESSIONS', '100'))
+MCP_MAX_CONNECTIONS = int(os.getenv('MCP_MAX_CONNECTIONS', '200'))
+
+_tool_flights = cache.SingleFlight('mcp:tools')
+
+_db_executor = ThreadPoolExecutor(max_workers=MCP_DB_WORKERS, thread_name_prefix='mcp-db')
+_llm_executor = ThreadPoolExecutor(max_workers=MCP_LLM_WORKERS, thread_name_prefix='mcp-llm')
+
+def _is_error(result):
+    """True when a tool result's JSON payload carries an "error" key: not cached, not shared."""
+    for item in result or ():
+        try:
+            payload = json.loads(item.text)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if isinstance(payload, dict) and "error" in payload:
+            return True
+    return False
+
+
+async def run_blocking(executor, timeout, fn, *args, on_done=None):
+    """Run fn(*args) on `executor` (keeping the tracing context) and await it with a timeout.
+
+    on_done() is called once fn has really finished on its thread (or was cancelled
+    before starting), which can be after the await has already timed out.
+    """
+    ctx = contextvars.copy_context()
+    future = executor.submit(ctx.run, fn, *args)
+    if on_done is not None:
+        future.add_done_callback(lambda _: on_done())
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+
 # ============================================================
 # MCP Server Setup
 # ============================================================
@@ -40,7 +231,16 @@ try:
     from mcp.server.stdio import stdio_server
     from mcp import types
 
-    server = Server("find-a-helper")
+    class HelperServer(Server):
+        """Server that advertises resource subscriptions (backed by the change log)."""
+
+        def get_capabilities(self, notification_options, experimental_capabilities):
+            capabilities = super().get_capabilities(notification_options, experimental_capabilities)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+
+    server = HelperServer("find-a-helper")
 
     # --- Resources ---
 
@@ -50,7 +250,7 @@ try:
             types.Resource(
                 uri="helper://tasks/accepted",
                 name="Accepted Tasks",
-                description="All tasks the user has accepted",
+                description=f"Most recent {DEFAULT_PAGE_SIZE} tasks; follow next_cursor via helper://tasks?cursor=... for more",
                 mimeType="application/json"
             ),
             types.Resource(
@@ -61,11 +261,54 @@ try:
             ),
         ]
 
+    @server.list_resource_templates()
+    async def list_resource_templates():
+        return [
+            types.ResourceTemplate(
+                uriTemplate="helper://tasks{?status,keyword,since,until,fields,limit,cursor}",
+                name="Tasks (paginated)",
+                description=(
+                    f"Tasks newest first, {DEFAULT_PAGE_SIZE} per page (max {MAX_PAGE_SIZE}). "
+                    f"Filters: status, keyword, since/until (ISO dates). fields: comma-separated subset of "
+                    f"{', '.join(TASK_FIELDS)}. Pass the returned next_cursor as cursor for the next page."
+                ),
+                mimeType="application/json"
+            ),
+        ]
+
+    def _request_traceparent():
+        """traceparent passed by the client in the request's _meta, if any."""
+        try:
+            meta = server.request_context.meta
+        except LookupError:
+            return None
+        return getattr(meta, "traceparent", None) if meta else None
+
+    def _session_key():
+        """Rate-limit key for the calling MCP session."""
+        try:
+            return f"mcp:{id(server.request_context.session)}"
+        except LookupError:
+            return "mcp:stdio"
+
     @server.read_resource()
     async def read_resource(uri: str):
+        uri = str(uri)
+        with tracing.span("mcp.read_resource", traceparent=_request_traceparent(), uri=uri):
+            cached = _resource_cache.get(uri)
+            if cached is not None:
+                return cached
+            result = await run_blocking(_db_executor, MCP_TOOL_TIMEOUT, _read_resource, uri)
+            _resource_cache.set(uri, result)
+            return result
+
+    def _read_resource(uri):
+        parts = urlsplit(uri)
         if uri == "helper://tasks/accepted":
-            tasks = query_db('SELECT id, title, description, reward, status FROM tasks ORDER BY id DESC')
-            return json.dumps(tasks, indent=2)
+            return json.dumps(query_tasks_page())
+
+        elif parts.scheme == "helper" and parts.netloc == "tasks" and parts.path in ("", "/"):
+            return json.dumps(query_tasks_page(**page_args(dict(parse_qsl(parts.query)))))
 
         elif uri == "helper://users/current":
             user = query_db_one('SELECT id, username, bio, role, expertise, joined_date FROM users LIMIT 1')
@@ -73,6 +316,73 @@ try:
 
         raise ValueError(f"Unknown resource: {uri}")
 
+    # --- Subscriptions ---
+
+    # uri -> sessions subscribed to it (weak, so closed sessions drop out)
+    _subscribers = {}
+    _watcher = None
+
+    def uris_for_change(change, subscribed):
+        """Subscribed resource URIs affected by one change_log entry."""
+        if change["table_name"] == "tasks":
+            return {uri for uri in subscribed if uri.startswith("helper://tasks")}
+        if change["table_name"] == "users":
+            return {uri for uri in subscribed if uri.startswith("helper://users")}
+        return set()
+
+    def _poll_changes(after_id):
+        conn = get_connection()
+        if after_id is None:
+            return changelog.latest_id(conn), []
+        changes = changelog.changes_since(conn, after_id)
+        new_id = changes[-1]["id"] if changes else after_id
+        if new_id // 1000 != after_id // 1000:
+            changelog.prune(conn)  # roughly every 1000 changes
+        return new_id, changes
+
+    async def _watch_changes():
+        """Poll change_log and push resources/updated to subscribers of affected URIs."""
+        try:
+            last_id, _ = await run_blocking(_db_executor, MCP_TOOL_TIMEOUT, _poll_changes, None)
+            while any(_subscribers.values()):
+                await asyncio.sleep(MCP_CHANGE_POLL_INTERVAL)
+                last_id, changes = await run_blocking(_db_executor, MCP_TOOL_TIMEOUT, _poll_changes, last_id)
+                if not changes:
+                    continue
+
+                tables = {c["table_name"] for c in changes}
+                if "tasks" in tables:
+                    for name in ("search_tasks", "get_task_stats"):
+                        _tool_caches[name].invalidate()
+
+                affected = set()
+                for change in changes:
+                    affected |= uris_for_change(change, list(_subscribers))
+                for uri in affected:
+                    _resource_cache.invalidate(uri)
+                    for session in list(_subscribers.get(uri, ())):
+                        try:
+                            await session.send_resource_updated(uri)
+                        except Exception:
+                            _subscribers[uri].discard(session)
+        except Exception as e:
+            print(f"Change watcher stopped: {e}", file=sys.stderr)
+        finally:
+            global _watcher
+            _watcher = None
+
+    @server.subscribe_resource()
+    async def subscribe_resource(uri):
+        global _watcher
+        uri = str(uri)
+        _subscribers.setdefault(uri, weakref.WeakSet()).add(server.request_context.session)
+        if _watcher is None:
+            _watcher = asyncio.ensure_future(_watch_changes())
+
+    @server.unsubscribe_resource()
+    async def unsubscribe_resource(uri):
+        _subscribers.get(str(uri), weakref.WeakSet()).discard(server.request_context.session)
+
     # --- Tools ---
 
     @server.list_tools()
@@ -80,13 +390,38 @@ try:
         return [
             types.Tool(
                 name="search_tasks",
-                description="Search accepted tasks by keyword. Returns matching tasks.",
+                description="Search accepted tasks by keyword. Returns one page of matching tasks (newest first) and a next_cursor.",
                 inputSchema={
                     "type": "object",
                     "properties": {
                         "keyword": {
                             "type": "string",
                             "description": "Keyword to search in task titles and descriptions"
+                        },
+                        "status": {
+                            "type": "string",
+                            "description": "Only tasks with this status, e.g. 'accepted', 'posted', 'completed'"
+                        },
+                        "since": {
+                            "type": "string",
+                            "description": "Only tasks created at or after this ISO date"
+                        },
+                        "until": {
+                            "type": "string",
+                            "description": "Only tasks created before this ISO date"
+                        },
+                        "fields": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": list(TASK_FIELDS)},
+                            "description": "Fields to return (default: id, title, description, reward, status)"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"Page size (default {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE})"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "next_cursor from the previous page"
                         }
                     },
                     "required": ["keyword"]
@@ -94,7 +429,7 @@ try:
             ),
             types.Tool(
                 name="get_task_stats",
-                description="Get statistics about tasks: total count, average reward, status breakdown.",
+                description="Get statistics about tasks: total count, average/median/p90 reward, status and category breakdown.",
                 inputSchema={
                     "type": "object",
                     "properties": {}
@@ -131,15 +466,64 @@ try:
 
     @server.call_tool()
     async def call_tool(name: str, arguments: dict):
+        with tracing.span("mcp.call_tool", traceparent=_request_traceparent(), tool=name):
+            tool_cache = _tool_caches.get(name)
+            cache_key = json.dumps(arguments or {}, sort_keys=True)
+            if tool_cache is not None:
+                cached = tool_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            # LLM tools are metered per session and globally; rejected calls return at once
+            # (never block the event loop waiting for a slot)
+            limiter = admission.AI if name in LLM_TOOLS else None
+            if limiter is not None:
+                try:
+                    limiter.admit(_session_key(), wait=False)
+                except admission.Rejected as e:
+                    return [types.TextContent(type="text", text=json.dumps({
+                        "error": "Too many requests, please retry shortly", "reason": e.reason,
+                        "retry_after": round(e.retry_after, 2)
+                    }))]
+
+            executor = _llm_executor if name in LLM_TOOLS else _db_executor
+            timeout = TOOL_TIMEOUTS.get(name, MCP_TOOL_TIMEOUT)
+            # The admission slot is held until the worker thread is done, not just until we stop waiting
+            on_done = limiter.release if limiter is not None else None
+            try:
+                result = await run_blocking(executor, timeout, _run_coalesced, name, arguments, cache_key,
+                                            on_done=on_done)
+                # Error payloads (e.g. suggest_price after an OpenAI failure) are retried, not served for the TTL
+                if tool_cache is not None and not _is_error(result):
+                    tool_cache.set(cache_key, result)
+                return result
+            except asyncio.TimeoutError:
+                return [types.TextContent(type="text", text=json.dumps({
+                    "error": f"Tool '{name}' timed out after {timeout}s"
+                }))]
+
+    def _run_coalesced(name, arguments, cache_key):
+        """LLM tools: identical concurrent calls (e.g. suggest_price for one task type) share one run."""
+        if name not in LLM_TOOLS:
+            return _run_tool(name, arguments)
+        return _tool_flights.do((name, cache_key), lambda: _run_tool(name, arguments),
+                                shareable=lambda result: not _is_error(result))
+
+    def _run_tool(name, arguments):
+        """Synchronous tool implementations (run on a worker thread by call_tool)."""
         if name == "search_tasks":
-            keyword = arguments.get("keyword", "")
-            tasks = query_db(
-                "SELECT id, title, description, reward, status FROM tasks WHERE title LIKE ? OR description LIKE ?",
-                (f"%{keyword}%", f"%{keyword}%")
-            )
-            return [types.TextContent(type="text", text=json.dumps(tasks, indent=2))]
+            try:
+                page = query_tasks_page(**page_args(arguments))
+            except ValueError as e:
+                return [types.TextContent(type="text", text=json.dumps({"error": str(e)}))]
+            return [types.TextContent(type="text", text=json.dumps(page))]
 
         elif name == "get_task_stats":
+            if has_table('task_stats'):
+                # O(1): read the trigger-maintained aggregates
+                result = task_stats.summary(get_connection())
+                return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+
             total = query_db_one("SELECT COUNT(*) as count, AVG(reward) as avg_reward FROM tasks")
             statuses = query_db("SELECT status, COUNT(*) as count FROM tasks GROUP BY status")
             result = {
@@ -152,35 +536,15 @@ try:
         elif name == "suggest_price":
             task_type = arguments.get("task_type", "").lower()
             
-            # Query database for similar tasks from both tables
-            similar_tasks = query_db(
-                "SELECT title, reward FROM tasks WHERE title LIKE ? OR description LIKE ?",
-                (f"%{task_type}%", f"%{task_type}%")
-            )
-            available_tasks = query_db(
-                "SELECT title, reward FROM available_tasks WHERE title LIKE ? OR description LIKE ?",
-                (f"%{task_type}%", f"%{task_type}%")
-            )
-            
-            # Combine results
-            all_similar = similar_tasks + available_tasks
-            
-            if not all_similar:
-                # Fallback: get all tasks if no exact matches
-                all_similar = query_db("SELECT title, reward FROM tasks UNION SELECT title, reward FROM available_tasks")
-            
-            # Calculate statistics
-            rewards = [task["reward"] for task in all_similar if task["reward"]]
+            # Category aggregates (task_stats) replace LIKE scans over both tables
+            stats = task_stats.price_stats(get_connection(), task_type) if has_table("task_stats") else None
             
-            if rewards:
-                price_min = round(min(rewards), 2)
-                price_max = round(max(rewards), 2)
-                price_avg = round(sum(rewards) / len(rewards), 2)
+            if stats:
+                price_min, price_max, price_avg = stats["min"], stats["max"], stats["avg"]
                 
                 # Use OpenAI to suggest a price with reasoning
                 try:
-                    from openai import OpenAI
-                    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+                    client = llm_usage.get_openai_client()
                     
                     prompt = f"""Based on the following task pricing data from our platform, suggest a fair price for a '{task_type}' task.
 
@@ -188,10 +552,12 @@ Database statistics:
 - Minimum price seen: ${price_min}
 - Maximum price seen: ${price_max}
 - Average price: ${price_avg}
-- Number of similar tasks: {len(rewards)}
+- Median price: ${stats["median"]}
+- 90th percentile price: ${stats["p90"]}
+- Number of similar tasks ({stats["category"]}): {stats["sample_size"]}
 
 Sample tasks:
-{json.dumps(all_similar[:5], indent=2)}
+{json.dumps(stats["samples"], indent=2)}
 
 Provide:
 1. A suggested price (single number)
@@ -205,7 +571,8 @@ Respond in JSON format:
   "reasoning": "<text>"
 }}"""
                     
-                    response = client.chat.completions.create(
+                    response = llm_usage.create_completion(
+                        client, tool="mcp:suggest_price", timeout=MCP_LLM_TOOL_TIMEOUT,
                         model="gpt-4o-mini",
                         messages=[{"role": "user", "content": prompt}],
                         response_format={"type": "json_object"}
@@ -218,10 +585,12 @@ Respond in JSON format:
                         "price_range": ai_result.get("price_range", {"min": price_min, "max": price_max}),
                         "reasoning": ai_result.get("reasoning", "Based on platform data"),
                         "data_stats": {
-                            "sample_size": len(rewards),
+                            "sample_size": stats["sample_size"],
                             "db_min": price_min,
                             "db_max": price_max,
-                            "db_avg": price_avg
+                            "db_avg": price_avg,
+                            "db_median": stats["median"],
+                            "category": stats["category"]
                         }
                     }
                     return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
@@ -232,16 +601,16 @@ Respond in JSON format:
                         "task_type": task_type,
                         "suggested_price": price_avg,
                         "price_range": {"min": price_min, "max": price_max},
-                        "reasoning": f"Based on {len(rewards)} similar tasks in our database",
+                        "reasoning": f"Based on {stats['sample_size']} similar tasks in our database ({stats['category']})",
                         "error": str(e)
                     }
                     return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
-                return [types.TextContent(type="text", text=json.dumps({
-                    "task_type": task_type,
-                    "suggested_price": 30,
-                    "price_range": {"min": 15, "max": 50},
-                    "reasoning": "No similar tasks found in database. Using general platform estimate."
-                }, indent=2))]
+            return [types.TextContent(type="text", text=json.dumps({
+                "task_type": task_type,
+                "suggested_price": 30,
+                "price_range": {"min": 15, "max": 50},
+                "reasoning": "No similar tasks found in database. Using general platform estimate."
+            }, indent=2))]
 
         elif name == "get_recommended_tasks":
             user_id = arguments.get("user_id", 1)
@@ -263,8 +632,7 @@ Respond in JSON format:
             tasks_subset = tasks 
             
             try:
-                from openai import OpenAI
-                client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+                client = llm_usage.get_openai_client()
                 
                 prompt = f"""Match this user to the best tasks.
 User Profile:
@@ -277,7 +645,8 @@ Available Tasks:
 Return the top 5 suitable tasks IDs and strict reasons.
 JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ] }}"""
 
-                response = client.chat.completions.create(
+                response = llm_usage.create_completion(
+                    client, tool="mcp:get_recommended_tasks", user_id=user_id, timeout=MCP_LLM_TOOL_TIMEOUT,
                     model="gpt-4o-mini",
                     messages=[{"role": "user", "content": prompt}],
                     response_format={"type": "json_object"}
@@ -305,14 +674,50 @@ JSON Format: {{ "recommendations": [ {{ "map_id": <int>, "reason": "<text>" }} ]
 
         raise ValueError(f"Unknown tool: {name}")
 
-    async def main():
+    async def run_stdio():
         async with stdio_server() as (read_stream, write_stream):
-            await server.run(read_stream, write_stream)
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+
+    def create_http_app():
+        """Starlette app serving the MCP streamable HTTP transport at /mcp.
+
+        One process serves every agent session, so the worker pools, per-thread
+        DB connections and result caches above are shared between them.
+        """
+        from starlette.applications import Starlette
+        from starlette.routing import Mount
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        session_manager = StreamableHTTPSessionManager(app=server, max_sessions=MCP_MAX_SESSIONS)
+
+        async def handle_mcp(scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+        @contextlib.asynccontextmanager
+        async def lifespan(app):
+            async with session_manager.run():
+                yield
+
+        return Starlette(routes=[Mount("/mcp", app=handle_mcp)], lifespan=lifespan)
+
+    def run_http(host, port):
+        import uvicorn
+        print(f"Serving MCP over streamable HTTP at http://{host}:{port}/mcp", file=sys.stderr)
+        uvicorn.run(create_http_app(), host=host, port=port,
+                    limit_concurrency=MCP_MAX_CONNECTIONS, log_level="warning")
 
     if __name__ == "__main__":
-        import asyncio
+        parser = argparse.ArgumentParser(description="Find a Helper MCP server")
+        parser.add_argument('--transport', choices=['stdio', 'http'], default=os.getenv('MCP_TRANSPORT', 'stdio'))
+        parser.add_argument('--host', default=MCP_HOST)
+        parser.add_argument('--port', type=int, default=MCP_PORT)
+        cli_args = parser.parse_args()
+
         print("Starting Find a Helper MCP Server...", file=sys.stderr)
-        asyncio.run(main())
+        if cli_args.transport == 'http':
+            run_http(cli_args.host, cli_args.port)
+        else:
+            asyncio.run(run_stdio())
 
 except ImportError:
     # MCP not installed — provide a fallback
@@ -0,0 +1,226 @@
+"""
+Metrics module — in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format (served by app.py at /metrics).
+
+Everything is plain Python with one lock per metric, so recording a sample is a
+dict lookup plus a bisect — cheap enough to leave on in production.
+"""
+
+import bisect
+import threading
+
+# Latency buckets in seconds (upper bounds, +Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set."""
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, k)} {_format_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. requests in flight)."""
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """Bucketed observations plus running sum and count per label set."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *label_values, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *label_values):
+        entry = self._values.get(label_values)
+        return entry[2] if entry else 0
+
+    def total(self, *label_values):
+        entry = self._values.get(label_values)
+        return entry[1] if entry else 0.0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                cumulative += c
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+# --- Metrics used across the app ---
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by method, route and status code.",
+    labels=("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route.",
+    labels=("method", "route"))
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.")
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time (to first row) by statement.",
+    labels=("statement",))
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "SQL statements that raised an error.",
+    labels=("statement",))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache name and result (hit/miss); hit ratio = hit / total.",
+    labels=("cache", "result"))
+
+JOBS = Counter(
+    "jobs_total", "Background jobs by kind and outcome (enqueued, done, retried, failed, lease_lost).",
+    labels=("kind", "outcome"))
+JOB_LAG = Histogram(
+    "job_lag_seconds", "Time from enqueue to a worker starting the job, by kind.",
+    labels=("kind",))
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Job run time by kind.",
+    labels=("kind",))
+SINGLEFLIGHT = Counter(
+    "singleflight_total", "Coalesced computations by name and role (leader computed it / shared its result / retried: the leader's outcome was cut short by its own deadline).",
+    labels=("name", "role"))
+ADMISSION = Counter(
+    "admission_total", "Admission decisions by pool (ai / api) and outcome "
+    "(admitted, user_rate, global_rate, queue_full, queue_timeout).",
+    labels=("pool", "outcome"))
+ADMISSION_QUEUE = Gauge(
+    "admission_queue_depth", "Requests waiting for a slot, by pool.",
+    labels=("pool",))
+
+CHAT_ROUTES = Counter(
+    "chat_routes_total", "Chat messages by route (local intent router / llm / degraded) and intent.",
+    labels=("route", "intent"))
+CHAT_LATENCY = Histogram(
+    "chat_duration_seconds", "End-to-end chat() latency by route (local / llm / degraded).",
+    labels=("route",))
+CHAT_FOLLOWUPS = Counter(
+    "chat_followups_total", "LLM tool turns by whether the follow-up completion ran or was skipped "
+    "(reply built from structured tool results).",
+    labels=("outcome",))
+STARTUP = Gauge(
+    "app_startup_seconds", "Time spent in each create_app() startup step (init_db, module preloads, warm-up).",
+    labels=("step",))
+
+
+_statement_labels = {}
+
+
+def statement_label(sql):
+    """Collapse whitespace so the same statement always maps to one label."""
+    label = _statement_labels.get(sql)
+    if label is None:
+        label = " ".join(sql.split())[:200]
+        if len(_statement_labels) < 5000:
+            _statement_labels[sql] = label
+    return label
+
+
+def observe_request(method, route, status, duration):
+    HTTP_REQUESTS.inc(method, route, str(status))
+    HTTP_LATENCY.observe(method, route, value=duration)
+
+
+def observe_query(sql, duration, error=False):
+    label = statement_label(sql)
+    DB_QUERY_LATENCY.observe(label, value=duration)
+    if error:
+        DB_QUERY_ERRORS.inc(label)
+
+
+def observe_chat(route, intent, duration):
+    CHAT_ROUTES.inc(route, intent)
+    CHAT_LATENCY.observe(route, value=duration)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
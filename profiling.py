@@ -0,0 +1,141 @@
+"""
+On-demand request profiling — wraps sampled requests in cProfile plus a stack
+sampler and writes one .pstats and one .collapsed (flamegraph.pl / speedscope)
+file per request into a rotating directory.
+
+Configured from the environment; when neither PROFILE_REQUESTS nor
+PROFILE_SAMPLE_RATE is set no hooks are registered at all.
+
+    PROFILE_REQUESTS=1          profile every request
+    PROFILE_SAMPLE_RATE=0.01    profile ~1% of requests
+    PROFILE_ROUTES=/api/chat,/api/nearby   only these route rules (default: all)
+    PROFILE_MIN_MS=200          only keep profiles of requests slower than this
+    PROFILE_DIR=profiles        output directory
+    PROFILE_KEEP=200            number of profiles to keep
+    PROFILE_INTERVAL_MS=5       stack sampling interval
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    """Registers Flask hooks that profile a sample of requests."""
+
+    def __init__(self, app=None):
+        self.always = os.getenv('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+        self.sample_rate = _env_float('PROFILE_SAMPLE_RATE', 0.0)
+        routes = os.getenv('PROFILE_ROUTES', '')
+        self.routes = {r.strip() for r in routes.split(',') if r.strip()}
+        self.min_ms = _env_float('PROFILE_MIN_MS', 0.0)
+        self.directory = os.getenv('PROFILE_DIR', 'profiles')
+        self.keep = int(_env_float('PROFILE_KEEP', 200))
+        self.interval = _env_float('PROFILE_INTERVAL_MS', 5.0) / 1000
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        return self.always or self.sample_rate > 0
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    def _should_profile(self):
+        if self.routes and (request.url_rule is None or request.url_rule.rule not in self.routes):
+            return False
+        return self.always or random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._should_profile():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        g._profile = (profiler, sampler, time.perf_counter())
+
+    def _stop(self, exception):
+        state = g.pop('_profile', None)
+        if state is None:
+            return
+        profiler, sampler, start = state
+        profiler.disable()
+        sampler.stop()
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < self.min_ms:
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self._write(profiler, sampler.counts, route, request.method, duration_ms)
+
+    def _write(self, profiler, counts, route, method, duration_ms):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+        base = os.path.join(self.directory, f"{stamp}_{method}_{slug}_{int(duration_ms)}ms")
+        try:
+            profiler.dump_stats(base + '.pstats')
+            with open(base + '.collapsed', 'w') as f:
+                for stack, n in counts.most_common():
+                    f.write(f"{stack} {n}\n")
+            self._rotate()
+        except OSError as e:
+            print(f"Could not write request profile: {e}", file=sys.stderr)
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond PROFILE_KEEP (a profile is a .pstats/.collapsed pair)."""
+        stems = sorted({os.path.splitext(f)[0] for f in os.listdir(self.directory)
+                        if f.endswith(('.pstats', '.collapsed'))})
+        for stem in stems[:max(len(stems) - self.keep, 0)]:
+            for ext in ('.pstats', '.collapsed'):
+                path = os.path.join(self.directory, stem + ext)
+                if os.path.exists(path):
+                    os.remove(path)
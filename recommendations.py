@@ -0,0 +1,50 @@
+"""
+Precomputed task recommendations — one row per user in `recommendations`,
+written by the background job queue (jobs.py) whenever the user's
+available_tasks snapshot or profile changes, and read by the
+get_recommended_tasks tool so the LLM call is off the chat critical path.
+
+A stored result is only served while its fingerprint (expertise, bio and the
+available tasks it was computed from) still matches.
+"""
+
+import hashlib
+import json
+import time
+
+JOB_KIND = "recommendations"
+
+
+def init_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recommendations (
+            user_id INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            result TEXT NOT NULL,
+            computed_at REAL NOT NULL
+        )
+    ''')
+
+
+def fingerprint(expertise, bio, tasks):
+    """Stable hash of everything a recommendation depends on."""
+    snapshot = sorted((t['map_id'], t['title'], t['description'], t['reward']) for t in tasks)
+    return hashlib.sha1(json.dumps([expertise, bio, snapshot], default=str).encode()).hexdigest()
+
+
+def load(conn, user_id, expected):
+    """The stored result (JSON text) if it was computed from `expected`, else None."""
+    row = conn.execute('SELECT fingerprint, result FROM recommendations WHERE user_id = ?', (user_id,)).fetchone()
+    if row is None or row['fingerprint'] != expected:
+        return None
+    return row['result']
+
+
+def save(conn, user_id, fp, result):
+    conn.execute(
+        'INSERT INTO recommendations (user_id, fingerprint, result, computed_at) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (user_id) DO UPDATE SET fingerprint = excluded.fingerprint, result = excluded.result, '
+        'computed_at = excluded.computed_at',
+        (user_id, fp, result, time.time())
+    )
+    conn.commit()
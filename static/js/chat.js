@@ -26,17 +26,61 @@ document.addEventListener('DOMContentLoaded', () => {
         fetch('/api/chat/history')
             .then(res => res.json())
             .then(data => {
+                // Older turns are compacted server-side: show their summary and let the user page them in
+                if (data.summary) {
+                    const note = document.createElement('div');
+                    note.className = 'chat-summary';
+                    note.innerHTML = renderMarkdown('**Earlier in this conversation:** ' + data.summary);
+                    messages.appendChild(note);
+                }
+                if (data.has_archived) {
+                    addOlderLoader();
+                }
                 if (data.history && data.history.length > 0) {
                     data.history.forEach(msg => {
                         appendMessage(msg.content, msg.role, false);
                     });
-                } else {
+                } else if (!data.summary) {
                     appendMessage("Hi! I'm your Find a Helper assistant. Ask me about tasks, pricing, or anything else!", 'assistant', false);
                 }
             })
             .catch(err => console.error('Failed to load chat history:', err));
     }
 
+    // --- Archived (compacted) messages, newest page first ---
+    function addOlderLoader() {
+        const button = document.createElement('button');
+        button.className = 'chat-load-older';
+        button.textContent = 'Load earlier messages';
+        let before = null;
+        button.addEventListener('click', () => {
+            button.disabled = true;
+            const url = '/api/chat/history?archived=1&limit=20' + (before !== null ? `&before=${before}` : '');
+            fetch(url)
+                .then(res => res.json())
+                .then(data => {
+                    const page = data.archived || [];
+                    // The page is newest first: insert each one directly below the button
+                    const scrollFromBottom = messages.scrollHeight - messages.scrollTop;
+                    page.forEach(msg => {
+                        button.after(createMessage(msg.content, msg.role));
+                    });
+                    messages.scrollTop = messages.scrollHeight - scrollFromBottom;
+                    before = data.next_before;
+                    if (page.length < 20) {
+                        button.remove();
+                    } else {
+                        button.disabled = false;
+                    }
+                })
+                .catch(err => {
+                    button.disabled = false;
+                    console.error('Failed to load earlier messages:', err);
+                });
+        });
+        messages.appendChild(button);
+    }
+
     // Toggle chat panel
     toggle.addEventListener('click', () => {
         panel.classList.toggle('open');
@@ -156,8 +200,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     if (data.success) {
                         card.innerHTML = '<div class="proposal-success">Task posted! Look for the green marker on the map.</div>';
                         // Refresh map
-                        if (typeof loadNearbyTasks === 'function' && typeof L !== 'undefined') {
-                            loadNearbyTasks(L.latLng(lat, lng));
+                        if (typeof refreshPostedTasks === 'function' && typeof L !== 'undefined') {
+                            refreshPostedTasks();
                         }
                     } else {
                         card.innerHTML = '<div class="proposal-error">Error: ' + (data.error || 'Unknown error') + '</div>';
@@ -239,7 +283,7 @@ document.addEventListener('DOMContentLoaded', () => {
         input.focus();
     }
 
-    function appendMessage(text, type, save = false) {
+    function createMessage(text, type) {
         const msg = document.createElement('div');
         msg.className = `chat-msg ${type}`;
 
@@ -249,7 +293,11 @@ document.addEventListener('DOMContentLoaded', () => {
         } else {
             msg.textContent = text;
         }
+        return msg;
+    }
 
+    function appendMessage(text, type, save = false) {
+        const msg = createMessage(text, type);
         messages.appendChild(msg);
         messages.scrollTop = messages.scrollHeight;
         return msg;
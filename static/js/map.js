@@ -13,6 +13,87 @@ L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
 
 let availableTasks = {};
 let markers = {}; // Store references to task markers
+let taskLayer = L.layerGroup().addTo(map); // Demo tasks and clusters in the current viewport
+let nearbyTasks = []; // Individual tasks from the last /api/nearby response
+let pendingHighlight = null; // Task to open once the viewport around it has loaded
+let storedTaskKey = '';
+let refetchTimer = null;
+let syncTimer = null;
+let nearbyRequest = null;
+
+const REFETCH_DEBOUNCE_MS = 250;
+
+// User-posted tasks come from the cacheable /tiles/{z}/{x}/{y} GeoJSON endpoint
+const PostedTaskTiles = L.GridLayer.extend({
+    initialize: function (options) {
+        L.GridLayer.prototype.initialize.call(this, options);
+        this.version = 0; // bumped after our own writes to bypass the browser cache
+        this.groups = {};
+        this.tasks = {};
+        this.on('tileunload', e => this.dropTile(this.keyFor(e.coords)));
+    },
+
+    keyFor: function (coords) {
+        return `${coords.z}/${coords.x}/${coords.y}`;
+    },
+
+    createTile: function (coords, done) {
+        const tile = document.createElement('div');
+        const key = this.keyFor(coords);
+        fetch(`/tiles/${key}?v=${this.version}`)
+            .then(response => response.json())
+            .then(geojson => {
+                this.dropTile(key);
+                const group = L.layerGroup().addTo(map);
+                const tasks = [];
+                geojson.features.forEach(feature => {
+                    const [lng, lat] = feature.geometry.coordinates;
+                    const props = feature.properties;
+                    if (props.cluster) {
+                        addClusterMarker({ ...props, lat: lat, lng: lng }, group);
+                    } else {
+                        const task = { ...props, lat: lat, lng: lng };
+                        availableTasks[task.id] = task;
+                        addTaskMarker(task, group);
+                        tasks.push(task);
+                    }
+                });
+                this.groups[key] = group;
+                this.tasks[key] = tasks;
+                openPendingHighlight();
+                scheduleAvailableTasksSync();
+                done(null, tile);
+            })
+            .catch(err => done(err, tile));
+        return tile;
+    },
+
+    dropTile: function (key) {
+        if (this.groups[key]) {
+            this.tasks[key].forEach(task => { if (this.groups[key].hasLayer(markers[task.id])) delete markers[task.id]; });
+            this.groups[key].remove();
+            delete this.groups[key];
+            delete this.tasks[key];
+            scheduleAvailableTasksSync();
+        }
+    },
+
+    visibleTasks: function () {
+        return [].concat(...Object.values(this.tasks));
+    },
+
+    refresh: function () {
+        this.version += 1;
+        this.redraw();
+    }
+});
+
+const postedTaskTiles = new PostedTaskTiles({ minZoom: 10, maxZoom: 19 }).addTo(map);
+
+// Refetch posted tasks after the user adds or removes one
+function refreshPostedTasks() {
+    postedTaskTiles.refresh();
+}
 
 // 2. Set up location with the map
 function initLocation(lat, lng, source) {
@@ -25,86 +106,152 @@ function initLocation(lat, lng, source) {
     L.marker(latlng).addTo(map)
         .bindPopup("You are here!").openPopup();
 
-    loadNearbyTasks(latlng);
+    loadNearbyTasks();
+    // Refetch the visible tasks whenever the viewport settles
+    map.on('moveend', scheduleNearbyRefetch);
 }
 
-function loadNearbyTasks(latlng) {
-    fetch(`/api/nearby?lat=${latlng.lat}&lng=${latlng.lng}`)
-        .then(response => response.json())
-        .then(data => {
-            data.tasks.forEach(task => {
-                availableTasks[task.id] = task;
+function scheduleNearbyRefetch() {
+    clearTimeout(refetchTimer);
+    refetchTimer = setTimeout(loadNearbyTasks, REFETCH_DEBOUNCE_MS);
+}
 
-                var taskLatLng = L.latLng(task.lat, task.lng);
-                var distance = myLocation.distanceTo(taskLatLng);
-                var distanceKm = (distance / 1000).toFixed(2);
+function buildPopup(task) {
+    // /api/nearby precomputes distance_km; posted-task tiles are shared, so measure those here
+    var distanceKm = task.distance_km !== undefined ? task.distance_km.toFixed(2) :
+        myLocation ? (myLocation.distanceTo(L.latLng(task.lat, task.lng)) / 1000).toFixed(2) : '?';
 
-                // Match Score Badge
-                let matchBadge = '';
-                if (task.match_score && task.match_score >= 60) {
-                    const badgeBg = task.match_color === 'purple' ? 'linear-gradient(135deg, #6fd 0%, #9370DB 100%)' : '#FFA500';
-                    const badgeStyle = `background:${badgeBg};color:white;padding:4px 10px;border-radius:12px;display:inline-block;font-size:0.85rem;font-weight:bold;margin-bottom:8px;box-shadow:0 2px 4px rgba(0,0,0,0.1);`;
-                    matchBadge = `<div style="${badgeStyle}">${task.match_score}% Match</div>`;
-                }
+    // Match Score Badge
+    let matchBadge = '';
+    if (task.match_score && task.match_score >= 60) {
+        const badgeBg = task.match_color === 'purple' ? 'linear-gradient(135deg, #6fd 0%, #9370DB 100%)' : '#FFA500';
+        const badgeStyle = `background:${badgeBg};color:white;padding:4px 10px;border-radius:12px;display:inline-block;font-size:0.85rem;font-weight:bold;margin-bottom:8px;box-shadow:0 2px 4px rgba(0,0,0,0.1);`;
+        matchBadge = `<div style="${badgeStyle}">${task.match_score}% Match</div>`;
+    }
 
-                var popupContent = `
-                    <div class="task-popup">
-                        ${matchBadge}
-                        <h3>${task.title}</h3>
-                        <p><strong>Description:</strong> ${task.description}</p>
-                        <p><strong>Reward:</strong> $${task.reward}</p>
-                        <p><strong>Distance:</strong> ${distanceKm} km</p>
-                        <hr style="margin: 10px 0; border: 0; border-top: 1px solid #eee;">
-                        ${task.is_custom ?
-                        `<button onclick="deleteTask(event, ${task.id})" class="btn-post" style="background-color: #d9534f;">Delete Task</button>` :
-                        `<button onclick="acceptTask(event, ${task.id})" class="btn-post">Accept Task</button>`
-                    }
-                    </div>
-                `;
-
-                const isCustom = task.is_custom === true;
-
-                // Determine marker style
-                let markerColor = 'red';
-                let fillColor = '#f03';
-                let fillOpacity = 0.5;
-                let radius = 10;
-
-                if (isCustom) {
-                    markerColor = 'green';
-                    fillColor = '#32CD32';
-                    fillOpacity = 0.8;
-                    radius = 12;
-                } else if (task.match_color === 'purple') {
-                    markerColor = 'purple';
-                    fillColor = '#8A2BE2'; // BlueViolet
-                    fillOpacity = 0.7;
-                    radius = 11;
-                } else if (task.match_color === 'orange') {
-                    markerColor = 'orange';
-                    fillColor = '#FFA500';
-                    fillOpacity = 0.6;
-                }
+    return `
+        <div class="task-popup">
+            ${matchBadge}
+            <h3>${task.title}</h3>
+            <p><strong>Description:</strong> ${task.description}</p>
+            <p><strong>Reward:</strong> $${task.reward}</p>
+            <p><strong>Distance:</strong> ${distanceKm} km</p>
+            <hr style="margin: 10px 0; border: 0; border-top: 1px solid #eee;">
+            ${task.is_custom ?
+            `<button onclick="deleteTask(event, ${task.id})" class="btn-post" style="background-color: #d9534f;">Delete Task</button>` :
+            `<button onclick="acceptTask(event, ${task.id})" class="btn-post">Accept Task</button>`
+        }
+        </div>
+    `;
+}
 
-                var marker = L.circleMarker([task.lat, task.lng], {
-                    color: markerColor,
-                    fillColor: fillColor,
-                    fillOpacity: fillOpacity,
-                    radius: radius
-                }).addTo(map)
-                    .bindPopup(popupContent);
+function addTaskMarker(task, layer) {
+    const isCustom = task.is_custom === true;
 
-                markers[task.id] = marker;
+    // Determine marker style
+    let markerColor = 'red';
+    let fillColor = '#f03';
+    let fillOpacity = 0.5;
+    let radius = 10;
+
+    if (isCustom) {
+        markerColor = 'green';
+        fillColor = '#32CD32';
+        fillOpacity = 0.8;
+        radius = 12;
+    } else if (task.match_color === 'purple') {
+        markerColor = 'purple';
+        fillColor = '#8A2BE2'; // BlueViolet
+        fillOpacity = 0.7;
+        radius = 11;
+    } else if (task.match_color === 'orange') {
+        markerColor = 'orange';
+        fillColor = '#FFA500';
+        fillOpacity = 0.6;
+    }
+
+    // Popup HTML is built lazily, when the marker is opened
+    var marker = L.circleMarker([task.lat, task.lng], {
+        color: markerColor,
+        fillColor: fillColor,
+        fillOpacity: fillOpacity,
+        radius: radius
+    }).addTo(layer)
+        .bindPopup(() => buildPopup(task));
+
+    markers[task.id] = marker;
+    return marker;
+}
+
+function addClusterMarker(cluster, layer) {
+    var marker = L.circleMarker([cluster.lat, cluster.lng], {
+        color: '#1f6feb',
+        fillColor: '#58a6ff',
+        fillOpacity: 0.7,
+        radius: Math.min(30, 12 + Math.sqrt(cluster.count) * 3)
+    }).addTo(layer)
+        .bindTooltip(String(cluster.count), { permanent: true, direction: 'center', className: 'cluster-label' });
+
+    // Zoom into the cluster's extent
+    marker.on('click', () => {
+        const [south, west, north, east] = cluster.bounds;
+        map.fitBounds([[south, west], [north, east]], { padding: [40, 40], maxZoom: map.getZoom() + 2 });
+    });
+}
+
+function loadNearbyTasks() {
+    const bounds = map.getBounds();
+    const bbox = [bounds.getSouth(), bounds.getWest(), bounds.getNorth(), bounds.getEast()].join(',');
+    const params = new URLSearchParams({
+        lat: myLocation.lat, lng: myLocation.lng, bbox: bbox, zoom: map.getZoom(), posted: 0
+    });
+
+    // Drop the response of a superseded viewport
+    if (nearbyRequest) nearbyRequest.abort();
+    nearbyRequest = new AbortController();
+
+    fetch(`/api/nearby?${params}`, { signal: nearbyRequest.signal })
+        .then(response => response.json())
+        .then(data => {
+            Object.keys(markers).forEach(id => { if (taskLayer.hasLayer(markers[id])) delete markers[id]; });
+            taskLayer.clearLayers();
+
+            nearbyTasks = data.tasks;
+            data.tasks.forEach(task => {
+                availableTasks[task.id] = task;
+                addTaskMarker(task, taskLayer);
             });
+            data.clusters.forEach(cluster => addClusterMarker(cluster, taskLayer));
 
-            // Store tasks in backend so the AI can search them
-            fetch('/api/store_available_tasks', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ tasks: data.tasks })
-            }).catch(err => console.warn('Could not store tasks for AI:', err));
+            openPendingHighlight();
+            scheduleAvailableTasksSync();
         })
-        .catch(error => console.error('Error fetching nearby data:', error));
+        .catch(error => {
+            if (error.name !== 'AbortError') console.error('Error fetching nearby data:', error);
+        });
+}
+
+function openPendingHighlight() {
+    if (pendingHighlight !== null && markers[pendingHighlight]) {
+        markers[pendingHighlight].openPopup();
+        pendingHighlight = null;
+    }
+}
+
+// Store the individually visible tasks in the backend so the AI can search them
+function scheduleAvailableTasksSync() {
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(() => {
+        const tasks = nearbyTasks.concat(postedTaskTiles.visibleTasks());
+        const key = tasks.map(task => task.id).sort((a, b) => a - b).join(',');
+        if (!tasks.length || key === storedTaskKey) return;
+        storedTaskKey = key;
+        fetch('/api/store_available_tasks', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ tasks: tasks })
+        }).catch(err => console.warn('Could not store tasks for AI:', err));
+    }, REFETCH_DEBOUNCE_MS);
 }
 
 // 3. Try browser geolocation first
@@ -137,6 +284,10 @@ window.highlightTask = function (taskId) {
     if (marker) {
         map.setView(marker.getLatLng(), 16);
         marker.openPopup();
+    } else if (availableTasks[taskId]) {
+        // Currently inside a cluster: zoom in and open it once the viewport reloads
+        pendingHighlight = taskId;
+        map.setView([availableTasks[taskId].lat, availableTasks[taskId].lng], 16);
     }
 };
 
@@ -173,7 +324,7 @@ function acceptTask(event, taskId) {
 
             // Remove marker from map
             if (markers[taskId]) {
-                map.removeLayer(markers[taskId]);
+                markers[taskId].remove();
                 delete markers[taskId];
                 delete availableTasks[taskId]; // Also remove from availableTasks
             }
@@ -198,10 +349,11 @@ function deleteTask(event, taskId) {
             if (data.success) {
                 map.closePopup();
                 if (markers[taskId]) {
-                    map.removeLayer(markers[taskId]);
+                    markers[taskId].remove();
                     delete markers[taskId];
                     delete availableTasks[taskId];
                 }
+                refreshPostedTasks();
             } else {
                 alert("Error deleting task: " + (data.error || "Unknown error"));
             }
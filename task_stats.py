@@ -0,0 +1,310 @@
+"""
+Incrementally maintained task statistics.
+
+Triggers on `tasks` and `available_tasks` keep two small tables up to date:
+  - task_stats:        count / reward count / sum / min / max per group
+  - task_reward_hist:  reward histogram ($5 buckets) per group, for approximate quantiles
+Groups for `tasks` are ('all', ''), ('status', <status>) and ('category', <category>).
+Both tables feed the pricing groups ('price_all', '') and ('price_category', <category>),
+which only count priced rows (reward > 0).
+get_task_stats and suggest_price read a handful of rows instead of scanning tables.
+"""
+
+import re
+
+import categories
+
+BUCKET_WIDTH = 5.0
+MAX_BUCKET = 100  # rewards >= $500 share the last bucket
+
+# Category of a row: the category column set at insert time (categories.classify),
+# else the "Gardening - Urgent" style title prefix for rows written outside the app
+CATEGORY_SQL = ("COALESCE({r}.category, TRIM(CASE WHEN instr({r}.title, ' - ') > 0 "
+                "THEN substr({r}.title, 1, instr({r}.title, ' - ') - 1) ELSE {r}.title END))")
+
+# Rows of one category, as indexed lookups on (category, reward); the title prefix
+# only matters for rows written without a category
+CATEGORY_MATCH = ("t.category = {key}", "t.category IS NULL AND " + CATEGORY_SQL.format(r="t") + " = {key}")
+PRICED = "{r}.reward > 0"
+
+# table: {dimension: (key expression for a row, predicates whose union is the group's rows
+#                     in that table, row filter or None)}
+TABLE_DIMENSIONS = {
+    "tasks": {
+        "all": ("''", ("1",), None),
+        "status": ("COALESCE({r}.status, '')", ("t.status = {key}", "t.status IS NULL AND {key} = ''"), None),
+        "category": (CATEGORY_SQL, CATEGORY_MATCH, None),
+        "price_all": ("''", ("1",), PRICED),
+        "price_category": (CATEGORY_SQL, CATEGORY_MATCH, PRICED),
+    },
+    "available_tasks": {
+        "price_all": ("''", ("1",), PRICED),
+        "price_category": (CATEGORY_SQL, CATEGORY_MATCH, PRICED),
+    },
+}
+
+# Indexes that turn the MIN/MAX recompute on delete into a seek per predicate
+INDEXES = {
+    "tasks": ("(category, reward)", "(status, reward)", "(reward)"),
+    "available_tasks": ("(category, reward)", "(reward)"),
+}
+
+
+def _bucket(r):
+    return f"MIN(CAST({r}.reward / {BUCKET_WIDTH} AS INTEGER), {MAX_BUCKET})"
+
+
+def _filter(table, dimension, r):
+    row_filter = TABLE_DIMENSIONS[table][dimension][2]
+    return row_filter.format(r=r) if row_filter else "1"
+
+
+def _add_sql(table, dimension, r):
+    key = TABLE_DIMENSIONS[table][dimension][0].format(r=r)
+    return f'''
+        INSERT INTO task_stats (dimension, key, count, reward_count, reward_sum, reward_min, reward_max)
+        SELECT '{dimension}', {key}, 1, ({r}.reward IS NOT NULL), COALESCE({r}.reward, 0), {r}.reward, {r}.reward
+        WHERE {_filter(table, dimension, r)}
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + 1,
+            reward_count = reward_count + excluded.reward_count,
+            reward_sum = reward_sum + excluded.reward_sum,
+            reward_min = MIN(COALESCE(reward_min, excluded.reward_min), COALESCE(excluded.reward_min, reward_min)),
+            reward_max = MAX(COALESCE(reward_max, excluded.reward_max), COALESCE(excluded.reward_max, reward_max));
+        INSERT INTO task_reward_hist (dimension, key, bucket, count)
+        SELECT '{dimension}', {key}, {_bucket(r)}, 1 WHERE {r}.reward IS NOT NULL AND {_filter(table, dimension, r)}
+        ON CONFLICT (dimension, key, bucket) DO UPDATE SET count = count + 1;
+    '''
+
+
+def _recompute_sql(dimension, key, aggregate):
+    """MIN/MAX of the group's rewards across every table feeding `dimension`, one indexed lookup per predicate."""
+    parts = []
+    for table, dimensions in TABLE_DIMENSIONS.items():
+        if dimension not in dimensions:
+            continue
+        for predicate in dimensions[dimension][1]:
+            parts.append(f"SELECT {aggregate}(t.reward) AS v FROM {table} t "
+                         f"WHERE {predicate.format(key=key)} AND {_filter(table, dimension, 't')}")
+    return f"(SELECT {aggregate}(v) FROM ({' UNION ALL '.join(parts)}))"
+
+
+def _remove_sql(table, dimension, r):
+    key = TABLE_DIMENSIONS[table][dimension][0].format(r=r)
+    return f'''
+        UPDATE task_stats SET
+            count = count - 1,
+            reward_count = reward_count - ({r}.reward IS NOT NULL),
+            reward_sum = reward_sum - COALESCE({r}.reward, 0),
+            reward_min = CASE WHEN {r}.reward IS NOT NULL AND {r}.reward <= reward_min
+                THEN {_recompute_sql(dimension, key, "MIN")} ELSE reward_min END,
+            reward_max = CASE WHEN {r}.reward IS NOT NULL AND {r}.reward >= reward_max
+                THEN {_recompute_sql(dimension, key, "MAX")} ELSE reward_max END
+        WHERE dimension = '{dimension}' AND key = {key} AND {_filter(table, dimension, r)};
+        UPDATE task_reward_hist SET count = count - 1
+        WHERE {r}.reward IS NOT NULL AND {_filter(table, dimension, r)}
+            AND dimension = '{dimension}' AND key = {key} AND bucket = {_bucket(r)};
+    '''
+
+
+def init_schema(conn):
+    """Create the aggregate tables and triggers; classify unlabelled rows and backfill the first time."""
+    for table in TABLE_DIMENSIONS:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+        if 'category' not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN category TEXT')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_category ON {table} (category)')
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            name = "_".join(re.findall(r"\w+", columns))
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} {columns}')
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'task_stats'").fetchone()
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            reward_count INTEGER NOT NULL DEFAULT 0,
+            reward_sum REAL NOT NULL DEFAULT 0,
+            reward_min REAL,
+            reward_max REAL,
+            PRIMARY KEY (dimension, key)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_reward_hist (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key, bucket)
+        )
+    ''')
+
+    for table, dimensions in TABLE_DIMENSIONS.items():
+        add_new = "".join(_add_sql(table, d, "new") for d in dimensions)
+        remove_old = "".join(_remove_sql(table, d, "old") for d in dimensions)
+        watched, status_changed = "reward, category, title", ""
+        if "status" in dimensions:
+            watched, status_changed = "status, " + watched, "old.status IS NOT new.status OR "
+        # Recreated on every start so a database from an older layout picks up the current triggers
+        conn.executescript(f'''
+            DROP TRIGGER IF EXISTS {table}_stats_insert;
+            DROP TRIGGER IF EXISTS {table}_stats_delete;
+            DROP TRIGGER IF EXISTS {table}_stats_update;
+            CREATE TRIGGER {table}_stats_insert AFTER INSERT ON {table} BEGIN
+                {add_new}
+            END;
+            CREATE TRIGGER {table}_stats_delete AFTER DELETE ON {table} BEGIN
+                {remove_old}
+            END;
+            CREATE TRIGGER {table}_stats_update AFTER UPDATE OF {watched} ON {table}
+            WHEN {status_changed}old.reward IS NOT new.reward
+                OR {CATEGORY_SQL.format(r="old")} IS NOT {CATEGORY_SQL.format(r="new")}
+            BEGIN
+                {remove_old}
+                {add_new}
+            END;
+        ''')
+
+    classify_missing(conn)
+    expected = {d for dimensions in TABLE_DIMENSIONS.values() for d in dimensions}
+    stored = {row[0] for row in conn.execute('SELECT DISTINCT dimension FROM task_stats').fetchall()}
+    if not exists or stored - expected:
+        rebuild(conn)
+
+
+def classify_missing(conn):
+    """Set the category of rows inserted without one (e.g. before categories existed)."""
+    for table, pk in (("tasks", "id"), ("available_tasks", "map_id")):
+        rows = conn.execute(f'SELECT {pk}, title, description FROM {table} WHERE category IS NULL').fetchall()
+        conn.executemany(
+            f'UPDATE {table} SET category = ? WHERE {pk} = ?',
+            [(categories.classify(r['title'], r['description']), r[pk]) for r in rows]
+        )
+
+
+def rebuild(conn):
+    """Recompute both aggregate tables from scratch."""
+    conn.execute('DELETE FROM task_stats')
+    conn.execute('DELETE FROM task_reward_hist')
+    for table, dimensions in TABLE_DIMENSIONS.items():
+        for dimension, (key_expr, _, _) in dimensions.items():
+            key = key_expr.format(r="t")
+            row_filter = _filter(table, dimension, "t")
+            conn.execute(f'''
+                INSERT INTO task_stats (dimension, key, count, reward_count, reward_sum, reward_min, reward_max)
+                SELECT '{dimension}', {key}, COUNT(*), COUNT(t.reward), COALESCE(SUM(t.reward), 0), MIN(t.reward), MAX(t.reward)
+                FROM {table} t WHERE {row_filter} GROUP BY 2
+                ON CONFLICT (dimension, key) DO UPDATE SET
+                    count = count + excluded.count,
+                    reward_count = reward_count + excluded.reward_count,
+                    reward_sum = reward_sum + excluded.reward_sum,
+                    reward_min = MIN(reward_min, excluded.reward_min),
+                    reward_max = MAX(reward_max, excluded.reward_max)
+            ''')
+            conn.execute(f'''
+                INSERT INTO task_reward_hist (dimension, key, bucket, count)
+                SELECT '{dimension}', {key}, {_bucket("t")}, COUNT(*)
+                FROM {table} t WHERE t.reward IS NOT NULL AND {row_filter} GROUP BY 2, 3
+                ON CONFLICT (dimension, key, bucket) DO UPDATE SET count = count + excluded.count
+            ''')
+    conn.commit()
+
+
+def quantiles(conn, dimensions, key, qs=(0.5, 0.9)):
+    """Approximate reward quantiles for one key across `dimensions`, from the histograms (bucket midpoints)."""
+    placeholders = ", ".join("?" for _ in dimensions)
+    rows = conn.execute(
+        f'SELECT bucket, SUM(count) AS count FROM task_reward_hist '
+        f'WHERE dimension IN ({placeholders}) AND key = ? AND count > 0 GROUP BY bucket ORDER BY bucket',
+        (*dimensions, key)
+    ).fetchall()
+    total = sum(r['count'] for r in rows)
+    result = {}
+    for q in qs:
+        if not total:
+            result[q] = None
+            continue
+        target, seen = q * total, 0
+        for row in rows:
+            seen += row['count']
+            if seen >= target:
+                result[q] = round((row['bucket'] + 0.5) * BUCKET_WIDTH, 2)
+                break
+    return result
+
+
+def _group(row):
+    avg = row['reward_sum'] / row['reward_count'] if row['reward_count'] else None
+    return {
+        "count": row['count'],
+        "average_reward": round(avg, 2) if avg is not None else 0,
+        "min_reward": row['reward_min'],
+        "max_reward": row['reward_max'],
+    }
+
+
+def summary(conn):
+    """Totals plus per-status and per-category breakdowns, read from the aggregate tables."""
+    by_dimension = {"all": {}, "status": {}, "category": {}}
+    rows = conn.execute(
+        "SELECT * FROM task_stats WHERE dimension IN ('all', 'status', 'category') AND count > 0"
+    ).fetchall()
+    for row in rows:
+        by_dimension[row['dimension']][row['key']] = _group(row)
+    overall = by_dimension["all"].get("", {"count": 0, "average_reward": 0})
+    q = quantiles(conn, ("all",), "")
+    return {
+        "total_tasks": overall["count"],
+        "average_reward": overall["average_reward"],
+        "median_reward": q[0.5],
+        "p90_reward": q[0.9],
+        "by_status": {k: v["count"] for k, v in by_dimension["status"].items()},
+        "by_category": by_dimension["category"],
+    }
+
+
+def price_stats(conn, task_type):
+    """Reward statistics for the category of `task_type` across tasks and available_tasks.
+
+    Only priced rows (reward > 0) count. Uses every task when `task_type` matches
+    no category or its category has no priced samples. Returns
+    {"category", "sample_size", "min", "max", "avg", "median", "p90", "samples"}
+    or None when there is no pricing data at all.
+    """
+    category = categories.classify(task_type)
+    groups = [("price_all", "")]
+    if category != categories.OTHER:
+        groups.insert(0, ("price_category", category))
+    for dimension, key in groups:
+        row = conn.execute(
+            'SELECT reward_count AS n, reward_sum AS total, reward_min AS lo, reward_max AS hi '
+            'FROM task_stats WHERE dimension = ? AND key = ?',
+            (dimension, key)
+        ).fetchone()
+        if row and row['n']:
+            break
+    else:
+        return None
+
+    q = quantiles(conn, (dimension,), key)
+    if key:
+        samples = conn.execute(
+            'SELECT title, reward FROM tasks WHERE category = ? AND reward > 0 '
+            'UNION ALL SELECT title, reward FROM available_tasks WHERE category = ? AND reward > 0 LIMIT 5',
+            (key, key)
+        ).fetchall()
+    else:
+        samples = conn.execute('SELECT title, reward FROM available_tasks WHERE reward > 0 LIMIT 5').fetchall()
+    return {
+        "category": key or "All tasks",
+        "sample_size": row['n'],
+        "min": round(row['lo'], 2),
+        "max": round(row['hi'], 2),
+        "avg": round(row['total'] / row['n'], 2),
+        "median": q[0.5],
+        "p90": q[0.9],
+        "samples": [dict(s) for s in samples],
+    }
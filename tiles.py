@@ -0,0 +1,122 @@
+"""
+Slippy-map tiles of user-posted tasks as compact GeoJSON (/tiles/<z>/<x>/<y>).
+
+Posted tasks are the same for every user, so unlike /api/nearby (whose demo
+tasks and match scores depend on the caller) each tile is a pure function of
+(z, x, y): it is rendered once, kept in a server-side cache, served with an
+ETag and Cache-Control, and dropped from the cache when a write touches a
+task inside it. Below geo.CLUSTER_MAX_ZOOM tiles carry grid clusters instead
+of individual tasks (cluster cells never straddle tiles).
+"""
+
+import hashlib
+import json
+import math
+import os
+
+import cache
+import changelog
+import geo
+
+TILE_MIN_ZOOM = int(os.getenv('TILE_MIN_ZOOM', '10'))
+TILE_MAX_ZOOM = int(os.getenv('TILE_MAX_ZOOM', '19'))
+# Browser / proxy freshness; the server cache itself is invalidated on writes
+TILE_MAX_AGE = int(os.getenv('TILE_MAX_AGE', '60'))
+TILE_CACHE_SIZE = int(os.getenv('TILE_CACHE_SIZE', '4096'))
+TILE_CACHE_TTL = int(os.getenv('TILE_CACHE_TTL', '3600'))
+
+# Custom (DB) tasks are shown on the map with this offset added to their id
+MAP_ID_OFFSET = 10000
+
+# Shared between server processes under CACHE_BACKEND=shared
+_cache = cache.make('tiles', TILE_CACHE_TTL, TILE_CACHE_SIZE)
+
+
+def valid(z, x, y):
+    return TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_for(lat, lng, z):
+    """(x, y) of the tile containing a point at zoom z."""
+    px, py = geo.to_pixels(lat, lng, z)
+    n = 2 ** z
+    return min(n - 1, max(0, int(px // geo.TILE_SIZE))), min(n - 1, max(0, int(py // geo.TILE_SIZE)))
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of a tile."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def _feature(lat, lng, properties):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [round(lng, 6), round(lat, 6)]},
+            "properties": properties}
+
+
+def render(conn, z, x, y):
+    """GeoJSON bytes for one tile, straight from the database."""
+    south, west, north, east = tile_bounds(z, x, y)
+    rows = conn.execute(
+        "SELECT id, title, description, reward, lat, lng FROM tasks "
+        "WHERE status = 'posted' AND lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?",
+        (south, north, west, east)
+    ).fetchall()
+    # Points on a shared edge belong to exactly one tile
+    tasks = [{"id": r['id'] + MAP_ID_OFFSET, "title": r['title'], "description": r['description'],
+              "reward": r['reward'], "lat": r['lat'], "lng": r['lng'], "is_custom": True}
+             for r in rows if tile_for(r['lat'], r['lng'], z) == (x, y)]
+
+    clusters = []
+    if geo.should_cluster(z, len(tasks)):
+        tasks, clusters = geo.grid_cluster(tasks, z)
+
+    features = [_feature(t['lat'], t['lng'], {k: v for k, v in t.items() if k not in ('lat', 'lng')})
+                for t in tasks]
+    features += [_feature(c['lat'], c['lng'], {"cluster": True, "count": c['count'], "bounds": c['bounds'],
+                                               "total_reward": c['total_reward']})
+                 for c in clusters]
+    return json.dumps({"type": "FeatureCollection", "features": features}, separators=(',', ':')).encode()
+
+
+def get_tile(conn, z, x, y):
+    """(body, etag) for a tile, rendering it on a cache miss."""
+    key = (z, x, y)
+    value = _cache.get(key)
+    if value is None:
+        # The change log id moves on every task write, in any process
+        generation = changelog.latest_id(conn)
+        body = render(conn, z, x, y)
+        value = body, hashlib.sha1(body).hexdigest()[:16]
+        # Don't cache a render that may predate a concurrent write
+        if generation == changelog.latest_id(conn):
+            _cache.set(key, value)
+    return value
+
+
+def invalidate_point(lat, lng):
+    """Drop every cached tile (all zooms) containing a task at (lat, lng)."""
+    # Rows written before lat/lng were validated may hold anything
+    if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+        return
+    for z in range(TILE_MIN_ZOOM, TILE_MAX_ZOOM + 1):
+        x, y = tile_for(lat, lng, z)
+        _cache.invalidate((z, x, y))
+
+
+def prime(conn, z=14, limit=256):
+    """Render the zoom-z tiles holding the most posted tasks into the cache; returns how many."""
+    if not TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM:
+        return 0
+    counts = {}
+    for row in conn.execute("SELECT lat, lng FROM tasks WHERE status = 'posted' AND lat IS NOT NULL AND lng IS NOT NULL"):
+        key = tile_for(row['lat'], row['lng'], z)
+        counts[key] = counts.get(key, 0) + 1
+    busiest = sorted(counts, key=counts.get, reverse=True)[:limit]
+    for x, y in busiest:
+        get_tile(conn, z, x, y)
+    return len(busiest)
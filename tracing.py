@@ -0,0 +1,198 @@
+"""
+Lightweight tracing — nested spans with trace ids propagated through Flask
+requests, ai_helpers, tool calls, SQL and LLM calls (and MCP tool calls).
+
+Finished spans go to an in-memory ring buffer (viewable at /api/debug/traces)
+and, if TRACE_FILE is set, are appended to that file as JSON lines.
+
+    TRACING=0            disable tracing entirely
+    TRACE_BUFFER=5000    number of finished spans kept in memory
+    TRACE_FILE=traces.jsonl
+"""
+
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+ENABLED = os.getenv('TRACING', '1').lower() not in ('0', 'false', 'no')
+TRACE_FILE = os.getenv('TRACE_FILE', '')
+
+_buffer = deque(maxlen=int(os.getenv('TRACE_BUFFER', '5000')))
+_file_lock = threading.Lock()
+_current = contextvars.ContextVar('current_span', default=None)
+
+_TRACEPARENT_RE = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start', '_t0', 'duration_ms', 'error', '_token')
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def traceparent(self):
+        """W3C traceparent header value for propagating this span downstream."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    return _current.get()
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    match = _TRACEPARENT_RE.match((header or '').strip().lower())
+    return match.groups() if match else (None, None)
+
+
+def start_span(name, traceparent=None, **attributes):
+    """Start a span as a child of the current one (or of `traceparent`, or a new trace)."""
+    if not ENABLED:
+        return None
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = parse_traceparent(traceparent)
+        trace_id = trace_id or uuid.uuid4().hex
+    span = Span(name, trace_id, parent_id, attributes)
+    span._token = _current.set(span)
+    return span
+
+
+def end_span(span, error=None):
+    if span is None:
+        return
+    span.duration_ms = round((time.perf_counter() - span._t0) * 1000, 3)
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    try:
+        _current.reset(span._token)
+    except ValueError:
+        # Ended from a different context (e.g. Flask teardown after a copied context)
+        _current.set(None)
+    _export(span)
+
+
+class span:
+    """Context manager: `with tracing.span("tool.search", keyword=k) as s: ...`"""
+
+    def __init__(self, name, traceparent=None, **attributes):
+        self.name = name
+        self.traceparent = traceparent
+        self.attributes = attributes
+        self._span = None
+
+    def __enter__(self):
+        self._span = start_span(self.name, traceparent=self.traceparent, **self.attributes)
+        return self._span if self._span is not None else _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        end_span(self._span, error=exc)
+        return False
+
+
+def child_span(name, **attributes):
+    """Like `span`, but only records when there is already an active trace."""
+    if _current.get() is None:
+        return _NOOP
+    return span(name, **attributes)
+
+
+def traced(name=None):
+    """Decorator that wraps a function call in a span."""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _NoopSpan:
+    trace_id = None
+    traceparent = None
+
+    def set(self, **attributes):
+        pass
+
+
+class _NoopContext:
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP = _NoopContext()
+
+
+# --- Exporters ---
+
+def _export(finished):
+    _buffer.append(finished)
+    if TRACE_FILE:
+        line = json.dumps(finished.to_dict(), default=str)
+        with _file_lock:
+            with open(TRACE_FILE, 'a') as f:
+                f.write(line + "\n")
+
+
+def recent_traces(limit=20, trace_id=None):
+    """Finished spans grouped by trace, most recent trace first."""
+    traces = {}
+    for s in reversed(list(_buffer)):
+        if trace_id and s.trace_id != trace_id:
+            continue
+        if s.trace_id not in traces and len(traces) >= limit:
+            continue
+        traces.setdefault(s.trace_id, []).append(s.to_dict())
+    result = []
+    for tid, spans in traces.items():
+        spans.sort(key=lambda d: d["start"])
+        root = next((d for d in spans if d["parent_id"] is None or
+                     d["parent_id"] not in {x["span_id"] for x in spans}), spans[0])
+        result.append({
+            "trace_id": tid,
+            "root": root["name"],
+            "duration_ms": root["duration_ms"],
+            "spans": spans,
+        })
+    return result
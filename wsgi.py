@@ -0,0 +1,14 @@
+"""
+WSGI entry point: `gunicorn wsgi:app` (or any WSGI server).
+
+create_app() initializes the schema and warms the process up before the
+first request arrives; see app.create_app. Under the pre-fork server
+(gunicorn.conf.py, APP_PREFORK=1) this runs in the master, so job threads
+are started per worker after the fork instead.
+"""
+
+import os
+
+from app import create_app
+
+app = create_app(start_jobs=os.getenv('APP_PREFORK') != '1')